@@ -0,0 +1,11 @@
+"""
+Performance benchmarks for podcats.
+
+Run them from the repository root, e.g.::
+
+    $ python -m benchmarks.bench_scan --files 10000
+
+`benchmarks.suite` covers the main scan, render and serve paths in one
+run and can compare its results with those of an earlier run.
+
+"""
@@ -0,0 +1,116 @@
+"""
+Benchmark audio file delivery throughput over HTTP.
+
+Serves a few large sparse .m4b files from a real server on localhost and
+measures full downloads and random single-range requests, as issued by
+podcast clients seeking in an audiobook, against the podcats media route
+and a plain Flask ``static_folder`` app (the previous implementation).
+
+Sparse files are read from the page cache, so this measures the server's
+per-byte and per-request overhead rather than the disk.
+
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+from flask import Flask
+from werkzeug.serving import make_server
+
+import podcats
+from benchmarks.synth import make_sparse_file
+
+
+def start_server(app):
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def fetch(conn, url, headers=None):
+    conn.request('GET', url, headers=headers or {})
+    response = conn.getresponse()
+    received = 0
+    while True:
+        chunk = response.read(1024 * 1024)
+        if not chunk:
+            break
+        received += len(chunk)
+    return response.status, received
+
+
+def bench(port, urls, range_requests, range_size, size):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    start = time.perf_counter()
+    received = 0
+    for url in urls:
+        status, n = fetch(conn, url)
+        assert status == 200, status
+        received += n
+    full_seconds = time.perf_counter() - start
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(range_requests):
+        offset = rng.randrange(0, size - range_size)
+        status, n = fetch(conn, rng.choice(urls), {'Range': 'bytes={}-{}'.format(offset, offset + range_size - 1)})
+        assert status == 206 and n == range_size, (status, n)
+    range_seconds = time.perf_counter() - start
+    conn.close()
+    return {
+        'full_mb_per_second': received / full_seconds / 1e6,
+        'range_requests_per_second': range_requests / range_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=3)
+    parser.add_argument('--size-mb', type=int, default=512)
+    parser.add_argument('--range-requests', type=int, default=500)
+    parser.add_argument('--range-kb', type=int, default=256)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    size = args.size_mb * 1024 * 1024
+    library = os.path.join(tempfile.gettempdir(), 'podcats-bench-media')
+    os.makedirs(os.path.join(library, 'Book'), exist_ok=True)
+    urls = []
+    for i in range(args.files):
+        make_sparse_file(os.path.join(library, 'Book', 'part{}.m4b'.format(i)), size)
+        urls.append('/static/Book/part{}.m4b'.format(i))
+
+    channel = podcats.Channel(
+        root_dir=library, root_url='http://localhost', host='127.0.0.1', port=0, title='Bench', link=None)
+    apps = [
+        ('podcats', podcats.create_app(channel)),
+        ('flask-static', Flask(__name__, static_folder=library, static_url_path='/static')),
+    ]
+
+    results = []
+    for name, app in apps:
+        server = start_server(app)
+        try:
+            result = bench(server.server_port, urls, args.range_requests, args.range_kb * 1024, size)
+        finally:
+            server.shutdown()
+        result['server'] = name
+        results.append(result)
+        print('{server:<14} full {full_mb_per_second:8.1f} MB/s  '
+              'ranges {range_requests_per_second:8.1f} req/s'.format(**result))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark the memory held by a library index per episode.
+
+Synthesizes a library, warms a metadata cache and then measures with
+tracemalloc how much memory a `LibraryIndex` built from that cache keeps
+per episode, first right after the build and then after the whole
+library has been rendered once (which keeps each episode's rendered feed
+and page fragments).
+
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import tracemalloc
+
+import podcats
+from benchmarks.synth import make_library
+
+
+def traced():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=20000)
+    parser.add_argument('--per-folder', type=int, default=25)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    library = os.path.join(tempfile.gettempdir(), 'podcats-bench-{}-{}'.format(args.files, args.per_folder))
+    make_library(library, files=args.files, per_folder=args.per_folder)
+    cache_dir = tempfile.mkdtemp(prefix='podcats-bench-cache-')
+    metadata_cache = podcats.MetadataCache(os.path.join(cache_dir, 'metadata.sqlite3'))
+    podcats.LibraryIndex(root_dir=library, root_url='http://localhost:5000', metadata_cache=metadata_cache).build()
+
+    tracemalloc.start()
+    before = traced()
+    index = podcats.LibraryIndex(root_dir=library, root_url='http://localhost:5000', metadata_cache=metadata_cache)
+    index.build()
+    built = traced()
+    channel = podcats.Channel(
+        root_dir=library, root_url='http://localhost:5000', host='localhost', port=5000,
+        title='Bench', link=None, library_index=index,
+    )
+    channel.as_xml()
+    channel.as_html()
+    rendered = traced()
+    tracemalloc.stop()
+    metadata_cache.close()
+
+    episodes = len(index)
+    result = {
+        'episodes': episodes,
+        'index_bytes': built - before,
+        'index_bytes_per_episode': (built - before) / episodes,
+        'rendered_bytes_per_episode': (rendered - before) / episodes,
+    }
+    print('{episodes} episodes  index {index_bytes_per_episode:.0f} bytes/episode  '
+          'after rendering {rendered_bytes_per_episode:.0f} bytes/episode'.format(**result))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
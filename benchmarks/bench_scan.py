@@ -0,0 +1,83 @@
+"""
+Benchmark cold library scans with different --scan-workers settings.
+
+Synthesizes a library (10k files by default) and times a cold
+`LibraryIndex.build()` with no metadata cache, sequentially and with
+thread and process pools of increasing size.
+
+On local disks tag parsing is CPU-bound and threads barely help; use
+``--library`` to point at a network mount, or ``--latency`` to simulate
+per-file storage latency (thread pools only, process pool workers do
+not see the simulated latency).
+
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import podcats
+from benchmarks.synth import make_library
+
+
+def simulate_latency(seconds):
+    read_metadata = podcats.read_metadata
+
+    def slow_read_metadata(filename):
+        time.sleep(seconds)
+        return read_metadata(filename)
+
+    podcats.read_metadata = slow_read_metadata
+
+
+def time_build(library, workers, processes):
+    scanner = podcats.MetadataScanner(workers=workers, processes=processes)
+    index = podcats.LibraryIndex(root_dir=library, root_url='http://localhost:5000', scanner=scanner)
+    try:
+        if processes:
+            # Spawn the pool outside the timed region.
+            scanner._get_executor().submit(int).result()
+        start = time.perf_counter()
+        index.build()
+        elapsed = time.perf_counter() - start
+    finally:
+        scanner.shutdown()
+    return elapsed, len(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--library', help='existing library to scan instead of a synthetic one')
+    parser.add_argument('--workers', default='1,2,4,8', help='comma-separated worker counts')
+    parser.add_argument('--latency', type=float, default=0, help='simulated per-file latency in ms')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    library = args.library
+    if library is None:
+        library = os.path.join(tempfile.gettempdir(), 'podcats-bench-{}'.format(args.files))
+        print('Synthesizing {} files in {}'.format(args.files, library))
+        make_library(library, files=args.files)
+    if args.latency:
+        simulate_latency(args.latency / 1000.0)
+
+    results = []
+    for processes in (False, True):
+        for workers in [int(w) for w in args.workers.split(',')]:
+            if processes and workers == 1:
+                continue
+            elapsed, count = time_build(library, workers, processes)
+            kind = 'processes' if processes else 'threads'
+            results.append({'workers': workers, 'kind': kind, 'files': count, 'seconds': elapsed})
+            print('{:>3} {:<9} {:>7} files  {:8.3f}s  {:10.0f} files/s'.format(
+                workers, kind, count, elapsed, count / elapsed))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
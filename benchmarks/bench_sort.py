@@ -0,0 +1,79 @@
+"""
+Benchmark episode sorting in default and --force-order-by-name modes.
+
+Sort keys are computed once per episode when it is created; this times
+that one-off cost and then sorting a large channel with `sorted(episodes,
+key=podcats.sort_key)` and with plain rich comparisons.
+
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import podcats
+from benchmarks.synth import make_library
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    library = os.path.join(tempfile.gettempdir(), 'podcats-bench-{}'.format(args.files))
+    make_library(library, files=args.files)
+    metadata = {}
+
+    results = []
+    for force_order_by_name in (False, True):
+        mode = 'force-order-by-name' if force_order_by_name else 'default'
+        index = podcats.LibraryIndex(
+            root_dir=library, root_url='http://localhost:5000', force_order_by_name=force_order_by_name)
+        index.build()
+        episodes = index.episodes()
+        random.Random(0).shuffle(episodes)
+
+        for episode in episodes:
+            if episode.filename not in metadata:
+                metadata[episode.filename] = podcats.read_metadata(episode.filename)
+        keys = best_of(args.repeat, lambda: [
+            podcats.Episode(
+                e.filename, e.relative_dir, e.root_url, force_order_by_name=force_order_by_name,
+                metadata=metadata[e.filename], stat=os.stat(e.filename),
+            )
+            for e in episodes
+        ])
+        by_key = best_of(args.repeat, lambda: sorted(episodes, key=podcats.sort_key))
+        by_comparison = best_of(args.repeat, lambda: sorted(episodes))
+
+        result = {
+            'mode': mode,
+            'episodes': len(episodes),
+            'create_episodes_seconds': keys,
+            'sort_key_seconds': by_key,
+            'sort_compare_seconds': by_comparison,
+        }
+        results.append(result)
+        print('{mode:<20} {episodes:>7} episodes  create {create_episodes_seconds:.4f}s  '
+              'sorted(key=) {sort_key_seconds:.4f}s  sorted() {sort_compare_seconds:.4f}s'.format(**result))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Load-test `podcats serve` with different --server/--workers settings.
+
+Starts the server on a synthetic library for each configuration and
+hammers the feed and a media file (256 KiB range requests) from several
+client processes over keep-alive connections, reporting requests per
+second for each endpoint.
+
+Example::
+
+    $ python -m benchmarks.loadtest --config werkzeug:1 --config gunicorn:4 --config asyncio:1
+
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synth import make_library, make_sparse_file
+
+
+MEDIA_URL = '/static/Media/book.m4b'
+MEDIA_SIZE = 256 * 1024 * 1024
+RANGE_SIZE = 256 * 1024
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start on port {}'.format(port))
+
+
+def client(port, url, duration, results):
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    requests = offset = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        headers = {}
+        if url == MEDIA_URL:
+            headers['Range'] = 'bytes={}-{}'.format(offset, offset + RANGE_SIZE - 1)
+            offset = (offset + RANGE_SIZE) % (MEDIA_SIZE - RANGE_SIZE)
+        conn.request('GET', url, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        if response.status not in (200, 206):
+            raise RuntimeError('{} returned {}'.format(url, response.status))
+        requests += 1
+    conn.close()
+    results.put(requests)
+
+
+def load(port, url, clients, duration):
+    results = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=client, args=(port, url, duration, results)) for _ in range(clients)]
+    for proc in procs:
+        proc.start()
+    total = sum(results.get() for _ in procs)
+    for proc in procs:
+        proc.join()
+    return total / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument(
+        '--config', action='append', metavar='SERVER:WORKERS',
+        help='server configuration to test, repeatable (default: werkzeug:1 and gunicorn:<cpus>)')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+    configs = args.config or ['werkzeug:1', 'gunicorn:{}'.format(os.cpu_count() or 1)]
+
+    library = os.path.join(tempfile.gettempdir(), 'podcats-bench-{}'.format(args.files))
+    make_library(library, files=args.files)
+    os.makedirs(os.path.join(library, 'Media'), exist_ok=True)
+    make_sparse_file(os.path.join(library, 'Media', 'book.m4b'), MEDIA_SIZE)
+
+    results = []
+    for config in configs:
+        server, _, workers = config.partition(':')
+        port = free_port()
+        proc = subprocess.Popen(
+            [sys.executable, '-c', 'import podcats; podcats.main()', 'serve', library,
+             '--port', str(port), '--server', server, '--workers', workers or '1',
+             '--cache-dir', os.path.join(library, '.cache')],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for(port)
+            result = {
+                'server': server,
+                'workers': int(workers or 1),
+                'feed_requests_per_second': load(port, '/', args.clients, args.duration),
+                'media_requests_per_second': load(port, MEDIA_URL, args.clients, args.duration),
+            }
+        finally:
+            proc.terminate()
+            proc.wait()
+        results.append(result)
+        print('{server:<10} workers={workers:<3} feed {feed_requests_per_second:8.1f} req/s  '
+              'media {media_requests_per_second:8.1f} req/s'.format(**result))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
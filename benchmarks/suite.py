@@ -0,0 +1,183 @@
+"""
+Benchmark the scan, sort, render and serve paths on a large library.
+
+Synthesizes a library of MP3 and M4B episodes spread over many book
+folders and times:
+
+- ``scan_*``: iterating a `Channel` without a library index, i.e. walking
+  the tree and parsing every file, cold and from a warm metadata cache;
+- ``sort``: ``sorted(channel)``;
+- ``as_xml_*`` / ``as_html_index_*``: rendering the combined feed and the
+  folder index page, the first time and once warmed up;
+- ``http_*``: latency of the app endpoints through the Flask test client,
+  for full responses and for conditional polls answered with 304.
+
+Timings are in seconds. Save them with ``--json`` and compare a later run
+against them with ``--compare``::
+
+    $ python -m benchmarks.suite --json before.json
+    $ python -m benchmarks.suite --compare before.json
+
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+
+import podcats
+from benchmarks.synth import make_library
+
+
+ROOT_URL = 'http://localhost:5000'
+# Slowdowns beyond this factor are flagged by --compare.
+REGRESSION_THRESHOLD = 1.2
+
+
+def best_of(repeat, func):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def make_channel(library, **kwargs):
+    return podcats.Channel(
+        root_dir=library, root_url=ROOT_URL, host='localhost', port=5000, title='Benchmark', link=None, **kwargs)
+
+
+def make_folder_channel(library, **kwargs):
+    return podcats.FolderChannel(
+        root_dir=library, root_url=ROOT_URL, host='localhost', port=5000, title='Benchmark', link=None, **kwargs)
+
+
+def bench_scan(library, cache_dir, repeat):
+    results = {'scan_cold': best_of(repeat, lambda: list(make_channel(library)))}
+    metadata_cache = podcats.MetadataCache(os.path.join(cache_dir, 'metadata.sqlite3'))
+    try:
+        list(make_channel(library, metadata_cache=metadata_cache))
+        results['scan_warm_cache'] = best_of(
+            repeat, lambda: list(make_channel(library, metadata_cache=metadata_cache)))
+    finally:
+        metadata_cache.close()
+    return results
+
+
+def bench_render(library, repeat):
+    index = podcats.LibraryIndex(root_dir=library, root_url=ROOT_URL)
+    index.build()
+    channel = make_channel(library, library_index=index)
+    episodes = list(channel)
+    results = {
+        'episodes': len(episodes),
+        'sort': best_of(repeat, lambda: sorted(episodes)),
+        'as_xml_first': timed(channel.as_xml),
+        'as_xml_warm': best_of(repeat, channel.as_xml),
+        'as_html_index_no_index': timed(make_folder_channel(library).as_html_index),
+    }
+    folder_channel = make_folder_channel(library, library_index=index)
+    results['as_html_index_first'] = timed(folder_channel.as_html_index)
+    results['as_html_index_warm'] = best_of(repeat, folder_channel.as_html_index)
+    return results
+
+
+def bench_http(library, requests):
+    # A fresh index, so the first requests render from scratch.
+    index = podcats.LibraryIndex(root_dir=library, root_url=ROOT_URL)
+    index.build()
+    channel = make_channel(library, library_index=index)
+    folder_channel = make_folder_channel(library, library_index=index)
+    folder = folder_channel.get_folders()[0]
+    endpoints = [
+        ('feed', podcats.create_app(channel), '/'),
+        ('web', podcats.create_app(channel), podcats.WEB_PATH),
+        ('folder_index', podcats.create_folder_app(folder_channel), podcats.WEB_PATH),
+        ('folder_feed', podcats.create_folder_app(folder_channel), '/feed/' + folder),
+    ]
+    results = {}
+    for name, app, url in endpoints:
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.get(url)
+        results['http_{}_first'.format(name)] = time.perf_counter() - start
+        assert response.status_code == 200, (url, response.status_code)
+        etag = response.headers['ETag']
+
+        for kind, headers in (('', {}), ('_304', {'If-None-Match': etag})):
+            timings = []
+            for _ in range(requests):
+                start = time.perf_counter()
+                client.get(url, headers=headers).close()
+                timings.append(time.perf_counter() - start)
+            results['http_{}{}_p50'.format(name, kind)] = statistics.median(timings)
+            results['http_{}{}_p95'.format(name, kind)] = sorted(timings)[int(len(timings) * 0.95)]
+    return results
+
+
+def compare(results, baseline):
+    print()
+    print('{:<32} {:>10} {:>10} {:>8}'.format('benchmark', 'baseline', 'now', 'ratio'))
+    for name, seconds in results['timings'].items():
+        before = baseline['timings'].get(name)
+        if not before:
+            continue
+        ratio = seconds / before
+        flag = '  SLOWER' if ratio > REGRESSION_THRESHOLD else ''
+        print('{:<32} {:10.4f} {:10.4f} {:7.2f}x{}'.format(name, before, seconds, ratio, flag))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=5000)
+    parser.add_argument('--per-folder', type=int, default=25)
+    parser.add_argument('--m4b-every', type=int, default=4, help='make every Nth book folder M4B')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--requests', type=int, default=20, help='requests per HTTP endpoint')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', metavar='JSON', help='compare with the results of an earlier run')
+    args = parser.parse_args()
+
+    library = os.path.join(tempfile.gettempdir(), 'podcats-suite-{}-{}-{}'.format(
+        args.files, args.per_folder, args.m4b_every))
+    print('Synthesizing {} files in {}'.format(args.files, library))
+    make_library(library, files=args.files, per_folder=args.per_folder, m4b_every=args.m4b_every)
+
+    timings = {}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        timings.update(bench_scan(library, cache_dir, args.repeat))
+    render = bench_render(library, args.repeat)
+    episodes = render.pop('episodes')
+    timings.update(render)
+    timings.update(bench_http(library, args.requests))
+
+    for name, seconds in timings.items():
+        print('{:<32} {:10.4f}s'.format(name, seconds))
+
+    results = {
+        'files': args.files,
+        'episodes': episodes,
+        'folders': (args.files + args.per_folder - 1) // args.per_folder,
+        'python': platform.python_version(),
+        'podcats': podcats.__version__,
+        'timings': timings,
+    }
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Synthesize large audiobook libraries for benchmarking.
+
+The generated files are tiny but valid MP3s (a few silent MPEG frames)
+with ID3 tags, or M4B files with just enough of an MP4 box tree for a
+duration and iTunes tags, so mutagen parses them exactly like real
+episodes.
+
+"""
+import os
+import struct
+
+from mutagen.id3 import COMM, ID3, TALB, TDRC, TIT2, TRCK
+from mutagen.mp4 import MP4
+
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, joint stereo: 417 bytes per frame,
+# ~38.3 frames per second.
+MP3_FRAME = b'\xff\xfb\x90\x64' + b'\x00' * 413
+MP3_FRAMES_PER_SECOND = 38.28
+
+
+def write_mp3(filename, title=None, album=None, track=None, date=None, comment=None, seconds=1):
+    """Write a silent MP3 of `seconds` with the given ID3 tags"""
+    with open(filename, 'wb') as f:
+        f.write(MP3_FRAME * max(1, int(seconds * MP3_FRAMES_PER_SECOND)))
+    tags = ID3()
+    if title:
+        tags.add(TIT2(encoding=3, text=title))
+    if album:
+        tags.add(TALB(encoding=3, text=album))
+    if track:
+        tags.add(TRCK(encoding=3, text=str(track)))
+    if date:
+        tags.add(TDRC(encoding=3, text=date))
+    if comment:
+        tags.add(COMM(encoding=3, lang='eng', desc='', text=comment))
+    tags.save(filename)
+
+
+def _box(kind, *children):
+    payload = b''.join(children)
+    return struct.pack('>I4s', 8 + len(payload), kind) + payload
+
+
+def write_m4b(filename, title=None, album=None, track=None, date=None, comment=None, seconds=1):
+    """Write an M4B stub of `seconds` (no actual audio) with the given tags"""
+    timescale = 1000
+    duration = int(seconds * timescale)
+    matrix = struct.pack('>9I', 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+    mvhd = _box(b'mvhd', struct.pack('>4xIIIIIH10x', 0, 0, timescale, duration, 0x10000, 0x100),
+                matrix, b'\x00' * 24, struct.pack('>I', 2))
+    mdhd = _box(b'mdhd', struct.pack('>4xIIIIHH', 0, 0, timescale, duration, 0x55c4, 0))
+    hdlr = _box(b'hdlr', struct.pack('>4x4x4s12x', b'soun'), b'\x00')
+    with open(filename, 'wb') as f:
+        f.write(_box(b'ftyp', b'M4B ', struct.pack('>I', 0), b'M4B M4A mp42isom'))
+        f.write(_box(b'moov', mvhd, _box(b'trak', _box(b'mdia', mdhd, hdlr))))
+        f.write(_box(b'mdat'))
+    audio = MP4(filename)
+    audio.add_tags()
+    if title:
+        audio.tags['\xa9nam'] = [title]
+    if album:
+        audio.tags['\xa9alb'] = [album]
+    if track:
+        audio.tags['trkn'] = [(track, 0)]
+    if date:
+        audio.tags['\xa9day'] = [date]
+    if comment:
+        audio.tags['\xa9cmt'] = [comment]
+    audio.save()
+
+
+def make_library(root, files=1000, per_folder=50, seconds=1, covers=True, m4b_every=0):
+    """
+    Create `files` episodes under `root`, `per_folder` per book folder.
+
+    With `m4b_every`, every that many book folders holds M4B files
+    instead of MP3s.
+
+    Returns the list of created audio file paths. Existing files are left
+    alone, so a library can be reused between benchmark runs.
+
+    """
+    created = []
+    folders = (files + per_folder - 1) // per_folder
+    for book in range(folders):
+        album = 'Book {:05d}'.format(book + 1)
+        directory = os.path.join(root, album)
+        os.makedirs(directory, exist_ok=True)
+        if covers and book % 2 == 0:
+            cover = os.path.join(directory, 'cover.jpg')
+            if not os.path.exists(cover):
+                with open(cover, 'wb') as f:
+                    f.write(b'\xff\xd8\xff\xe0' + b'\x00' * 1024)
+        m4b = m4b_every and book % m4b_every == m4b_every - 1
+        write = write_m4b if m4b else write_mp3
+        for chapter in range(min(per_folder, files - book * per_folder)):
+            filename = os.path.join(directory, '{:03d} - Chapter {}.{}'.format(
+                chapter + 1, chapter + 1, 'm4b' if m4b else 'mp3'))
+            if not os.path.exists(filename):
+                write(
+                    filename,
+                    title='Chapter {}'.format(chapter + 1),
+                    album=album,
+                    track=chapter + 1,
+                    date='2020-{:02d}-{:02d}'.format(chapter % 12 + 1, chapter % 28 + 1),
+                    seconds=seconds,
+                )
+            created.append(filename)
+    return created
+
+
+def make_sparse_file(filename, size):
+    """Create a sparse file of `size` bytes, e.g. a stand-in for a long m4b"""
+    if os.path.exists(filename) and os.path.getsize(filename) == size:
+        return filename
+    with open(filename, 'wb') as f:
+        f.truncate(size)
+    return filename
@@ -8,12 +8,22 @@ or another podcast client.
 
 """
 import datetime
+import hashlib
+import json
 import logging
 import os
 import re
+import secrets
+import threading
 import time
 import argparse
+import collections
+import heapq
+import operator
+import concurrent.futures
+import multiprocessing
 import mimetypes
+import sys
 from email.utils import formatdate
 from os import path
 from urllib.parse import quote, unquote
@@ -21,11 +31,18 @@ from xml.sax.saxutils import escape, quoteattr
 
 import mutagen
 import humanize
-from mutagen.id3 import ID3
-from mutagen.mp3 import HeaderNotFoundError
-from flask import Flask, Response
+from mutagen.easyid3 import EasyID3
+from mutagen.easymp4 import EasyMP4Tags
+from mutagen.id3 import ID3, ID3NoHeaderError
+from mutagen.mp4 import MP4Tags
+from flask import Flask, Response, g, request, stream_with_context
 # noinspection PyPackageRequirements
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from werkzeug.security import safe_join
+
+from . import aserver, compression, covers, metrics, probe, profiling, readahead, watch, wsgi
+from .media import send_media
+from .cache import DEFAULT_CACHE_DIR, FeedCache, FragmentCache, MetadataCache, RenderedFeed, open_metadata_cache
 
 __version__ = '0.6.3'
 __licence__ = 'BSD'
@@ -35,20 +52,228 @@ __url__ = 'https://github.com/jakubroztocil/podcats'
 
 WEB_PATH = '/web'
 STATIC_PATH = '/static'
+COVERS_PATH = '/covers'
+THUMBNAILS_PATH = '/thumbnails'
+METRICS_PATH = '/metrics'
+# Media and cover downloads are passed through --profile untouched.
+UNPROFILED_PATHS = (STATIC_PATH + '/', COVERS_PATH + '/', THUMBNAILS_PATH + '/')
+XML_CONTENT_TYPE = 'application/xml; charset=utf-8'
+HTML_CONTENT_TYPE = 'text/html; charset=utf-8'
 TEMPLATES_ROOT = os.path.join(os.path.dirname(__file__), 'templates')
 BOOK_COVER_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif')
+# Base timestamp (Jan 1, 2020) of the artificial dates used by --force-order-by-name
+FORCED_ORDER_EPOCH = time.mktime(time.strptime("2020-01-01", "%Y-%m-%d"))
+
+# The bundled templates don't change at runtime, so they are never checked for
+# modifications after being compiled.
+jinja2_env = Environment(loader=FileSystemLoader(TEMPLATES_ROOT), auto_reload=False)
+_templates = {}
+
+#: Where embedded covers are extracted to, see `configure_cover_store`
+cover_store = None
 
-jinja2_env = Environment(loader=FileSystemLoader(TEMPLATES_ROOT))
+# Enough fragments for the folders being polled, without keeping every
+# episode's XML and HTML for as long as the library index lives.
+FRAGMENT_CACHE_SIZE = 4096
+#: Rendered episode fragments, see `configure_fragment_cache`
+fragment_cache = FragmentCache(FRAGMENT_CACHE_SIZE)
 
 logger = logging.getLogger(__name__)
 
 
+def get_template(name):
+    """Return the compiled template `name`, loading it on first use"""
+    template = _templates.get(name)
+    if template is None:
+        template = _templates[name] = jinja2_env.get_template(name)
+    return template
+
+
+def configure_template_cache(cache_dir=None):
+    """
+    Keep compiled template bytecode in `cache_dir` to speed up startup.
+
+    Must be called before the first template is rendered.
+
+    """
+    directory = os.path.join(cache_dir or DEFAULT_CACHE_DIR, 'templates')
+    try:
+        os.makedirs(directory, exist_ok=True)
+    except OSError as err:
+        logger.warning('Template cache disabled, could not create {dir}: {err!r}'.format(dir=directory, err=err))
+        return
+    jinja2_env.bytecode_cache = FileSystemBytecodeCache(directory)
+
+
+def configure_cover_store(cache_dir=None):
+    """
+    Extract embedded covers to, and keep cover thumbnails in, `cache_dir`.
+
+    Must be called before the library is scanned.
+
+    """
+    directory = os.path.join(cache_dir or DEFAULT_CACHE_DIR, 'covers')
+    try:
+        store = covers.CoverStore(directory)
+    except OSError as err:
+        logger.warning('Cover cache disabled, could not create {dir}: {err!r}'.format(dir=directory, err=err))
+        return
+    _set_cover_store(store)
+
+
+def _set_cover_store(store):
+    global cover_store
+    cover_store = store
+
+
+def configure_fragment_cache(maxsize=FRAGMENT_CACHE_SIZE):
+    """Keep up to `maxsize` rendered episode fragments in memory (0 disables it)"""
+    global fragment_cache
+    fragment_cache = FragmentCache(maxsize)
+
+
+def thumbnails_enabled():
+    """Return whether cover thumbnails can be made and served"""
+    return cover_store is not None and covers.thumbnails_available()
+
+
 def is_audio_file(filepath):
     """Check if a file is an audio file based on mimetype or extension."""
     mimetype = mimetypes.guess_type(filepath)[0]
     return (mimetype and 'audio' in mimetype) or filepath.endswith('m4b')
 
 
+def find_cover(directory):
+    """
+    Return the filename of the cover image in `directory`, if any.
+
+    ``cover.*`` is preferred over ``folder.*``, which is preferred over
+    any other image; ties are broken by extension and then by name.
+
+    """
+    preferred_names = ('cover', 'folder')
+    candidates = []
+    for fn in os.listdir(directory):
+        stem, ext = os.path.splitext(fn)
+        ext = ext.lower()
+        if ext not in BOOK_COVER_EXTENSIONS:
+            continue
+        stem = stem.lower()
+        rank = preferred_names.index(stem) if stem in preferred_names else len(preferred_names)
+        candidates.append((rank, BOOK_COVER_EXTENSIONS.index(ext), natural_sort_key(fn), fn))
+    if candidates:
+        return min(candidates)[-1]
+    return None
+
+
+def file_version(stat):
+    """Return a string that changes whenever the file `stat` is for does"""
+    return '{:x}-{:x}'.format(stat.st_size, stat.st_mtime_ns)
+
+
+class CoverCache(object):
+    """Cover image per directory, resolved again only when the directory's mtime changes"""
+
+    def __init__(self):
+        self._covers = {}
+        self._lock = threading.Lock()
+
+    def find(self, directory):
+        """Return the cover filename in `directory`, see `find_cover`"""
+        return self.lookup(directory)[0]
+
+    def lookup(self, directory):
+        """Return the cover filename in `directory` and its `file_version`, or ``(None, None)``"""
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except OSError:
+            return None, None
+        with self._lock:
+            cached = self._covers.get(directory)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+        try:
+            cover = find_cover(directory)
+            version = file_version(os.stat(os.path.join(directory, cover))) if cover is not None else None
+        except OSError:
+            cover = version = None
+        with self._lock:
+            self._covers[directory] = (mtime_ns, (cover, version))
+        return cover, version
+
+    def clear(self):
+        with self._lock:
+            self._covers.clear()
+
+
+cover_cache = CoverCache()
+
+
+def static_url(root_url, relative_dir, filename, prefix=STATIC_PATH):
+    """Return the URL `filename` in `relative_dir` (below the library root) is served at"""
+    path_ = prefix + '/' + relative_dir + '/' + filename
+    path_ = re.sub(r'//', '/', path_)
+
+    # Ensure we don't get double slashes when joining root_url and path
+    if root_url.endswith('/') and path_.startswith('/'):
+        path_ = path_[1:]  # Remove leading slash from path if root_url ends with slash
+
+    return root_url + quote(path_, errors="surrogateescape")
+
+
+def cover_file_url(root_url, relative_dir, filename, version, size=None):
+    """
+    Return the URL of cover image `filename` in `relative_dir`, or with
+    `size` that of a thumbnail of it, if thumbnails are enabled.
+
+    """
+    if size is None or not thumbnails_enabled():
+        return static_url(root_url, relative_dir, filename)
+    return static_url(root_url, relative_dir, filename, prefix=THUMBNAILS_PATH + '/' + str(size)) + '?v=' + version
+
+
+def embedded_cover_url(root_url, name, size=None):
+    """Return the URL of the extracted cover `name`, or with `size` that of a thumbnail of it, if enabled"""
+    prefix = COVERS_PATH
+    if size is not None and thumbnails_enabled():
+        prefix += '/' + str(size)
+    return static_url(root_url, '', name, prefix=prefix)
+
+
+def count_audio_files(directory):
+    """Return the number of audio files directly in `directory`, without parsing any"""
+    try:
+        with os.scandir(directory) as entries:
+            return sum(1 for entry in entries if is_audio_file(entry.name) and entry.is_file())
+    except OSError:
+        return 0
+
+
+def has_audio_files(directory):
+    """Return whether `directory` directly contains an audio file"""
+    try:
+        with os.scandir(directory) as entries:
+            return any(is_audio_file(entry.name) and entry.is_file() for entry in entries)
+    except OSError:
+        return False
+
+
+def guess_mimetype(filepath):
+    """Return the mimetype of an audio file"""
+    if filepath.endswith('m4b'):
+        return 'audio/x-m4b'
+    else:
+        return mimetypes.guess_type(filepath)[0]
+
+
+def templates_fingerprint():
+    """Return the names and mtimes of the bundled templates"""
+    return sorted(
+        (fn, os.stat(os.path.join(TEMPLATES_ROOT, fn)).st_mtime_ns)
+        for fn in os.listdir(TEMPLATES_ROOT)
+    )
+
+
 def natural_sort_key(text):
     """
     Generate a sort key for natural/alphanumeric sorting.
@@ -68,58 +293,379 @@ def natural_sort_key(text):
     return [convert(c) for c in re.split(r'(\d+)', text)]
 
 
+#: Counts of metadata extraction work, e.g. ``scan_stats['files_opened']``,
+#: ``scan_stats['reads']`` or ``scan_stats['probe_bytes_read']``.
+scan_stats = collections.Counter()
+
+
+def _frame_text(tags, frame_id):
+    """Return the text of the first `frame_id` frame in ID3 `tags`, if any"""
+    if not isinstance(tags, ID3):
+        return None
+    frames = tags.getall(frame_id)
+    if len(frames) > 0:
+        return str(frames[0])
+    return None
+
+
+def _easy_tags(tags):
+    """
+    Return `tags` as a dict of lists of strings using the "easy" key names.
+
+    This is what ``mutagen.File(filename, easy=True)`` would expose, derived
+    from the already-parsed raw tags instead of parsing the file again.
+
+    """
+    if tags is None:
+        return {}
+    if isinstance(tags, ID3):
+        getters = EasyID3.Get
+    elif isinstance(tags, MP4Tags):
+        getters = EasyMP4Tags.Get
+    else:
+        # Vorbis comments, APEv2 etc. already use plain key names.
+        return {
+            str(key): [str(v) for v in value] if isinstance(value, list) else [str(value)]
+            for key, value in tags.items()
+        }
+
+    easy = {}
+    for key, getter in getters.items():
+        if '*' in key:
+            continue
+        try:
+            value = getter(tags, key)
+        except (KeyError, ValueError):
+            continue
+        if value:
+            easy[key] = [str(v) for v in value]
+    return easy
+
+
+class EpisodeMetadata(object):
+    """Everything an Episode needs from its audio file, parsed in one go"""
+
+    __slots__ = ('tags', 'id3_title', 'id3_comment', 'duration', 'mimetype', 'cover')
+
+    def __init__(self, tags, id3_title, id3_comment, duration, mimetype, cover=None):
+        self.tags = tags
+        self.id3_title = id3_title
+        self.id3_comment = id3_comment
+        self.duration = duration
+        self.mimetype = mimetype
+        # Name of the embedded cover in the cover store, '' if there is
+        # none, or None if covers were not extracted.
+        self.cover = cover
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def read_metadata(filename):
+    """
+    Parse the tags and stream info of an audio file.
+
+    The file is opened exactly once and read in a few large blocks (see
+    `readahead`). The duration is probed from the stream headers first
+    (see `probe`); for an MP3 that settles it, only its ID3 tags are
+    parsed. Other files get a full mutagen parse, which also provides the
+    duration when probing could not. An embedded cover is extracted to the
+    cover store, if one is configured.
+
+    """
+    scan_stats['files_opened'] += 1
+    with open(filename, 'rb') as raw:
+        fileobj = readahead.RegionFile(raw)
+        probed = probe.probe(fileobj)
+        scan_stats['probe_bytes_read'] += probed.bytes_read
+        logger.debug('Probed {filename}: format={format} duration={duration} bytes_read={bytes_read}'.format(
+            filename=filename, **probed._asdict()))
+        duration = int(probed.duration) if probed.duration is not None else None
+
+        pictures = ()
+        if probed.format == 'mp3' and duration is not None:
+            tags = _read_id3(fileobj, filename)
+        else:
+            fileobj.seek(0)
+            try:
+                audio = mutagen.File(fileobj)
+            except Exception as err:
+                audio = None
+                logger.warning(
+                    "Could not load tags of file {filename} due to: {err!r}".format(filename=filename, err=err)
+                )
+            if audio is not None:
+                tags = audio.tags
+                pictures = getattr(audio, 'pictures', ())  # FLAC
+                length = getattr(getattr(audio, 'info', None), 'length', None)
+                if duration is None and length is not None:
+                    duration = int(length)
+            else:
+                # The stream itself could not be parsed, but ID3 tags may still be readable.
+                try:
+                    fileobj.seek(0)
+                    tags = ID3(fileobj)
+                except Exception:
+                    tags = None
+
+        cover = _extract_cover(tags, pictures, filename)
+        scan_stats['reads'] += fileobj.reads
+        scan_stats['bytes_read'] += fileobj.bytes_read
+        logger.debug('Read {filename} in {reads} reads of {bytes_read} bytes in total'.format(
+            filename=filename, reads=fileobj.reads, bytes_read=fileobj.bytes_read))
+
+    return EpisodeMetadata(
+        tags=_easy_tags(tags),
+        id3_title=_frame_text(tags, 'TIT2'),
+        id3_comment=_frame_text(tags, 'COMM'),
+        duration=duration,
+        mimetype=guess_mimetype(filename),
+        cover=cover,
+    )
+
+
+def _extract_cover(tags, pictures, filename):
+    """Store the cover embedded in `tags` or `pictures`, see `EpisodeMetadata.cover`"""
+    if cover_store is None:
+        return None
+    data = covers.embedded_cover(tags, pictures)
+    if data is None:
+        return ''
+    try:
+        return cover_store.put(data)
+    except OSError as err:
+        logger.warning('Could not store the cover of {filename}: {err!r}'.format(filename=filename, err=err))
+        return None
+
+
+def _cached_metadata(metadata_cache, filename, stat):
+    """Return the `EpisodeMetadata` of `filename` in `metadata_cache`, or None if it must be parsed"""
+    cached = metadata_cache.get(filename, stat)
+    if cached is None:
+        return None
+    metadata = EpisodeMetadata.from_dict(cached)
+    if cover_store is not None and metadata.cover != '':
+        path_ = cover_store.path(metadata.cover) if metadata.cover else None
+        if path_ is None or not os.path.exists(path_):
+            # Cached before covers were extracted, or the extracted cover is gone.
+            return None
+    metrics.inc('podcats_metadata_cache_hits_total')
+    return metadata
+
+
+def _read_id3(fileobj, filename):
+    """Return the ID3 tags of the open file `fileobj`, or None"""
+    fileobj.seek(0)
+    try:
+        return ID3(fileobj)
+    except ID3NoHeaderError:
+        return None
+    except Exception as err:
+        logger.warning("Could not load tags of file {filename} due to: {err!r}".format(filename=filename, err=err))
+        return None
+
+
+def _read_metadata_or_none(filename):
+    """Like `read_metadata`, but return None for files that vanished"""
+    try:
+        return read_metadata(filename)
+    except OSError as err:
+        logger.warning("Could not read {filename}: {err!r}".format(filename=filename, err=err))
+        return None
+
+
+class MetadataScanner(object):
+    """
+    Parse the metadata of many audio files concurrently.
+
+    Tag parsing mostly waits on I/O, so threads help a lot on network
+    storage; a process pool sidesteps the GIL when parsing itself is the
+    bottleneck (files parsed there are not counted in `scan_stats`).
+    Results always come back in input order.
+
+    """
+
+    def __init__(self, workers=1, processes=False):
+        self.workers = workers
+        self.processes = processes
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def read(self, filenames):
+        """Return an iterator of `EpisodeMetadata` (or None) for `filenames`, in order"""
+        if self.workers <= 1 or len(filenames) < 2:
+            return map(_read_metadata_or_none, filenames)
+        executor = self._get_executor()
+        if self.processes:
+            return executor.map(_read_metadata_or_none, filenames, chunksize=16)
+        return executor.map(_read_metadata_or_none, filenames)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.processes:
+                    # Workers may be started after the watcher threads exist,
+                    # so don't fork.
+                    self._executor = concurrent.futures.ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                        initializer=_set_cover_store, initargs=(cover_store,))
+                else:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=self.workers, thread_name_prefix='podcats-scan')
+            return self._executor
+
+
+def make_episodes(files, root_url, title_mode='default', force_order_by_name=False, metadata_cache=None,
+                  scanner=None):
+    """
+    Yield an `Episode` for every ``(filepath, relative_dir)`` in `files`.
+
+    With a multi-worker `scanner`, files missing from `metadata_cache` are
+    parsed concurrently; episodes are still yielded in input order. None is
+    yielded for files that disappeared in the meantime.
+
+    """
+    if scanner is None or scanner.workers <= 1:
+        for filepath, relative_dir in files:
+            try:
+                yield Episode(
+                    filepath, relative_dir, root_url, title_mode, force_order_by_name,
+                    metadata_cache=metadata_cache,
+                )
+            except OSError:
+                yield None
+        return
+
+    files = list(files)
+    stats = []
+    metadata = []
+    misses = []
+    for i, (filepath, _) in enumerate(files):
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            stat = None
+        cached = None
+        if stat is not None and metadata_cache is not None:
+            cached = _cached_metadata(metadata_cache, filepath, stat)
+        stats.append(stat)
+        metadata.append(cached)
+        if stat is not None and cached is None:
+            misses.append(i)
+
+    for i, parsed in zip(misses, scanner.read([files[i][0] for i in misses])):
+        metadata[i] = parsed
+        metrics.inc('podcats_files_parsed_total')
+        if parsed is not None and metadata_cache is not None:
+            metadata_cache.put(files[i][0], stats[i], parsed.as_dict())
+
+    for (filepath, relative_dir), stat, parsed in zip(files, stats, metadata):
+        if parsed is None:
+            yield None
+            continue
+        yield Episode(
+            filepath, relative_dir, root_url, title_mode, force_order_by_name,
+            metadata=parsed, stat=stat,
+        )
+
+
+#: Key function ordering episodes the way feeds list them.
+sort_key = operator.attrgetter('sort_key')
+
+
 class Episode(object):
-    """Podcast episode"""
+    """
+    Podcast episode.
+
+    Large libraries keep one of these per file in memory, so only what
+    feeds and pages are rendered from is kept, not the parsed tags.
+
+    """
 
-    def __init__(self, filename, relative_dir, root_url, title_mode='default', force_order_by_name=False):
+    __slots__ = (
+        'filename', 'relative_dir', 'root_url', 'title_mode', 'force_order_by_name', 'length', 'mtime_ns',
+        'id3_title', 'id3_comment', 'duration', 'mimetype', 'cover', 'date', 'sort_key', '_url',
+    )
+
+    def __init__(self, filename, relative_dir, root_url, title_mode='default', force_order_by_name=False,
+                 metadata_cache=None, metadata=None, stat=None):
         self.filename = filename
-        self.relative_dir = relative_dir
+        # Shared by all episodes in a directory
+        self.relative_dir = sys.intern(relative_dir)
         self.root_url = root_url
         self.title_mode = title_mode  # 'default', 'id3', or 'filename'
         self.force_order_by_name = force_order_by_name
-        self.length = os.path.getsize(filename)
 
-        try:
-            self.tags = mutagen.File(self.filename, easy=True) or {}
-        except HeaderNotFoundError as err:
-            self.tags = {}
-            logger.warning(
-                "Could not load tags of file {filename} due to: {err!r}".format(filename=self.filename, err=err)
-            )
+        if stat is None:
+            stat = os.stat(filename)
+        self.length = stat.st_size
+        self.mtime_ns = stat.st_mtime_ns
+
+        if metadata is None and metadata_cache is not None:
+            metadata = _cached_metadata(metadata_cache, filename, stat)
+        if metadata is None:
+            metadata = read_metadata(filename)
+            metrics.inc('podcats_files_parsed_total')
+            if metadata_cache is not None:
+                metadata_cache.put(filename, stat, metadata.as_dict())
+        self.id3_title = metadata.id3_title
+        self.id3_comment = metadata.id3_comment
+        self.duration = metadata.duration
+        self.mimetype = sys.intern(metadata.mimetype) if metadata.mimetype else metadata.mimetype
+        # Name of the embedded cover in the cover store. Cached names are only
+        # served when there is a cover store, so they are ignored without one.
+        self.cover = (metadata.cover or None) if cover_store is not None else None
+        metrics.inc('podcats_episodes_created_total')
+
+        # Computed once here rather than on every comparison while sorting.
+        self.date = self._compute_date(metadata.tags, stat.st_mtime)
+        if force_order_by_name:
+            self.sort_key = tuple(natural_sort_key(os.path.basename(filename)))
+        else:
+            self.sort_key = (self.date,)
 
-        try:
-            self.id3 = ID3(self.filename)
-        except Exception:
-            self.id3 = None
+        self._url = None
 
     def __lt__(self, other):
-        if self.force_order_by_name:
-            return natural_sort_key(os.path.basename(self.filename)) < natural_sort_key(os.path.basename(other.filename))
-        return self.date < other.date
+        return self.sort_key < other.sort_key
 
     def __gt__(self, other):
-        if self.force_order_by_name:
-            return natural_sort_key(os.path.basename(self.filename)) > natural_sort_key(os.path.basename(other.filename))
-        return self.date > other.date
+        return self.sort_key > other.sort_key
 
     def __eq__(self, other):
-        if self.force_order_by_name:
-            return natural_sort_key(os.path.basename(self.filename)) == natural_sort_key(os.path.basename(other.filename))
-        return self.date == other.date
+        return self.sort_key == other.sort_key
 
     def __le__(self, other):
-        return self < other or self == other
+        return self.sort_key <= other.sort_key
 
     def __ge__(self, other):
-        return self > other or self == other
+        return self.sort_key >= other.sort_key
+
+    def _fragment_key(self, kind, image_url):
+        """Return the `fragment_cache` key of this episode's `kind` fragment with `image_url`"""
+        return (kind, self.filename, self.length, self.mtime_ns, self.root_url, self.title_mode, image_url)
 
     def as_xml(self):
-        """Return episode item XML"""
+        """Return episode item XML, reused from `fragment_cache` if possible"""
+        image_url = self.image
+        key = self._fragment_key('xml', image_url)
+        xml = fragment_cache.get(key)
+        if xml is not None:
+            return xml
+
         filename = os.path.basename(self.filename)
         directory = os.path.split(os.path.dirname(self.filename))[-1]
-        template = jinja2_env.get_template('episode.xml')
-
-        return template.render(
+        xml = get_template('episode.xml').render(
             title=escape(self.title),
             url=quoteattr(self.url),
             guid=escape(self.url),
@@ -127,24 +673,31 @@ class Episode(object):
             length=self.length,
             file_size_human=humanize.naturalsize(self.length),
             date=formatdate(self.date),
-            image_url=self.image,
+            image_url=image_url,
             duration=self.duration,
             duration_formatted=self.duration_formatted,
             filename=filename,
             directory=directory,
         )
+        fragment_cache.put(key, xml)
+        return xml
 
     def as_html(self):
-        """Return episode item html"""
+        """Return episode item html, reused from `fragment_cache` if possible"""
+        image_url = self.cover_url(covers.WEB_SIZE)
+        key = self._fragment_key('html', image_url)
+        html = fragment_cache.get(key)
+        if html is not None:
+            return html
+
         filename = os.path.basename(self.filename)
         directory = os.path.split(os.path.dirname(self.filename))[-1]
-        template = jinja2_env.get_template('episode.html')
         try:
             date = formatdate(self.date)
         except ValueError:
             date = datetime.datetime.now(tz=datetime.timezone.utc)
 
-        return template.render(
+        html = get_template('episode.html').render(
             title=escape(self.title),
             url=self.url,
             filename=filename,
@@ -153,29 +706,20 @@ class Episode(object):
             length=self.length,
             file_size_human=humanize.naturalsize(self.length),
             date=date,
-            image_url=self.image,
+            image_url=image_url,
             duration=self.duration,
             duration_formatted=self.duration_formatted,
         )
-
-    def get_tag(self, name):
-        """Return episode file tag info"""
-        try:
-            return self.tags[name][0]
-        except (KeyError, IndexError):
-            pass
+        fragment_cache.put(key, html)
+        return html
 
     def _to_url(self, filepath):
-        fn = os.path.basename(filepath)
-        path_ = STATIC_PATH + '/' + self.relative_dir + '/' + fn
-        path_ = re.sub(r'//', '/', path_)
-
-        # Ensure we don't get double slashes when joining root_url and path
-        if self.root_url.endswith('/') and path_.startswith('/'):
-            path_ = path_[1:]  # Remove leading slash from path if root_url ends with slash
+        return static_url(self.root_url, self.relative_dir, os.path.basename(filepath))
 
-        url = self.root_url + quote(path_, errors="surrogateescape")
-        return url
+    @property
+    def mtime(self):
+        """Return the file's mtime as a unix timestamp"""
+        return self.mtime_ns / 1e9
 
     @property
     def title(self):
@@ -188,45 +732,37 @@ class Episode(object):
         
         if self.title_mode == 'id3':
             # Prefer ID3 tag, fall back to filename
-            if self.id3 is not None:
-                val = self.id3.getall('TIT2')
-                if len(val) > 0:
-                    title = str(val[0])
-                    # Optionally append comment if present
-                    comm = self.id3.getall('COMM')
-                    if len(comm) > 0:
-                        title += ' ' + str(comm[0])
-                    return title
+            if self.id3_title is not None:
+                title = self.id3_title
+                # Optionally append comment if present
+                if self.id3_comment is not None:
+                    title += ' ' + self.id3_comment
+                return title
             return filename_title
         
         # Default: concatenate filename + ID3 title + comment (original behavior)
         text = filename_title
-        if self.id3 is not None:
-            val = self.id3.getall('TIT2')
-            if len(val) > 0:
-                text += str(val[0])
-            val = self.id3.getall('COMM')
-            if len(val) > 0:
-                text += ' ' + str(val[0])
+        if self.id3_title is not None:
+            text += self.id3_title
+        if self.id3_comment is not None:
+            text += ' ' + self.id3_comment
         return text
 
     @property
     def url(self):
         """Return episode url"""
-        return self._to_url(self.filename)
+        if self._url is None:
+            self._url = self._to_url(self.filename)
+        return self._url
 
-    @property
-    def date(self):
-        """Return episode date as unix timestamp"""
+    def _compute_date(self, tags, mtime):
+        """Return episode date as unix timestamp, from the date tag in `tags` or else `mtime`"""
         # If force_order_by_name is enabled, create artificial dates based on natural sort order.
         # This is needed because podcast players typically sort episodes by date, so we generate
         # fake dates that follow the natural filename order to ensure proper episode sequencing.
         if self.force_order_by_name:
             base_name = os.path.splitext(os.path.basename(self.filename))[0]
             
-            # Create a base timestamp (Jan 1, 2020)
-            base_timestamp = time.mktime(time.strptime("2020-01-01", "%Y-%m-%d"))
-            
             # Extract the first number from the filename for day offset
             # e.g., "001 - Title" → 1, "002 - Title" → 2
             numbers = re.findall(r'\d+', base_name)
@@ -241,10 +777,13 @@ class Episode(object):
             # Convert to seconds (1 day = 86400 seconds)
             offset_seconds = day_offset * 86400
             
-            return base_timestamp + offset_seconds
+            return FORCED_ORDER_EPOCH + offset_seconds
         
         # For regular podcast episodes, use the original logic
-        dt = self.get_tag('date')
+        try:
+            dt = tags['date'][0]
+        except (KeyError, IndexError):
+            dt = None
         if dt:
             formats = [
                 '%Y-%m-%d:%H:%M:%S',
@@ -264,50 +803,27 @@ class Episode(object):
                 dt = None
 
         if not dt:
-            dt = os.path.getmtime(self.filename)
+            dt = mtime
 
         return dt
 
-    @property
-    def mimetype(self):
-        """Return file mimetype name"""
-        if self.filename.endswith('m4b'):
-            return 'audio/x-m4b'
-        else:
-            return mimetypes.guess_type(self.filename)[0]
-
     @property
     def image(self):
-        """Return an eventual cover image"""
-        directory = os.path.split(self.filename)[0]
-        image_files = []
-
-        for fn in os.listdir(directory):
-            ext = os.path.splitext(fn)[1]
-            if ext.lower() in BOOK_COVER_EXTENSIONS:
-                image_files.append(fn)
-
-        if len(image_files) > 0:
-            abs_path_image = os.path.join(directory, image_files[0])
-            return self._to_url(abs_path_image)
-        else:
-            return None
-
-    @property
-    def duration(self):
-        """Return episode duration in seconds"""
-        try:
-            audio = mutagen.File(self.filename)
-            if audio and hasattr(audio, "info") and hasattr(audio.info, "length"):
-                return int(audio.info.length)
-            return None
-        except Exception as err:
-            logger.warning(
-                "Could not get duration of file {filename} due to: {err!r}".format(
-                    filename=self.filename, err=err
-                )
-            )
-            return None
+        """Return the URL of an eventual cover image for feeds"""
+        return self.cover_url(covers.FEED_SIZE)
+
+    def cover_url(self, size=None):
+        """
+        Return the URL of the cover image next to the episode or else the
+        one embedded in it, or of a thumbnail of at most `size` pixels.
+
+        """
+        cover, version = cover_cache.lookup(os.path.dirname(self.filename))
+        if cover is not None:
+            return cover_file_url(self.root_url, self.relative_dir, cover, version, size)
+        if self.cover is not None:
+            return embedded_cover_url(self.root_url, self.cover, size)
+        return None
 
     @property
     def duration_formatted(self):
@@ -325,10 +841,384 @@ class Episode(object):
             return "{:02d}:{:02d}".format(minutes, seconds)
 
 
+class _IndexedDirectory(object):
+    """A directory's mtime and the episodes found directly in it"""
+
+    __slots__ = ('mtime_ns', 'episodes', 'subdirs', 'version', 'last_modified')
+
+    def __init__(self, mtime_ns, episodes, subdirs, version, last_modified):
+        self.mtime_ns = mtime_ns
+        self.episodes = episodes  # filename -> Episode
+        self.subdirs = subdirs  # set of absolute paths
+        self.version = version  # index generation of the last change
+        self.last_modified = last_modified  # unix timestamp
+
+
+class ChangeSet(collections.namedtuple('ChangeSet', 'added removed modified')):
+    """The paths of the episode files a scan found added, removed and modified, sorted"""
+
+    __slots__ = ()
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.modified)
+
+
+class LibraryIndex(object):
+    """
+    Long-lived in-memory index of every episode in a library.
+
+    The index is built once and then refreshed per directory, either when
+    a watcher reports changes or when a directory's mtime differs from the
+    one recorded at the last scan, so serving a feed never walks the disk.
+
+    Every build or refresh returns a `ChangeSet`, which is also passed to
+    the callbacks registered with `subscribe` if anything changed.
+
+    """
+
+    def __init__(self, root_dir, root_url, title_mode='default', force_order_by_name=False, metadata_cache=None,
+                 scanner=None):
+        self.root_dir = os.path.normpath(root_dir)
+        self.root_url = root_url
+        self.title_mode = title_mode
+        self.force_order_by_name = force_order_by_name
+        self.metadata_cache = metadata_cache
+        self.scanner = scanner
+        self._directories = {}
+        # Symlinked subfolders of the root, followed for their folder feeds
+        self._linked = set()
+        self._lock = threading.RLock()
+        # Serializes builds and refreshes. Only they change `_directories`, so
+        # they read it without `_lock` and only take `_lock` to change it, not
+        # while they list directories or parse files.
+        self._update_lock = threading.Lock()
+        self._watcher = None
+        self._watching = False
+        self.poll_interval = 5.0
+        self._generation = 0
+        self._last_modified = 0
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Call `callback` with the `ChangeSet` of every later build or refresh that changed anything"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def build(self):
+        """Scan the whole library and return a `ChangeSet` of what it found"""
+        with metrics.timer('podcats_scan_seconds', source='index'), self._update_lock:
+            changes = ChangeSet(set(), set(), set())
+            pending = []
+            for indexed in self._directories.values():
+                changes.removed.update(indexed.episodes)
+            with self._lock:
+                self._directories.clear()
+            self._scan(self.root_dir, pending, changes)
+            self._load(pending, changes)
+        return self._finish(changes)
+
+    def refresh(self, directories=None):
+        """
+        Re-scan changed directories.
+
+        `directories` are re-listed unconditionally (a file inside may have
+        been rewritten without touching the directory mtime); when None,
+        every known directory whose mtime changed is re-listed instead.
+        Return a `ChangeSet` of the episode files added, removed and modified.
+
+        """
+        with metrics.timer('podcats_scan_seconds', source='index'), self._update_lock:
+            changes = ChangeSet(set(), set(), set())
+            pending = []
+            if directories is None:
+                directories = []
+                for directory, indexed in list(self._directories.items()):
+                    try:
+                        mtime_ns = os.stat(directory).st_mtime_ns
+                    except OSError:
+                        mtime_ns = None
+                    if mtime_ns != indexed.mtime_ns:
+                        directories.append(directory)
+            for directory in directories:
+                directory = os.path.normpath(directory)
+                if directory in self._directories or directory == self.root_dir:
+                    self._scan(directory, pending, changes)
+            self._load(pending, changes)
+        return self._finish(changes)
+
+    def _finish(self, changes):
+        """Flush the metadata cache, notify subscribers and return `changes` as sorted lists"""
+        # A file found again by a rebuild may have changed in the meantime.
+        changes.modified.update(changes.added & changes.removed)
+        changes.added.difference_update(changes.modified)
+        changes.removed.difference_update(changes.modified)
+        changes = ChangeSet(*(sorted(paths) for paths in changes))
+        if self.metadata_cache is not None:
+            self.metadata_cache.discard(changes.removed)
+            self.metadata_cache.flush()
+        if changes:
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for callback in subscribers:
+                try:
+                    callback(changes)
+                except Exception:
+                    logger.exception('Library change subscriber {callback!r} failed'.format(callback=callback))
+        return changes
+
+    def episodes(self, folder_path=None):
+        """Return all episodes, or only those directly inside `folder_path`"""
+        with self._lock:
+            if folder_path:
+                indexed = self._directories.get(os.path.normpath(os.path.join(self.root_dir, folder_path)))
+                return list(indexed.episodes.values()) if indexed else []
+            return [
+                episode
+                for directory, indexed in self._directories.items()
+                if not self._through_link(directory)
+                for episode in indexed.episodes.values()
+            ]
+
+    def __len__(self):
+        with self._lock:
+            return sum(
+                len(indexed.episodes)
+                for directory, indexed in self._directories.items()
+                if not self._through_link(directory)
+            )
+
+    def _through_link(self, directory):
+        """
+        Whether `directory` was reached through a symlinked subfolder.
+
+        Like walking the root, the library-wide feed does not follow
+        symlinks; only the folder feeds of linked subfolders include them.
+
+        """
+        return any(
+            directory == link or directory.startswith(link + os.sep)
+            for link in self._linked
+        )
+
+    def _follow_link(self, path):
+        """Whether the symlinked subfolder `path` of the root can be indexed without looping"""
+        try:
+            target = os.path.realpath(path)
+            root = os.path.realpath(self.root_dir)
+            return os.path.commonpath([target, root]) != target
+        except (OSError, ValueError):
+            return False
+
+    def folders(self):
+        """Return the names of the root's immediate subfolders that directly contain episodes"""
+        with self._lock:
+            return [
+                os.path.basename(directory)
+                for directory, indexed in self._directories.items()
+                if indexed.episodes and os.path.dirname(directory) == self.root_dir
+            ]
+
+    def count(self, folder_path=None):
+        """Return the number of episodes, or of those directly inside `folder_path`"""
+        if not folder_path:
+            return len(self)
+        with self._lock:
+            indexed = self._directories.get(os.path.normpath(os.path.join(self.root_dir, folder_path)))
+            return len(indexed.episodes) if indexed else 0
+
+    def state(self, folder_path=None):
+        """
+        Return ``(version, last_modified)`` for the library or one folder.
+
+        `version` changes whenever the episodes (or the directory listing)
+        change, so it can be used to invalidate anything rendered from them.
+        `last_modified` is a unix timestamp that never goes backwards.
+
+        """
+        with self._lock:
+            if folder_path:
+                indexed = self._directories.get(os.path.normpath(os.path.join(self.root_dir, folder_path)))
+                if indexed is None:
+                    return None, None
+                return indexed.version, indexed.last_modified
+            return self._generation, self._last_modified
+
+    def start_watching(self, poll_interval=5.0):
+        """Keep the index up to date in a background thread"""
+        self.poll_interval = poll_interval
+        with self._lock:
+            self._watcher = watch.create_watcher(self.refresh, poll_interval=poll_interval)
+            for directory in self._directories:
+                if not self._watch(directory):
+                    break
+            self._watcher.start()
+            self._watching = True
+
+    def stop_watching(self):
+        with self._lock:
+            watcher, self._watcher = self._watcher, None
+            self._watching = False
+        if watcher is not None:
+            watcher.stop()
+
+    def _watch(self, directory):
+        if self._watcher is None:
+            return True
+        try:
+            self._watcher.add(directory)
+            return True
+        except OSError as err:
+            logger.warning(
+                'Could not watch {directory} ({err!r}), polling for changes instead'.format(
+                    directory=directory, err=err)
+            )
+            watcher, self._watcher = self._watcher, watch.PollingWatcher(
+                self.refresh, interval=self.poll_interval)
+            # Also releases the watches it already holds if it never started.
+            watcher.stop()
+            if self._watching:
+                self._watcher.start()
+            return False
+
+    def _unwatch(self, directory):
+        if self._watcher is not None:
+            self._watcher.remove(directory)
+
+    def _forget(self, directory, changes):
+        indexed = self._directories.pop(directory, None)
+        if indexed is not None:
+            self._generation += 1
+            self._last_modified = max(self._last_modified, time.time())
+            self._unwatch(directory)
+            changes.removed.update(indexed.episodes)
+            for subdir in indexed.subdirs:
+                self._forget(subdir, changes)
+
+    def _scan(self, directory, pending, changes):
+        """
+        (Re-)list `directory` and, recursively, any new subdirectories.
+
+        Episodes of unchanged files are reused; new or modified files are
+        appended to `pending` as ``(directory, filepath, relative_dir)``
+        for `_load` to parse in one batch, and modified files keep their
+        old episode until then. Files are recorded in `changes`.
+
+        The directory is listed without holding `_lock`; it is only taken
+        to install the result.
+
+        """
+        previous = self._directories.get(directory)
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+            entries = list(os.scandir(directory))
+        except OSError:
+            with self._lock:
+                self._forget(directory, changes)
+            return
+
+        relative_dir = directory[len(self.root_dir):]
+        episodes = {}
+        subdirs = set()
+        linked = set()
+        changed = previous is None or mtime_ns != previous.mtime_ns
+        newest = mtime_ns / 1e9
+        for entry in sorted(entries, key=lambda e: e.name):
+            try:
+                if entry.is_dir():
+                    if not entry.is_symlink():
+                        subdirs.add(entry.path)
+                    elif directory == self.root_dir and self._follow_link(entry.path):
+                        subdirs.add(entry.path)
+                        linked.add(entry.path)
+                    continue
+                if not is_audio_file(entry.path):
+                    continue
+                stat = entry.stat()
+            except OSError:
+                continue
+            newest = max(newest, stat.st_mtime)
+            episode = previous.episodes.get(entry.path) if previous else None
+            if episode is None or (episode.length, episode.mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+                if previous is not None and entry.path in previous.episodes:
+                    changes.modified.add(entry.path)
+                else:
+                    changes.added.add(entry.path)
+                # Replaced by _load()
+                pending.append((directory, entry.path, relative_dir))
+                changed = True
+                if episode is None:
+                    continue
+            episodes[entry.path] = episode
+        if previous is not None and episodes.keys() != previous.episodes.keys():
+            changes.removed.update(previous.episodes.keys() - episodes.keys())
+            changed = True
+
+        with self._lock:
+            if directory == self.root_dir:
+                self._linked = linked
+            if previous is None:
+                self._generation += 1
+                version = self._generation
+                last_modified = newest
+            elif changed:
+                self._generation += 1
+                version = self._generation
+                last_modified = max(previous.last_modified, time.time())
+            else:
+                version = previous.version
+                last_modified = previous.last_modified
+            self._last_modified = max(self._last_modified, last_modified)
+
+            self._directories[directory] = _IndexedDirectory(mtime_ns, episodes, subdirs, version, last_modified)
+            if previous is None:
+                self._watch(directory)
+
+            for subdir in (previous.subdirs - subdirs) if previous else ():
+                self._forget(subdir, changes)
+        for subdir in subdirs:
+            if previous is None or subdir not in previous.subdirs or subdir not in self._directories:
+                self._scan(subdir, pending, changes)
+
+    def _load(self, pending, changes):
+        """
+        Create the episodes `_scan` left pending, parsing them in parallel if
+        possible, and install them in the index under `_lock`.
+
+        """
+        episodes = list(make_episodes(
+            ((filepath, relative_dir) for _, filepath, relative_dir in pending),
+            self.root_url, self.title_mode, self.force_order_by_name,
+            metadata_cache=self.metadata_cache, scanner=self.scanner,
+        ))
+        with self._lock:
+            changed = []
+            for (directory, filepath, _), episode in zip(pending, episodes):
+                indexed = self._directories.get(directory)
+                if indexed is None:
+                    continue
+                if episode is None:
+                    # Removed while we were scanning
+                    indexed.episodes.pop(filepath, None)
+                    if filepath in changes.modified:
+                        changes.removed.add(filepath)
+                    changes.added.discard(filepath)
+                    changes.modified.discard(filepath)
+                else:
+                    indexed.episodes[filepath] = episode
+                changed.append(indexed)
+            if changed:
+                # Anything rendered while the files were being parsed is stale.
+                self._generation += 1
+                for indexed in changed:
+                    indexed.version = self._generation
+            metrics.set_gauge('podcats_library_episodes', len(self))
+
+
 class Channel(object):
     """Podcast channel"""
 
-    def __init__(self, root_dir, root_url, host, port, title, link, debug=False, folder_path=None, title_mode='default', force_order_by_name=False):
+    def __init__(self, root_dir, root_url, host, port, title, link, debug=False, folder_path=None, title_mode='default', force_order_by_name=False,
+                 metadata_cache=None, library_index=None, scanner=None, max_items=None, page_size=None):
         self.root_dir = root_dir or os.getcwd()
         self.root_url = root_url
         self.host = host
@@ -345,16 +1235,52 @@ class Channel(object):
         self.debug = debug
         self.title_mode = title_mode
         self.force_order_by_name = force_order_by_name
+        self.metadata_cache = metadata_cache
+        self.library_index = library_index
+        self.scanner = scanner
+        self.max_items = max_items  # Optional: only list the newest N episodes
+        self.page_size = page_size  # Optional: split the feed into RFC 5005 pages
 
     def __iter__(self):
+        if self.library_index is not None:
+            for episode in self.library_index.episodes(self.folder_path):
+                yield episode
+            return
+
+        walk_dir = self._walk_dir()
+        if walk_dir is None:
+            return
+
+        start = time.perf_counter()
+        count = 0
+        try:
+            episodes = make_episodes(
+                self._walk(walk_dir), self.root_url, self.title_mode, self.force_order_by_name,
+                metadata_cache=self.metadata_cache, scanner=self.scanner,
+            )
+            for episode in episodes:
+                if episode is not None:
+                    count += 1
+                    yield episode
+            if not self.folder_path:
+                metrics.set_gauge('podcats_library_episodes', count)
+        finally:
+            if self.metadata_cache is not None:
+                self.metadata_cache.flush()
+            metrics.observe('podcats_scan_seconds', time.perf_counter() - start, source='walk')
+
+    def _walk_dir(self):
+        """Return the directory to walk, or None if it does not exist"""
         # If folder_path is specified, only walk that specific subfolder
         if self.folder_path:
             walk_dir = os.path.join(self.root_dir, self.folder_path)
             if not os.path.exists(walk_dir):
-                return
-        else:
-            walk_dir = self.root_dir
+                return None
+            return walk_dir
+        return self.root_dir
 
+    def _walk(self, walk_dir):
+        """Yield ``(filepath, relative_dir)`` for every audio file to include"""
         for root, _, files in os.walk(walk_dir):
             relative_dir = root[len(self.root_dir):]
 
@@ -367,38 +1293,142 @@ class Channel(object):
             for fn in files:
                 filepath = os.path.join(root, fn)
                 if is_audio_file(filepath):
-                    yield Episode(filepath, relative_dir, self.root_url, self.title_mode, self.force_order_by_name)
-
-    def as_xml(self):
-        """Return channel XML with all episode items"""
-        template = jinja2_env.get_template('feed.xml')
+                    yield filepath, relative_dir
+
+    def fingerprint(self):
+        """
+        Return a digest of everything this channel's output is rendered from.
+
+        Only directory listings and file stats are needed, so this is cheap
+        enough to decide whether an exported feed needs rewriting.
+
+        """
+        digest = hashlib.sha1(repr((
+            __version__, templates_fingerprint(), self.root_url, self.title, self.link, self.description,
+            self.title_mode, self.force_order_by_name, self.max_items, self.page_size,
+        )).encode('utf-8', 'surrogateescape'))
+        walk_dir = self._walk_dir()
+        if walk_dir is None:
+            return digest.hexdigest()
+        directories = set()
+        for filepath, _ in sorted(self._walk(walk_dir)):
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                continue
+            directories.add(os.path.dirname(filepath))
+            digest.update(repr((filepath, stat.st_size, stat.st_mtime_ns)).encode('utf-8', 'surrogateescape'))
+        for directory in sorted(directories):
+            digest.update(repr((directory, cover_cache.find(directory))).encode('utf-8', 'surrogateescape'))
+        return digest.hexdigest()
+
+    def state(self):
+        """Return ``(version, last_modified)`` of the episodes, see `LibraryIndex.state`"""
+        if self.library_index is None:
+            return None, None
+        return self.library_index.state(self.folder_path)
 
-        # Get all episodes and sort them
-        episodes = sorted(self)
+    @property
+    def feed_url(self):
+        """Return the URL this channel's RSS feed is served at"""
+        if self.folder_path:
+            return self.root_url + "/feed/" + quote(self.folder_path, safe="")
+        return self.root_url + "/"
+
+    def select_episodes(self, page=None, paged=True):
+        """
+        Return ``(episodes, has_next)`` for the requested page, oldest first.
+
+        Only the newest `max_items` episodes are included and, when
+        `page_size` is set and `paged` is true, only the `page`-th slice of
+        those counting from the newest. The slice is picked with a heap, so
+        only the episodes actually listed get fully sorted.
+
+        """
+        paged = paged and self.page_size
+        limit = self.max_items
+        if paged:
+            page = page or 1
+            limit = min(limit or page * self.page_size, page * self.page_size)
+        if limit is None:
+            return sorted(self, key=sort_key), False
+
+        episodes = list(self)
+        newest = heapq.nlargest(limit, episodes, key=sort_key)
+        has_next = False
+        if paged:
+            total = len(episodes) if self.max_items is None else min(len(episodes), self.max_items)
+            newest = newest[(page - 1) * self.page_size:]
+            has_next = total > page * self.page_size
+        return sorted(newest, key=sort_key), has_next
+
+    def page_links(self, page, has_next):
+        """Return the RFC 5005 ``(rel, href)`` links for `page`"""
+        if not self.page_size:
+            return []
+        page = page or 1
+        page_url = self.feed_url + '?page={}'
+        links = [('self', page_url.format(page)), ('first', self.feed_url)]
+        if page > 1:
+            links.append(('previous', page_url.format(page - 1)))
+        if has_next:
+            links.append(('next', page_url.format(page + 1)))
+        return links
+
+    def iter_xml(self, page=None, page_links=True):
+        """
+        Generate channel XML piece by piece.
+
+        The channel header is yielded first and then each ``<item>`` as it
+        is rendered, so the whole document never has to be held in memory.
+        Without `page_links`, the RFC 5005 links to other pages are left out.
+
+        """
+        template = get_template('feed.xml')
+
+        episodes, has_next = self.select_episodes(page)
 
         # Get the first episode's image URL if available
         image_url = None
         if episodes:
             image_url = episodes[0].image
 
-        return template.render(
+        return template.generate(
             title=escape(self.title),
             description=escape(self.description),
             link=escape(self.link),
             image_url=image_url,
-            items=u''.join(episode.as_xml() for episode in episodes)
-        ).strip()
+            page_links=[(rel, escape(href)) for rel, href in self.page_links(page, has_next)] if page_links else [],
+            items=(episode.as_xml() for episode in episodes),
+        )
+
+    def as_xml(self, page=None, page_links=True):
+        """Return channel XML with all episode items (or one page of them)"""
+        with metrics.timer('podcats_render_seconds', template='feed.xml'):
+            return u''.join(self.iter_xml(page, page_links=page_links)).strip()
+
+    def has_page(self, page):
+        """Return whether `page` exists (the first page always does)"""
+        if page is None or page == 1:
+            return True
+        if not self.page_size or page < 1:
+            return False
+        total = sum(1 for _ in self)
+        if self.max_items is not None:
+            total = min(total, self.max_items)
+        return (page - 1) * self.page_size < total
 
     def as_html(self, index_url=None):
-        """Return channel HTML with all episode items"""
-        template = jinja2_env.get_template('feed.html')
-        return template.render(
-            title=escape(self.title),
-            description=self.description,
-            link=escape(self.link),
-            items=u''.join(episode.as_html() for episode in sorted(self)),
-            index_url=index_url,
-        ).strip().encode("utf-8", "surrogateescape")
+        """Return channel HTML with all episode items (the newest `max_items`, but never paged)"""
+        template = get_template('feed.html')
+        with metrics.timer('podcats_render_seconds', template='feed.html'):
+            return template.render(
+                title=escape(self.title),
+                description=self.description,
+                link=escape(self.link),
+                items=u''.join(episode.as_html() for episode in self.select_episodes(paged=False)[0]),
+                index_url=index_url,
+            ).strip().encode("utf-8", "surrogateescape")
 
 
 class FolderChannel(object):
@@ -415,6 +1445,11 @@ class FolderChannel(object):
         debug=False,
         title_mode='default',
         force_order_by_name=False,
+        metadata_cache=None,
+        library_index=None,
+        scanner=None,
+        max_items=None,
+        page_size=None,
     ):
         self.root_dir = root_dir or os.getcwd()
         self.root_url = root_url
@@ -425,36 +1460,70 @@ class FolderChannel(object):
         self.debug = debug
         self.title_mode = title_mode
         self.force_order_by_name = force_order_by_name
-        self._folders = None
+        self.metadata_cache = metadata_cache
+        self.library_index = library_index
+        self.scanner = scanner
+        self.max_items = max_items
+        self.page_size = page_size
+        self._folders = []
+        self._folder_set = frozenset()
+        # Root mtime or index version the subfolder list was read at
+        self._folders_key = None
+        # Subfolder name -> (mtime_ns, has audio files), without an index
+        self._subdirs = {}
+        self._folders_lock = threading.Lock()
 
     def get_folders(self):
-        """Get list of immediate subfolders that contain audio files"""
-        if self._folders is not None:
+        """
+        Get list of immediate subfolders that contain audio files.
+
+        With a library index the list is rebuilt whenever the index changes.
+        Otherwise the root is only listed again when its mtime changed, and
+        a subfolder only searched for audio files when its own mtime did.
+
+        """
+        with self._folders_lock:
+            if self.library_index is not None:
+                version = self.library_index.state()[0]
+                if version != self._folders_key:
+                    self._set_folders(self.library_index.folders())
+                    self._folders_key = version
+            else:
+                self._refresh_folders()
             return self._folders
 
-        folders = []
+    def _refresh_folders(self):
         try:
-            for item in os.listdir(self.root_dir):
-                item_path = os.path.join(self.root_dir, item)
-                if os.path.isdir(item_path):
-                    # Check if folder contains audio files
-                    has_audio = False
-                    for fn in os.listdir(item_path):
-                        filepath = os.path.join(item_path, fn)
-                        if os.path.isfile(filepath) and is_audio_file(filepath):
-                            has_audio = True
-                            break
-                    if has_audio:
-                        folders.append(item)
+            root_mtime_ns = os.stat(self.root_dir).st_mtime_ns
+            if root_mtime_ns != self._folders_key:
+                with os.scandir(self.root_dir) as entries:
+                    names = [entry.name for entry in entries if entry.is_dir()]
+                self._subdirs = {name: self._subdirs.get(name) for name in names}
+                self._folders_key = root_mtime_ns
         except OSError:
-            pass
-
-        self._folders = sorted(folders)
-        return self._folders
+            self._subdirs = {}
+            self._folders_key = None
+
+        for name, known in self._subdirs.items():
+            directory = os.path.join(self.root_dir, name)
+            try:
+                mtime_ns = os.stat(directory).st_mtime_ns
+            except OSError:
+                mtime_ns = None
+            if known is None or known[0] != mtime_ns:
+                self._subdirs[name] = (mtime_ns, mtime_ns is not None and has_audio_files(directory))
+        self._set_folders(name for name, (_, has_audio) in self._subdirs.items() if has_audio)
+
+    def _set_folders(self, folders):
+        folder_set = frozenset(folders)
+        if folder_set != self._folder_set:
+            self._folder_set = folder_set
+            self._folders = sorted(folder_set)
 
     def get_channel(self, folder_name):
         """Get a Channel instance for a specific folder"""
-        if folder_name not in self.get_folders():
+        self.get_folders()
+        if folder_name not in self._folder_set:
             return None
 
         folder_title = self.title or folder_name
@@ -469,77 +1538,332 @@ class FolderChannel(object):
             folder_path=folder_name,
             title_mode=self.title_mode,
             force_order_by_name=self.force_order_by_name,
+            metadata_cache=self.metadata_cache,
+            library_index=self.library_index,
+            scanner=self.scanner,
+            max_items=self.max_items,
+            page_size=self.page_size,
         )
 
+    def state(self):
+        """Return ``(version, last_modified)`` of the whole library, see `LibraryIndex.state`"""
+        if self.library_index is None:
+            return None, None
+        return self.library_index.state()
+
     def as_html_index(self):
         """Return HTML index page listing all folder feeds"""
-        template = jinja2_env.get_template('folder_index.html')
-        folders = self.get_folders()
-
-        # Build folder info list
-        folder_info = []
-        for folder in folders:
-            channel = self.get_channel(folder)
-            episodes = list(channel)
-            image_url = None
-            if episodes:
-                # Sort episodes to get the first one consistently
-                sorted_episodes = sorted(episodes)
-                image_url = sorted_episodes[0].image
-            folder_info.append(
-                {
-                    'name': folder,
-                    'url': '/feed/' + quote(folder, safe=''),
-                    'web_url': '/web/' + quote(folder, safe=''),
-                    'rss_full_url': self.root_url + '/feed/' + quote(folder, safe=''),
-                    'episode_count': len(episodes),
-                    'image_url': image_url,
-                }
-            )
+        template = get_template('folder_index.html')
+        with metrics.timer('podcats_render_seconds', template='folder_index.html'):
+            folders = self.get_folders()
+
+            # Build folder info list from directory listings and the index;
+            # episodes are only parsed when a folder's own feed or page is requested.
+            folder_info = []
+            for folder in folders:
+                directory = os.path.join(self.root_dir, folder)
+                if self.library_index is not None:
+                    episode_count = self.library_index.count(folder)
+                else:
+                    episode_count = count_audio_files(directory)
+                cover, version = cover_cache.lookup(directory)
+                if cover is not None:
+                    image_url = cover_file_url(self.root_url, '/' + folder, cover, version, covers.WEB_SIZE)
+                elif self.library_index is not None:
+                    image_url = next((
+                        episode.cover_url(covers.WEB_SIZE)
+                        for episode in self.library_index.episodes(folder) if episode.cover is not None
+                    ), None)
+                else:
+                    image_url = None
+                folder_info.append(
+                    {
+                        'name': folder,
+                        'url': '/feed/' + quote(folder, safe=''),
+                        'web_url': '/web/' + quote(folder, safe=''),
+                        'rss_full_url': self.root_url + '/feed/' + quote(folder, safe=''),
+                        'episode_count': episode_count,
+                        'image_url': image_url,
+                    }
+                )
 
-        return (
-            template.render(
-                title=escape(self.title or 'Podcast Feeds'),
-                folders=folder_info,
-                root_url=self.root_url,
+            return (
+                template.render(
+                    title=escape(self.title or 'Podcast Feeds'),
+                    folders=folder_info,
+                    root_url=self.root_url,
+                )
+                .strip()
+                .encode('utf-8', 'surrogateescape')
             )
-            .strip()
-            .encode('utf-8', 'surrogateescape')
-        )
 
 
-def serve(channel):
+def cached_response(feed_cache, key, state, render, content_type):
+    """
+    Return a conditional response for a rendered feed or page.
+
+    `render` is only called when `feed_cache` holds no copy rendered from
+    the current library `state`, and clients whose ``If-None-Match`` or
+    ``If-Modified-Since`` still match get a 304 without any rendering.
+    The body is compressed if the client accepts it, once per rendering.
+
+    """
+    version, last_modified = state
+    entry = feed_cache.get(key, version) if version is not None else None
+    if entry is None:
+        body = render()
+        if isinstance(body, str):
+            body = body.encode('utf-8', 'surrogateescape')
+        if version is not None:
+            entry = feed_cache.put(key, version, body, last_modified)
+        else:
+            entry = RenderedFeed(version, body, last_modified)
+
+    encoding = None
+    if len(entry.body) >= compression.MIN_SIZE:
+        encoding = compression.choose_encoding(request.accept_encodings)
+    if encoding:
+        response = Response(entry.compressed(encoding), content_type=content_type)
+        response.content_encoding = encoding
+        response.set_etag('{}-{}'.format(entry.etag, encoding))
+    else:
+        response = Response(entry.body, content_type=content_type)
+        response.set_etag(entry.etag)
+    response.vary.add('Accept-Encoding')
+    if entry.last_modified:
+        response.last_modified = entry.last_modified
+    return response.make_conditional(request)
+
+
+_process_token = (None, None)
+
+
+def process_token():
+    """
+    Return a random token unique to this process.
+
+    Library versions are counted per process, so ETags derived from them
+    include it: the same version means different content after a restart
+    or in another gunicorn worker.
+
+    """
+    global _process_token
+    pid, token = _process_token
+    if pid != os.getpid():
+        pid, token = _process_token = (os.getpid(), secrets.token_hex(4))
+    return token
+
+
+def streamed_response(state, generate, content_type):
+    """
+    Return a response whose body is produced by `generate` as it is sent.
+
+    Nothing is cached, so validators are derived from the library `state`
+    and `process_token` instead of the body; matching conditional requests
+    still get a 304 without `generate` being called. The body is compressed
+    as it is sent if the client accepts it.
+
+    """
+    version, last_modified = state
+    encoding = compression.choose_encoding(request.accept_encodings)
+
+    def encoded():
+        # A generator function, so `generate` only runs once the body is sent.
+        for chunk in generate():
+            yield chunk.encode('utf-8', 'surrogateescape')
+
+    body = encoded()
+    if encoding:
+        body = compression.compress_stream(body, encoding)
+    response = Response(stream_with_context(body), content_type=content_type)
+    # Keep make_conditional() from buffering the body to compute a Content-Length.
+    response.implicit_sequence_conversion = False
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    if version is not None:
+        etag = '{}-{}-{}'.format(process_token(), version, int(last_modified))
+        response.set_etag(etag + '-' + encoding if encoding else etag, weak=True)
+        response.last_modified = last_modified
+    return response.make_conditional(request)
+
+
+def feed_response(channel, feed_cache, stream=False):
+    """Return the response for `channel`'s RSS feed, honouring ``?page=N``"""
+    page = request.args.get('page', type=int) if channel.page_size else None
+    if not channel.has_page(page):
+        return Response('Page not found', status=404)
+    if stream:
+        return streamed_response(channel.state(), lambda: channel.iter_xml(page), XML_CONTENT_TYPE)
+    return cached_response(
+        feed_cache, ('xml', channel.folder_path, page), channel.state(), lambda: channel.as_xml(page),
+        XML_CONTENT_TYPE)
+
+
+def add_media_route(server, root_dir):
+    """Serve the files below `root_dir` from `STATIC_PATH` on `server`"""
+
+    @server.route(STATIC_PATH + '/<path:filename>')
+    def media(filename):
+        response = send_media(request, root_dir, filename, mimetype=guess_mimetype(filename))
+        if request.method != 'HEAD' and response.status_code in (200, 206):
+            metrics.inc('podcats_static_bytes_total', response.content_length or 0)
+        return response
+
+
+def add_cover_routes(server, root_dir):
+    """
+    Serve extracted covers from `COVERS_PATH`, and thumbnails of them and
+    of the cover images below `root_dir` from `THUMBNAILS_PATH`.
+
+    """
+
+    @server.route(COVERS_PATH + '/<name>')
+    def embedded_cover(name):
+        if cover_store is None or cover_store.path(name) is None:
+            return Response('Cover not found', status=404)
+        return _immutable(send_media(request, cover_store.directory, name))
+
+    @server.route(COVERS_PATH + '/<int:size>/<name>')
+    def embedded_cover_thumbnail(size, name):
+        source = cover_store.path(name) if cover_store is not None and size in covers.SIZES else None
+        if source is None or not os.path.exists(source):
+            return Response('Cover not found', status=404)
+        thumbnail = cover_store.thumbnail(source, name, size)
+        if thumbnail is None:
+            return _immutable(send_media(request, cover_store.directory, name))
+        return _immutable(send_media(request, cover_store.thumbnails_dir, thumbnail, mimetype='image/jpeg'))
+
+    @server.route(THUMBNAILS_PATH + '/<int:size>/<path:filename>')
+    def cover_thumbnail(size, filename):
+        source = safe_join(root_dir, filename)
+        if (cover_store is None or size not in covers.SIZES or source is None
+                or os.path.splitext(source)[1].lower() not in BOOK_COVER_EXTENSIONS):
+            return Response('Cover not found', status=404)
+        try:
+            version = file_version(os.stat(source))
+        except OSError:
+            return Response('Cover not found', status=404)
+        thumbnail = cover_store.thumbnail(source, source + '\0' + version, size)
+        if thumbnail is None:
+            response = send_media(request, root_dir, filename)
+        else:
+            response = send_media(request, cover_store.thumbnails_dir, thumbnail, mimetype='image/jpeg')
+        # Only URLs naming the current version of the file stay valid.
+        if request.args.get('v') == version:
+            _immutable(response)
+        return response
+
+
+def _immutable(response):
+    if response.status_code in (200, 206, 304):
+        response.headers['Cache-Control'] = covers.IMMUTABLE_CACHE_CONTROL
+    return response
+
+
+def add_metrics(server):
+    """Record every request to `server` and expose the metrics at `METRICS_PATH`"""
+
+    @server.before_request
+    def start_request():
+        g.metrics_start = metrics.start_request()
+
+    @server.after_request
+    def finish_request(response):
+        metrics.finish_request(
+            g.metrics_start, request.method, request.path, response.status_code, endpoint=request.endpoint)
+        return response
+
+    @server.route(METRICS_PATH)
+    def show_metrics():
+        return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+def create_app(channel, stream=False, profiler=None):
+    """
+    Return a Flask app serving the podcast channel and its episodes.
+
+    With `stream`, the feed is sent item by item as it is rendered instead
+    of being rendered in full and cached. With a `profiler`, every request
+    except media and cover downloads is profiled.
+
+    """
+    server = Flask(__name__, static_folder=None)
+    feed_cache = FeedCache()
+    add_media_route(server, channel.root_dir)
+    add_cover_routes(server, channel.root_dir)
+    add_metrics(server)
+
+    @server.route('/')
+    def feed():
+        return feed_response(channel, feed_cache, stream)
+
+    @server.route(WEB_PATH)
+    def web():
+        return cached_response(feed_cache, ('html', None), channel.state(), channel.as_html, HTML_CONTENT_TYPE)
+
+    if profiler is not None:
+        server.wsgi_app = profiler.wrap(server.wsgi_app, exclude=UNPROFILED_PATHS)
+    return server
+
+
+def run_server(app, channel, server='werkzeug', workers=1):
+    """
+    Run `app` for `channel` (a `Channel` or `FolderChannel`) under `server`.
+
+    Under gunicorn the library index is built before the workers are
+    forked; each worker reopens the metadata cache, catches up with
+    changes made since and watches the library itself. The asyncio server
+    sends media files from its event loop and runs `app` for the rest.
+
+    """
+    if server == 'asyncio':
+        aserver.run(
+            app, channel.host, channel.port, media_root=channel.root_dir, static_path=STATIC_PATH,
+            mimetype=guess_mimetype)
+        return
+    if server != 'gunicorn':
+        app.run(host=channel.host, port=channel.port, debug=channel.debug, threaded=True)
+        return
+
+    library_index = channel.library_index
+
+    def before_fork():
+        # Neither threads nor SQLite connections survive a fork.
+        if library_index is not None:
+            library_index.stop_watching()
+        if channel.scanner is not None:
+            channel.scanner.shutdown()
+        if channel.metadata_cache is not None:
+            channel.metadata_cache.close()
+
+    def after_fork():
+        if library_index is not None:
+            library_index.refresh()
+            library_index.start_watching(poll_interval=library_index.poll_interval)
+
+    wsgi.run_gunicorn(
+        app, channel.host, channel.port, workers=workers, before_fork=before_fork, after_fork=after_fork)
+
+
+def serve(channel, stream=False, server='werkzeug', workers=1, profiler=None):
     """Serve podcast channel and episodes over HTTP"""
-    server = Flask(
-        __name__,
-        static_folder=channel.root_dir,
-        static_url_path=STATIC_PATH,
-    )
-    server.route('/')(
-        lambda: Response(
-            channel.as_xml(),
-            content_type='application/xml; charset=utf-8')
-    )
-    server.add_url_rule(
-        WEB_PATH,
-        view_func=channel.as_html,
-        methods=['GET'],
-    )
-    server.run(host=channel.host, port=channel.port, debug=channel.debug, threaded=True)
+    run_server(create_app(channel, stream=stream, profiler=profiler), channel, server=server, workers=workers)
 
 
-def serve_folder_feeds(folder_channel):
-    """Serve multiple podcast feeds, one per subfolder"""
-    server = Flask(
-        __name__,
-        static_folder=folder_channel.root_dir,
-        static_url_path=STATIC_PATH,
-    )
+def create_folder_app(folder_channel, stream=False, profiler=None):
+    """Return a Flask app serving one podcast feed per subfolder, see `create_app`"""
+    server = Flask(__name__, static_folder=None)
+    feed_cache = FeedCache()
+    add_media_route(server, folder_channel.root_dir)
+    add_cover_routes(server, folder_channel.root_dir)
+    add_metrics(server)
 
     # Root URL serves the index page
     @server.route('/{web_path}'.format(web_path=WEB_PATH))
     def index():
-        return folder_channel.as_html_index()
+        return cached_response(
+            feed_cache, ('index', None), folder_channel.state(), folder_channel.as_html_index, HTML_CONTENT_TYPE)
 
     # RSS feed for a specific folder
     @server.route('/feed/<path:folder_name>')
@@ -548,7 +1872,7 @@ def serve_folder_feeds(folder_channel):
         channel = folder_channel.get_channel(folder_name)
         if channel is None:
             return Response('Folder not found', status=404)
-        return Response(channel.as_xml(), content_type='application/xml; charset=utf-8')
+        return feed_response(channel, feed_cache, stream)
 
     # Web interface for a specific folder
     @server.route('/{web_path}/<path:folder_name>'.format(web_path=WEB_PATH))
@@ -557,14 +1881,134 @@ def serve_folder_feeds(folder_channel):
         channel = folder_channel.get_channel(folder_name)
         if channel is None:
             return Response('Folder not found', status=404)
-        return channel.as_html(index_url=WEB_PATH)
+        return cached_response(
+            feed_cache, ('html', folder_name), channel.state(),
+            lambda: channel.as_html(index_url=WEB_PATH), HTML_CONTENT_TYPE)
+
+    if profiler is not None:
+        server.wsgi_app = profiler.wrap(server.wsgi_app, exclude=UNPROFILED_PATHS)
+    return server
 
-    server.run(
-        host=folder_channel.host,
-        port=folder_channel.port,
-        debug=folder_channel.debug,
-        threaded=True,
-    )
+
+def serve_folder_feeds(folder_channel, stream=False, server='werkzeug', workers=1, profiler=None):
+    """Serve multiple podcast feeds, one per subfolder"""
+    run_server(
+        create_folder_app(folder_channel, stream=stream, profiler=profiler), folder_channel, server=server,
+        workers=workers)
+
+
+EXPORT_MANIFEST = '.podcats-export.json'
+
+
+class Exporter(object):
+    """
+    Write rendered feeds and pages into a directory.
+
+    A manifest in the output directory records the fingerprint each file
+    was rendered from, so files whose inputs are unchanged are neither
+    rendered nor rewritten, and files that are no longer produced are
+    removed.
+
+    """
+
+    def __init__(self, outdir):
+        self.outdir = outdir
+        self.written = []
+        self.unchanged = []
+        self.removed = []
+        self._manifest_path = os.path.join(outdir, EXPORT_MANIFEST)
+        try:
+            with open(self._manifest_path) as f:
+                self._previous = json.load(f)
+        except (OSError, ValueError):
+            self._previous = {}
+        self._manifest = {}
+
+    def write(self, relpath, fingerprint, render):
+        """
+        Write ``render()`` to `relpath` unless `fingerprint` is unchanged.
+
+        Raise `ValueError` if `relpath` was already written by this export.
+
+        """
+        if relpath in self._manifest:
+            raise ValueError('{relpath} would be exported twice'.format(relpath=relpath))
+        filename = os.path.join(self.outdir, relpath)
+        self._manifest[relpath] = fingerprint
+        if self._previous.get(relpath) == fingerprint and os.path.exists(filename):
+            self.unchanged.append(relpath)
+            return
+        body = render()
+        if isinstance(body, str):
+            body = body.encode('utf-8', 'surrogateescape')
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        tmp_filename = filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_filename, filename)
+        self.written.append(relpath)
+
+    def finish(self):
+        """Remove files no longer produced and save the manifest"""
+        for relpath in sorted(set(self._previous) - set(self._manifest)):
+            try:
+                os.remove(os.path.join(self.outdir, relpath))
+            except OSError:
+                pass
+            self.removed.append(relpath)
+        with open(self._manifest_path, 'w') as f:
+            json.dump(self._manifest, f, indent=2, sort_keys=True)
+
+
+def export(channel, outdir):
+    """
+    Export the channel's feed and web page as static files.
+
+    Writes ``feed.xml`` and ``web/index.html`` under `outdir`. Only the
+    first page of a paged feed is exported, without links to the others.
+
+    """
+    exporter = Exporter(outdir)
+    fingerprint = channel.fingerprint()
+    exporter.write('feed.xml', fingerprint, lambda: channel.as_xml(page_links=False))
+    exporter.write(os.path.join('web', 'index.html'), fingerprint, channel.as_html)
+    exporter.finish()
+    return exporter
+
+
+def export_folder_feeds(folder_channel, outdir):
+    """
+    Export one feed and web page per subfolder, plus the folder index.
+
+    Writes ``feed/<folder>.xml``, ``web/<folder>.html`` and
+    ``web/index.html`` under `outdir`. Raise `ValueError`, before writing
+    anything, if a folder's web page would overwrite the index page.
+
+    """
+    folders = folder_channel.get_folders()
+    if 'index' in folders:
+        raise ValueError(
+            'The web page of the folder "index" would overwrite the folder index page web/index.html')
+    exporter = Exporter(outdir)
+    fingerprints = []
+    for folder in folders:
+        channel = folder_channel.get_channel(folder)
+        fingerprint = channel.fingerprint()
+        fingerprints.append(fingerprint)
+        exporter.write(
+            os.path.join('feed', folder + '.xml'), fingerprint, lambda: channel.as_xml(page_links=False))
+        exporter.write(
+            os.path.join('web', folder + '.html'), fingerprint, lambda: channel.as_html(index_url=WEB_PATH))
+    index_fingerprint = hashlib.sha1(
+        repr((folder_channel.title, folder_channel.root_url, fingerprints)).encode('utf-8')).hexdigest()
+    exporter.write(os.path.join('web', 'index.html'), index_fingerprint, folder_channel.as_html_index)
+    exporter.finish()
+    return exporter
+
+
+def print_export_summary(exporter):
+    print('Exported to {}: {} written, {} unchanged, {} removed.'.format(
+        exporter.outdir, len(exporter.written), len(exporter.unchanged), len(exporter.removed)))
 
 
 def main():
@@ -574,6 +2018,24 @@ def main():
     # Validate mutually exclusive title options
     if args.title_from_id3 and args.title_from_filename:
         parser.error("--title-from-id3 and --title-from-filename are mutually exclusive")
+
+    if args.action == 'export' and not args.outdir:
+        parser.error("export requires an OUTDIR")
+
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    if args.max_items is not None and args.max_items < 1:
+        parser.error("--max-items must be at least 1")
+    if args.page_size is not None and args.page_size < 1:
+        parser.error("--page-size must be at least 1")
+    if args.scan_workers < 1:
+        parser.error("--scan-workers must be at least 1")
+    if args.workers > 1 and args.server != 'gunicorn':
+        parser.error("--workers requires --server gunicorn")
+    if args.server == 'gunicorn' and not wsgi.gunicorn_available():
+        parser.error("--server gunicorn requires gunicorn (pip install gunicorn)")
+    if args.profile_threshold < 0:
+        parser.error("--profile-threshold must not be negative")
     
     # Determine title mode
     if args.title_from_id3:
@@ -589,6 +2051,41 @@ def main():
     # Use public URL if provided, otherwise use server URL
     root_url = args.public_url if args.public_url else url
 
+    if args.log_timings:
+        metrics.enable_timing_log()
+
+    profiler = None
+    if args.profile:
+        profiler = profiling.Profiler(args.profile, threshold=args.profile_threshold / 1000.0)
+
+    configure_template_cache(args.cache_dir)
+    if args.stream:
+        # Streaming is for feeds too big to hold in memory, fragments included.
+        configure_fragment_cache(0)
+    if args.action == 'serve':
+        # Only the server has routes for extracted covers and thumbnails.
+        configure_cover_store(args.cache_dir)
+
+    metadata_cache = None
+    if not args.no_cache:
+        metadata_cache = open_metadata_cache(args.cache_dir)
+
+    scanner = MetadataScanner(workers=args.scan_workers, processes=args.scan_processes)
+
+    library_index = None
+    if args.action == 'serve':
+        # Scan once up front; requests are then served from memory.
+        library_index = LibraryIndex(
+            root_dir=path.abspath(args.directory),
+            root_url=root_url,
+            title_mode=title_mode,
+            force_order_by_name=args.force_order_by_name,
+            metadata_cache=metadata_cache,
+            scanner=scanner,
+        )
+        library_index.build()
+        library_index.start_watching(poll_interval=args.poll_interval)
+
     if not args.folder_feeds:
         # Original single-feed mode
         channel = Channel(
@@ -601,11 +2098,21 @@ def main():
             debug=args.debug,
             title_mode=title_mode,
             force_order_by_name=args.force_order_by_name,
+            metadata_cache=metadata_cache,
+            library_index=library_index,
+            scanner=scanner,
+            max_items=args.max_items,
+            page_size=args.page_size,
         )
         if args.action == 'generate':
-            print(channel.as_xml())
+            with profiling.profile(profiler, 'generate'):
+                print(channel.as_xml())
         elif args.action == 'generate_html':
-            print(channel.as_html())
+            with profiling.profile(profiler, 'generate_html'):
+                print(channel.as_html())
+        elif args.action == 'export':
+            with profiling.profile(profiler, 'export'):
+                print_export_summary(export(channel, args.outdir))
         else:
             print('Welcome to the Podcats web server!')
             print('\nListening on http://{}:{}'.format(args.host, args.port))
@@ -617,7 +2124,7 @@ def main():
             print('\t' + channel.root_url + '\n')
             print('The web interface is available at\n')
             print('\t{url}{web_path}\n'.format(url=root_url, web_path=WEB_PATH))
-            serve(channel)
+            serve(channel, stream=args.stream, server=args.server, workers=args.workers, profiler=profiler)
     else:
         # Handle folder-feeds mode
         folder_channel = FolderChannel(
@@ -630,6 +2137,11 @@ def main():
             debug=args.debug,
             title_mode=title_mode,
             force_order_by_name=args.force_order_by_name,
+            metadata_cache=metadata_cache,
+            library_index=library_index,
+            scanner=scanner,
+            max_items=args.max_items,
+            page_size=args.page_size,
         )
 
         if args.action == 'generate':
@@ -642,11 +2154,20 @@ def main():
                 print(f'# Feed for folder: {folder}')
                 print(f'# URL: /feed/{quote(folder, safe="")}')
                 channel = folder_channel.get_channel(folder)
-                print(channel.as_xml())
+                with profiling.profile(profiler, 'generate ' + folder):
+                    print(channel.as_xml())
                 print('\n')
         elif args.action == 'generate_html':
             # Generate index page
-            print(folder_channel.as_html_index())
+            with profiling.profile(profiler, 'generate_html'):
+                print(folder_channel.as_html_index())
+        elif args.action == 'export':
+            with profiling.profile(profiler, 'export'):
+                try:
+                    exporter = export_folder_feeds(folder_channel, args.outdir)
+                except ValueError as err:
+                    parser.error(str(err))
+                print_export_summary(exporter)
         else:
             # Serve mode
             folders = folder_channel.get_folders()
@@ -663,7 +2184,8 @@ def main():
                 print('    Web: {}{}/{}'.format(root_url, WEB_PATH, quote(folder, safe='')))
 
             print('\nIndex page available at: {}{}\n'.format(root_url, WEB_PATH))
-            serve_folder_feeds(folder_channel)
+            serve_folder_feeds(
+                folder_channel, stream=args.stream, server=args.server, workers=args.workers, profiler=profiler)
 
 
 parser = argparse.ArgumentParser(
@@ -686,16 +2208,23 @@ parser.add_argument(
 parser.add_argument(
     'action',
     metavar='COMMAND',
-    choices=['generate', 'generate_html', 'serve'],
-    help='`generate` the RSS feed to the terminal, or'
+    choices=['generate', 'generate_html', 'serve', 'export'],
+    help='`generate` the RSS feed to the terminal, '
          '`serve` the generated RSS as well as audio files'
-         ' via the built-in web server'
+         ' via the built-in web server, or'
+         ' `export` feeds and web pages to OUTDIR'
 )
 parser.add_argument(
     'directory',
     metavar='DIRECTORY',
     help='path to a directory with episode audio files',
 )
+parser.add_argument(
+    'outdir',
+    metavar='OUTDIR',
+    nargs='?',
+    help='output directory for `export`',
+)
 parser.add_argument(
     '--debug',
     action="store_true",
@@ -727,6 +2256,89 @@ parser.add_argument(
     action='store_true',
     help='Use only the filename (without extension) for episode titles, ignoring ID3 tags.',
 )
+parser.add_argument(
+    '--cache-dir',
+    default=DEFAULT_CACHE_DIR,
+    help='directory for the persistent episode metadata cache, compiled '
+         'templates and, with serve, extracted covers and thumbnails '
+         '(default: %(default)s)',
+)
+parser.add_argument(
+    '--no-cache',
+    action='store_true',
+    help='Parse every audio file on each scan instead of using the metadata cache.',
+)
+parser.add_argument(
+    '--poll-interval',
+    type=float,
+    default=5.0,
+    help='seconds between library change checks when serving and inotify '
+         'is unavailable (default: %(default)s)',
+)
+parser.add_argument(
+    '--max-items',
+    type=int,
+    help='only list the newest N episodes in each feed',
+)
+parser.add_argument(
+    '--page-size',
+    type=int,
+    help='split feeds into pages of N episodes, newest first, linked with '
+         'RFC 5005 <atom:link rel="next"> elements (?page=2, ?page=3, ...)',
+)
+parser.add_argument(
+    '--stream',
+    action='store_true',
+    help='Send feeds item by item as they are rendered instead of rendering '
+         'and caching whole documents; for feeds with tens of thousands of items.',
+)
+parser.add_argument(
+    '--scan-workers',
+    type=int,
+    default=1,
+    help='number of files to parse concurrently when scanning the library '
+         '(default: %(default)s)',
+)
+parser.add_argument(
+    '--scan-processes',
+    action='store_true',
+    help='Use a process pool instead of threads for --scan-workers, '
+         'for when tag parsing rather than storage latency is the bottleneck.',
+)
+parser.add_argument(
+    '--server',
+    choices=wsgi.SERVERS,
+    default='werkzeug',
+    help='HTTP server for `serve`: the built-in Werkzeug development server, '
+         'gunicorn with pre-forked --workers, or an asyncio server for many '
+         'concurrent downloads (default: %(default)s)',
+)
+parser.add_argument(
+    '--workers',
+    type=int,
+    default=1,
+    help='number of gunicorn worker processes (default: %(default)s)',
+)
+parser.add_argument(
+    '--profile',
+    metavar='DIR',
+    help='profile every request (or the generate command) with cProfile and '
+         'write a .prof file per request to DIR',
+)
+parser.add_argument(
+    '--profile-threshold',
+    metavar='MS',
+    type=float,
+    default=0,
+    help='with --profile, only keep profiles of requests that took at least '
+         'this many milliseconds (default: %(default)s)',
+)
+parser.add_argument(
+    '--log-timings',
+    action='store_true',
+    help='log a line per request to stderr with its scan, parse and render '
+         'timings and the number of bytes sent',
+)
 
 
 if __name__ == '__main__':
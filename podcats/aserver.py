@@ -0,0 +1,288 @@
+"""
+An asyncio HTTP/1.1 server for many concurrent long-lived downloads.
+
+Every client of the threaded Werkzeug server occupies a thread for as
+long as its download lasts, which for multi-hour audiobooks means
+thousands of threads. `AsyncServer` serves the files below the media
+root from the event loop instead, with ``loop.sendfile()`` (zero-copy
+``sendfile(2)`` on plain sockets), so the number of concurrent downloads
+is limited by bandwidth rather than threads.
+
+Every other request (feeds, web pages, and any library scanning they
+trigger) is handed to the regular WSGI app running in a small thread
+pool, so both servers expose exactly the same routes.
+
+Only the standard library is used. Request bodies must have a
+Content-Length; chunked uploads are not supported (nor needed).
+
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import io
+import logging
+import sys
+from urllib.parse import unquote_to_bytes
+
+from werkzeug.http import HTTP_STATUS_CODES
+
+from . import metrics
+from .media import guess_type, open_media, plan_media
+
+
+# Threads running the WSGI app; feeds are usually cached, so few are needed.
+APP_THREADS = 8
+# Idle keep-alive connections are closed after this many seconds.
+KEEPALIVE_TIMEOUT = 75
+# Upper limits for the request head and body.
+MAX_HEAD_SIZE = 64 * 1024
+MAX_BODY_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class BadRequest(Exception):
+    pass
+
+
+class AsyncServer(object):
+    """
+    Serve `app` over HTTP, sending files below `media_root` at
+    `static_path` directly from the event loop.
+
+    `mimetype` is called with a file name to get its Content-Type.
+
+    """
+
+    def __init__(self, app, media_root, static_path='/static', mimetype=None, threads=APP_THREADS):
+        self.app = app
+        self.media_root = media_root
+        self.static_prefix = static_path.rstrip('/') + '/'
+        self.mimetype = mimetype
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='podcats-app')
+        self._server_name = 'localhost'
+        self._server_port = '80'
+
+    async def start(self, host, port):
+        """Start listening and return the `asyncio.Server`"""
+        self._server_name, self._server_port = host, str(port)
+        server = await asyncio.start_server(self._handle, host, int(port), limit=MAX_HEAD_SIZE)
+        if int(port) == 0:
+            self._server_port = str(server.sockets[0].getsockname()[1])
+        return server
+
+    async def serve_forever(self, host, port):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    async def _handle(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._send_error(writer, 431)
+                    break
+                try:
+                    environ = self._make_environ(head, peer)
+                    length = int(environ.get('CONTENT_LENGTH') or 0)
+                    if length < 0 or length > MAX_BODY_SIZE:
+                        raise BadRequest('invalid Content-Length')
+                    body = await reader.readexactly(length) if length else b''
+                except (BadRequest, ValueError, UnicodeDecodeError):
+                    await self._send_error(writer, 400)
+                    break
+                environ['wsgi.input'] = io.BytesIO(body)
+                keep_alive = _wants_keep_alive(environ)
+
+                path = environ['PATH_INFO']
+                if path.startswith(self.static_prefix) and environ['REQUEST_METHOD'] in ('GET', 'HEAD'):
+                    filename = path[len(self.static_prefix):].encode('latin-1').decode('utf-8', 'surrogateescape')
+                    keep_alive = await self._send_media(writer, environ, filename, keep_alive)
+                else:
+                    keep_alive = await self._send_app(writer, environ, keep_alive)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        except Exception:
+            logger.exception('Error handling request from {peer!r}'.format(peer=peer))
+        finally:
+            writer.close()
+
+    def _make_environ(self, head, peer):
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, protocol = lines[0].split(' ')
+        except ValueError:
+            raise BadRequest(lines[0])
+        if not protocol.startswith('HTTP/1.'):
+            raise BadRequest(protocol)
+        path, _, query = target.partition('?')
+        environ = {
+            'REQUEST_METHOD': method,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote_to_bytes(path).decode('latin-1'),
+            'QUERY_STRING': query,
+            'RAW_URI': target,
+            'REQUEST_URI': target,
+            'SERVER_NAME': self._server_name,
+            'SERVER_PORT': self._server_port,
+            'SERVER_PROTOCOL': protocol,
+            'REMOTE_ADDR': peer[0] if peer else '',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for line in lines[1:]:
+            if not line:
+                continue
+            name, sep, value = line.partition(':')
+            if not sep:
+                raise BadRequest(line)
+            key = name.strip().upper().replace('-', '_')
+            if key in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                environ[key] = value.strip()
+            else:
+                key = 'HTTP_' + key
+                value = value.strip()
+                environ[key] = environ[key] + ',' + value if key in environ else value
+        if 'chunked' in environ.get('HTTP_TRANSFER_ENCODING', '').lower():
+            raise BadRequest('chunked request bodies are not supported')
+        return environ
+
+    async def _send_media(self, writer, environ, filename, keep_alive):
+        loop = asyncio.get_running_loop()
+        started = metrics.start_request()
+        # open() and fstat() may block on network storage.
+        opened = await loop.run_in_executor(self._executor, open_media, self.media_root, filename)
+        if opened is None:
+            metrics.finish_request(started, environ['REQUEST_METHOD'], environ['PATH_INFO'], 404, 'media')
+            await self._send_error(writer, 404, keep_alive)
+            return keep_alive
+        fileobj, stat = opened
+        try:
+            content_type = (self.mimetype and self.mimetype(filename)) or guess_type(filename)
+            status, headers, parts, trailer = plan_media(environ, stat, content_type)
+            _log(environ, status)
+            # Recorded before sending, like the WSGI media route.
+            if environ['REQUEST_METHOD'] != 'HEAD' and status in (200, 206):
+                metrics.inc('podcats_static_bytes_total', int(headers['Content-Length']))
+            metrics.finish_request(started, environ['REQUEST_METHOD'], environ['PATH_INFO'], status, 'media')
+            writer.write(_head(status, headers.items(), keep_alive))
+            if environ['REQUEST_METHOD'] != 'HEAD':
+                for prefix, start, stop in parts:
+                    if prefix:
+                        writer.write(prefix)
+                    await writer.drain()
+                    if stop > start:
+                        await loop.sendfile(writer.transport, fileobj, start, stop - start)
+                writer.write(trailer)
+            await writer.drain()
+        finally:
+            fileobj.close()
+        return keep_alive
+
+    async def _send_app(self, writer, environ, keep_alive):
+        loop = asyncio.get_running_loop()
+        # The body may be a generator relying on context variables set by
+        # the app (e.g. Flask's stream_with_context), so every step runs in
+        # the same context, whichever pool thread picks it up.
+        context = contextvars.copy_context()
+        started = []
+        written = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+            # Legacy write() callable: sent before the returned body.
+            return written.append
+
+        def call_app():
+            result = self.app(environ, start_response)
+            chunks = iter(result)
+            # The first chunk makes sure start_response was called.
+            return result, chunks, next(chunks, None)
+
+        try:
+            result, chunks, chunk = await loop.run_in_executor(self._executor, context.run, call_app)
+        except Exception:
+            logger.exception('Error calling the app for {uri}'.format(uri=environ['RAW_URI']))
+            await self._send_error(writer, 500)
+            return False
+        try:
+            status, headers = started
+            code = int(status.split(' ', 1)[0])
+            has_length = any(name.lower() == 'content-length' for name, _ in headers)
+            chunked = not has_length and environ['SERVER_PROTOCOL'] == 'HTTP/1.1' and code not in (204, 304)
+            if chunked:
+                headers = list(headers) + [('Transfer-Encoding', 'chunked')]
+            elif not has_length:
+                keep_alive = False
+            _log(environ, code)
+            writer.write(_head(status, headers, keep_alive))
+            send_body = environ['REQUEST_METHOD'] != 'HEAD'
+            pending = written + ([chunk] if chunk is not None else [])
+            while pending:
+                for data in pending:
+                    if data and send_body:
+                        writer.write(b'%x\r\n%s\r\n' % (len(data), data) if chunked else data)
+                await writer.drain()
+                chunk = await loop.run_in_executor(self._executor, context.run, next, chunks, None)
+                pending = [chunk] if chunk is not None else []
+            if chunked and send_body:
+                writer.write(b'0\r\n\r\n')
+            await writer.drain()
+        finally:
+            if hasattr(result, 'close'):
+                await loop.run_in_executor(self._executor, context.run, result.close)
+        return keep_alive
+
+    async def _send_error(self, writer, code, keep_alive=False):
+        body = HTTP_STATUS_CODES.get(code, 'Error').encode('ascii')
+        headers = [('Content-Type', 'text/plain'), ('Content-Length', str(len(body)))]
+        writer.write(_head(code, headers, keep_alive) + body)
+        await writer.drain()
+
+
+def _wants_keep_alive(environ):
+    connection = environ.get('HTTP_CONNECTION', '').lower()
+    if environ['SERVER_PROTOCOL'] == 'HTTP/1.0':
+        return 'keep-alive' in connection
+    return 'close' not in connection
+
+
+def _head(status, headers, keep_alive):
+    """Return the status line and headers of a response"""
+    if isinstance(status, int):
+        status = '{code} {reason}'.format(code=status, reason=HTTP_STATUS_CODES.get(status, ''))
+    lines = ['HTTP/1.1 ' + status]
+    lines.extend('{name}: {value}'.format(name=name, value=value) for name, value in headers)
+    lines.append('Connection: ' + ('keep-alive' if keep_alive else 'close'))
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+def _log(environ, code):
+    logger.info('{addr} "{method} {uri} {protocol}" {code}'.format(
+        addr=environ.get('REMOTE_ADDR'), method=environ['REQUEST_METHOD'], uri=environ['RAW_URI'],
+        protocol=environ['SERVER_PROTOCOL'], code=code))
+
+
+def run(app, host, port, media_root, static_path='/static', mimetype=None):
+    """Serve `app` with an `AsyncServer` until interrupted"""
+    server = AsyncServer(app, media_root, static_path=static_path, mimetype=mimetype)
+    try:
+        asyncio.run(server.serve_forever(host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
@@ -0,0 +1,265 @@
+"""
+Caches for parsed episode metadata and rendered feeds.
+
+Parsing tags with mutagen is by far the most expensive part of building
+a feed, so the results are stored in a small SQLite database and reused
+for as long as the file's size, mtime and inode stay the same.
+
+Rendered feeds are kept in memory by `FeedCache` until the library
+version they were rendered from changes, along with any compressed
+copies of them that have been sent. The most recently used episode
+fragments are kept by `FragmentCache`.
+
+"""
+import collections
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+from .compression import compress
+
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+    'podcats',
+)
+CACHE_FILENAME = 'metadata.sqlite3'
+
+logger = logging.getLogger(__name__)
+
+
+def stat_key(stat):
+    """Return the (size, mtime, inode) tuple a cache entry is validated by"""
+    return stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+class MetadataCache(object):
+    """SQLite-backed cache of episode metadata keyed by file path.
+
+    An entry is only returned while the file's size, mtime and inode
+    still match the values recorded when it was parsed.
+    """
+
+    # Bump whenever the shape of the stored metadata changes.
+    SCHEMA_VERSION = 1
+    # Number of writes buffered before they are committed.
+    COMMIT_EVERY = 500
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._conn = None
+        self._pid = None
+        with self._lock:
+            self._connection()
+
+    def _connection(self):
+        """Return this process' connection, opening a new one after a fork.
+
+        SQLite connections must not be used across fork(), so pre-forked
+        server workers each get their own connection to the same database.
+        """
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version != self.SCHEMA_VERSION:
+                conn.execute('DROP TABLE IF EXISTS episodes')
+                conn.execute('PRAGMA user_version = %d' % self.SCHEMA_VERSION)
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS episodes ('
+                ' path TEXT PRIMARY KEY,'
+                ' size INTEGER NOT NULL,'
+                ' mtime_ns INTEGER NOT NULL,'
+                ' inode INTEGER NOT NULL,'
+                ' data TEXT NOT NULL'
+                ')'
+            )
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+            self._pending = 0
+        return self._conn
+
+    def get(self, filename, stat):
+        """Return cached metadata for `filename`, or None if missing or stale"""
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT size, mtime_ns, inode, data FROM episodes WHERE path = ?',
+                (filename,),
+            ).fetchone()
+        if row is None or tuple(row[:3]) != stat_key(stat):
+            return None
+        return json.loads(row[3])
+
+    def put(self, filename, stat, metadata):
+        """Store `metadata` for `filename` as parsed at `stat`"""
+        size, mtime_ns, inode = stat_key(stat)
+        with self._lock:
+            try:
+                self._connection().execute(
+                    'INSERT OR REPLACE INTO episodes (path, size, mtime_ns, inode, data)'
+                    ' VALUES (?, ?, ?, ?, ?)',
+                    (filename, size, mtime_ns, inode, json.dumps(metadata)),
+                )
+            except sqlite3.Error as err:
+                # e.g. another server worker holding the write lock for too long
+                logger.warning('Could not write metadata cache {path}: {err!r}'.format(path=self.path, err=err))
+                return
+            self._pending += 1
+            if self._pending >= self.COMMIT_EVERY:
+                self._commit()
+
+    def discard(self, filenames):
+        """Remove the entries of `filenames`, e.g. files that were deleted"""
+        filenames = list(filenames)
+        if not filenames:
+            return
+        with self._lock:
+            try:
+                self._connection().executemany('DELETE FROM episodes WHERE path = ?', ((fn,) for fn in filenames))
+            except sqlite3.Error as err:
+                logger.warning('Could not write metadata cache {path}: {err!r}'.format(path=self.path, err=err))
+                return
+            self._pending += len(filenames)
+            if self._pending >= self.COMMIT_EVERY:
+                self._commit()
+
+    def flush(self):
+        """Commit buffered writes"""
+        with self._lock:
+            if self._pending:
+                self._commit()
+
+    def close(self):
+        """Commit buffered writes and close the database.
+
+        The cache reopens the database if it is used again, e.g. in a
+        forked server worker.
+        """
+        self.flush()
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+
+    def _commit(self):
+        try:
+            self._connection().commit()
+        except sqlite3.Error as err:
+            logger.warning('Could not write metadata cache {path}: {err!r}'.format(path=self.path, err=err))
+        self._pending = 0
+
+
+def open_metadata_cache(cache_dir=None):
+    """Open the metadata cache in `cache_dir`, or return None if unavailable"""
+    cache_dir = cache_dir or DEFAULT_CACHE_DIR
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        return MetadataCache(os.path.join(cache_dir, CACHE_FILENAME))
+    except (OSError, sqlite3.Error) as err:
+        logger.warning(
+            'Metadata cache disabled, could not open {dir}: {err!r}'.format(dir=cache_dir, err=err)
+        )
+        return None
+
+
+class RenderedFeed(object):
+    """A rendered response body together with its validators"""
+
+    __slots__ = ('version', 'body', 'etag', 'last_modified', '_compressed')
+
+    def __init__(self, version, body, last_modified):
+        self.version = version
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.last_modified = last_modified
+        self._compressed = {}
+
+    def compressed(self, encoding):
+        """Return the body compressed with `encoding`, compressing it only once"""
+        body = self._compressed.get(encoding)
+        if body is None:
+            body = self._compressed[encoding] = compress(self.body, encoding)
+        return body
+
+
+class FeedCache(object):
+    """
+    In-memory cache of rendered feeds and web pages.
+
+    Entries are stored under a key such as ``('xml', folder)`` and tagged
+    with the library version they were rendered from; a lookup with any
+    other version is a miss.
+
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """Return the entry for `key` if it was rendered from `version`"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            return entry
+        return None
+
+    def put(self, key, version, body, last_modified):
+        """Store `body` rendered from `version` under `key`"""
+        entry = RenderedFeed(version, body, last_modified)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FragmentCache(object):
+    """
+    Bounded in-memory cache of rendered episode fragments.
+
+    Only the `maxsize` most recently used fragments are kept, so a large
+    library does not hold a second copy of every feed in memory. A
+    `maxsize` of 0 disables the cache.
+
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the fragment stored under `key`, or None"""
+        with self._lock:
+            fragment = self._entries.get(key)
+            if fragment is not None:
+                self._entries.move_to_end(key)
+            return fragment
+
+    def put(self, key, fragment):
+        """Store `fragment` under `key`, dropping the least recently used ones if full"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = fragment
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,82 @@
+"""
+Content-Encoding negotiation and compression of feeds and pages.
+
+gzip is always available; brotli is offered as well when the optional
+``brotli`` package is installed (``pip install 'podcats[brotli]'``).
+
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# Bodies smaller than this are not worth compressing.
+MIN_SIZE = 1024
+# Cached bodies are compressed once per change, so they can afford a
+# higher level than bodies compressed while they are streamed.
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+STREAM_GZIP_LEVEL = 6
+STREAM_BROTLI_QUALITY = 5
+# Streamed output is flushed after the first chunk, so clients get the
+# channel header right away, and then after every this many input bytes.
+STREAM_FLUSH_SIZE = 16 * 1024
+
+
+def available_encodings():
+    """Return the supported content codings, most preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(accept_encodings):
+    """
+    Return the coding to send given the parsed Accept-Encoding header
+    (a werkzeug `Accept`), or None to send the body as is.
+
+    """
+    return accept_encodings.best_match(available_encodings())
+
+
+def compress(body, encoding):
+    """Return `body` compressed with `encoding`"""
+    if encoding == 'gzip':
+        # zlib writes a zero mtime, which keeps the output, and so its ETag,
+        # stable (gzip.compress only takes an mtime from Python 3.8).
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        return compressor.compress(body) + compressor.flush()
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    raise ValueError('Unsupported encoding {encoding!r}'.format(encoding=encoding))
+
+
+def compress_stream(chunks, encoding):
+    """
+    Compress the iterable `chunks` with `encoding`, yielding output as it is
+    produced and flushing it every `STREAM_FLUSH_SIZE` bytes of input.
+
+    """
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(STREAM_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        process, finish = compressor.compress, compressor.flush
+
+        def flush():
+            return compressor.flush(zlib.Z_SYNC_FLUSH)
+    elif encoding == 'br':
+        compressor = brotli.Compressor(quality=STREAM_BROTLI_QUALITY)
+        process, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        raise ValueError('Unsupported encoding {encoding!r}'.format(encoding=encoding))
+    # Flush after the first chunk too.
+    unflushed = STREAM_FLUSH_SIZE
+    for chunk in chunks:
+        data = process(chunk)
+        unflushed += len(chunk)
+        if unflushed >= STREAM_FLUSH_SIZE:
+            data += flush()
+            unflushed = 0
+        if data:
+            yield data
+    yield finish()
@@ -0,0 +1,150 @@
+"""
+Embedded cover art and cover thumbnails.
+
+Covers embedded in audio files (ID3 ``APIC`` frames, MP4 ``covr`` atoms,
+FLAC and Ogg pictures) are written once to a content-addressed
+`CoverStore` while the files are scanned, so episodes only remember the
+name of their cover, and a cover embedded in every chapter of a book is
+stored just once.
+
+When the optional ``Pillow`` package is installed (``pip install
+'podcats[thumbnails]'``), the store also keeps resized copies of those
+and of the cover image files next to the episodes, for the web pages and
+feeds. Their URLs change whenever their source does, so they can be
+served with long-lived cache headers.
+
+"""
+import base64
+import hashlib
+import logging
+import os
+import re
+import tempfile
+
+from mutagen.flac import Picture
+from mutagen.id3 import ID3
+from mutagen.mp4 import MP4Tags
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# Longest side in pixels of the thumbnails shown on web pages and linked from feeds
+WEB_SIZE = 600
+FEED_SIZE = 1400
+SIZES = (WEB_SIZE, FEED_SIZE)
+THUMBNAIL_QUALITY = 85
+# For responses whose URL changes with their content
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# The front cover in ID3 and FLAC picture types
+FRONT_COVER = 3
+
+logger = logging.getLogger(__name__)
+
+_NAME_RE = re.compile(r'^[0-9a-f]{40}\.(jpg|png|gif)$')
+
+
+def thumbnails_available():
+    return Image is not None
+
+
+def image_extension(data):
+    """Return the file extension for image `data`, or None if it is no supported image"""
+    if data.startswith(b'\xff\xd8\xff'):
+        return '.jpg'
+    if data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return '.png'
+    if data.startswith((b'GIF87a', b'GIF89a')):
+        return '.gif'
+    return None
+
+
+def embedded_cover(tags, pictures=()):
+    """
+    Return the image data of the cover embedded in `tags` (or in the FLAC
+    `pictures`), preferring front covers, or None.
+
+    """
+    candidates = []
+    if isinstance(tags, ID3):
+        candidates.extend((frame.type, frame.data) for frame in tags.getall('APIC'))
+    elif isinstance(tags, MP4Tags):
+        candidates.extend((FRONT_COVER, bytes(cover)) for cover in tags.get('covr', ()))
+    elif tags is not None and 'metadata_block_picture' in tags:
+        for value in tags['metadata_block_picture']:
+            try:
+                picture = Picture(base64.b64decode(value))
+            except Exception:
+                continue
+            candidates.append((picture.type, picture.data))
+    candidates.extend((picture.type, picture.data) for picture in pictures)
+
+    candidates.sort(key=lambda candidate: candidate[0] != FRONT_COVER)
+    for _, data in candidates:
+        if image_extension(data):
+            return data
+    return None
+
+
+class CoverStore(object):
+    """Cover images and thumbnails in `directory`, named by a digest of their content"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.thumbnails_dir = os.path.join(directory, 'thumbnails')
+        os.makedirs(self.thumbnails_dir, exist_ok=True)
+
+    def put(self, data):
+        """Store the image `data` unless it already is, and return its name"""
+        name = hashlib.sha1(data).hexdigest() + image_extension(data)
+        path = self.path(name)
+        if not os.path.exists(path):
+            _write_atomically(path, lambda f: f.write(data))
+        return name
+
+    def path(self, name):
+        """Return the path of the cover `name`, or None if `name` is not a cover name"""
+        if not _NAME_RE.match(name):
+            return None
+        return os.path.join(self.directory, name)
+
+    def thumbnail(self, source, key, size):
+        """
+        Return the name in `thumbnails_dir` of a copy of image file `source`
+        at most `size` pixels wide and high, creating it if needed.
+
+        `key` must change whenever the content of `source` does.
+        Return None if the thumbnail could not be made.
+
+        """
+        if Image is None:
+            return None
+        name = '{key}-{size}.jpg'.format(key=hashlib.sha1(key.encode('utf-8', 'surrogateescape')).hexdigest(),
+                                         size=size)
+        path = os.path.join(self.thumbnails_dir, name)
+        if os.path.exists(path):
+            return name
+        try:
+            with Image.open(source) as image:
+                image.thumbnail((size, size))
+                if image.mode != 'RGB':
+                    image = image.convert('RGB')
+                _write_atomically(path, lambda f: image.save(
+                    f, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True))
+        except (OSError, ValueError, Image.DecompressionBombError) as err:
+            logger.warning('Could not make a thumbnail of {source}: {err!r}'.format(source=source, err=err))
+            return None
+        return name
+
+
+def _write_atomically(path, write):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
@@ -0,0 +1,242 @@
+"""
+Delivery of the audio files and images below the library root.
+
+Podcast clients seek around long audiobooks with Range requests and
+re-check files they already downloaded with conditional requests, so
+`send_media` implements both directly instead of relying on Flask's
+generic static file view:
+
+* single ranges (including suffix and open-ended ones) are answered with
+  ``206 Partial Content``, several ranges with a ``multipart/byteranges``
+  body, unsatisfiable ones with ``416``;
+* ``If-None-Match``/``If-Modified-Since`` produce ``304 Not Modified`` and
+  ``If-Range`` falls back to the full file when the client's copy is stale;
+* whenever the server provides ``wsgi.file_wrapper`` the open file is
+  handed to it so that it can use ``sendfile(2)``; both gunicorn and
+  waitress limit the copy to the Content-Length, which makes this work
+  for single ranges too. Other servers get the bytes in large chunks.
+
+The ETag is derived from the file's size, mtime and inode, the same
+values the metadata cache is validated by. `plan_media` makes these
+decisions for both `send_media` and the asyncio server.
+
+"""
+import mimetypes
+import os
+import stat as stat_module
+import uuid
+
+from werkzeug.http import http_date, is_resource_modified
+from werkzeug.security import safe_join
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+
+# Bytes read per chunk when the server cannot send the file itself.
+CHUNK_SIZE = 256 * 1024
+# Range sets with more parts than this are answered with the whole file.
+MAX_RANGES = 16
+
+
+def file_etag(stat):
+    """Return a strong ETag for a file from its size, mtime and inode"""
+    return '{:x}-{:x}-{:x}'.format(stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def parse_ranges(header, size):
+    """
+    Resolve a ``Range: bytes=...`` header against a file of `size` bytes.
+
+    Return None when the header is absent, malformed or uses another unit
+    (the whole file should be sent), an empty list when none of the ranges
+    can be satisfied, and a list of ``(start, stop)`` byte offsets
+    otherwise. Overlapping and adjacent ranges are merged.
+
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(','):
+        first, dash, last = part.strip().partition('-')
+        if not dash:
+            return None
+        try:
+            if not first:
+                # Suffix range: the last N bytes.
+                suffix = int(last)
+                start, stop = max(size - suffix, 0), size
+            else:
+                start = int(first)
+                stop = min(int(last) + 1, size) if last else size
+        except ValueError:
+            return None
+        if start < 0 or (last and first and int(last) < start):
+            return None
+        if start < stop:
+            ranges.append((start, stop))
+    if len(ranges) > 1:
+        ranges.sort()
+        merged = [ranges[0]]
+        for start, stop in ranges[1:]:
+            if start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+            else:
+                merged.append((start, stop))
+        ranges = merged
+    return ranges
+
+
+class RangeBody(object):
+    """
+    WSGI body yielding byte ranges of an open file.
+
+    `parts` is a list of ``(prefix, start, stop)``: `prefix` is sent before
+    the bytes from `start` to `stop`, `trailer` after the last part. The
+    file is closed when the server closes the body.
+
+    """
+
+    def __init__(self, fileobj, parts, trailer=b''):
+        self._fileobj = fileobj
+        self._parts = parts
+        self._trailer = trailer
+
+    def __iter__(self):
+        fd = self._fileobj.fileno()
+        for prefix, start, stop in self._parts:
+            if prefix:
+                yield prefix
+            while start < stop:
+                data = os.pread(fd, min(CHUNK_SIZE, stop - start), start)
+                if not data:
+                    # The file was truncated while being sent.
+                    return
+                start += len(data)
+                yield data
+        if self._trailer:
+            yield self._trailer
+
+    def close(self):
+        self._fileobj.close()
+
+
+def _multipart_parts(ranges, size, content_type, boundary):
+    """Return the parts and trailer of a multipart/byteranges body for `ranges`"""
+    parts = []
+    for i, (start, stop) in enumerate(ranges):
+        prefix = '{crlf}--{b}\r\nContent-Type: {ct}\r\nContent-Range: bytes {s}-{e}/{size}\r\n\r\n'.format(
+            crlf='\r\n' if i else '', b=boundary, ct=content_type, s=start, e=stop - 1, size=size)
+        parts.append((prefix.encode('latin-1'), start, stop))
+    return parts, '\r\n--{b}--\r\n'.format(b=boundary).encode('ascii')
+
+
+def open_media(root_dir, filename):
+    """Return ``(fileobj, stat)`` for the regular file `filename` below `root_dir`, or None"""
+    filepath = safe_join(root_dir, filename)
+    if filepath is None:
+        return None
+    try:
+        fileobj = open(filepath, 'rb')
+    except OSError:
+        return None
+    try:
+        stat = os.fstat(fileobj.fileno())
+    except OSError:
+        fileobj.close()
+        return None
+    if not stat_module.S_ISREG(stat.st_mode):
+        fileobj.close()
+        return None
+    return fileobj, stat
+
+
+def guess_type(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def plan_media(environ, stat, content_type):
+    """
+    Decide how to answer the request in `environ` for a file with `stat`.
+
+    Return ``(status, headers, parts, trailer)``: the body consists of the
+    ``(prefix, start, stop)`` file ranges in `parts` (see `RangeBody`)
+    followed by the bytes of `trailer`. Headers include Content-Length.
+
+    """
+    size = stat.st_size
+    etag = file_etag(stat)
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': '"{}"'.format(etag),
+        'Last-Modified': http_date(stat.st_mtime),
+    }
+
+    if not is_resource_modified(environ, etag=etag, last_modified=headers['Last-Modified']):
+        return 304, headers, [], b''
+
+    ranges = parse_ranges(environ.get('HTTP_RANGE'), size)
+    if_range = environ.get('HTTP_IF_RANGE', '').strip()
+    if if_range and if_range not in (headers['ETag'], headers['Last-Modified']):
+        # The client's partial copy is stale, send the whole file.
+        ranges = None
+    if ranges is not None and len(ranges) > MAX_RANGES:
+        ranges = None
+
+    trailer = b''
+    if ranges is None:
+        status, parts = 200, [(b'', 0, size)]
+        headers['Content-Type'] = content_type
+    elif not ranges:
+        status, parts, trailer = 416, [], b'Requested range not satisfiable'
+        headers['Content-Type'] = 'text/plain; charset=utf-8'
+        headers['Content-Range'] = 'bytes */{size}'.format(size=size)
+    elif len(ranges) == 1:
+        start, stop = ranges[0]
+        status, parts = 206, [(b'', start, stop)]
+        headers['Content-Type'] = content_type
+        headers['Content-Range'] = 'bytes {s}-{e}/{size}'.format(s=start, e=stop - 1, size=size)
+    else:
+        boundary = uuid.uuid4().hex
+        status = 206
+        parts, trailer = _multipart_parts(ranges, size, content_type, boundary)
+        headers['Content-Type'] = 'multipart/byteranges; boundary={b}'.format(b=boundary)
+
+    length = sum(len(prefix) + stop - start for prefix, start, stop in parts) + len(trailer)
+    headers['Content-Length'] = str(length)
+    return status, headers, parts, trailer
+
+
+def send_media(request, root_dir, filename, mimetype=None):
+    """
+    Return a response sending `filename` below `root_dir` for `request`.
+
+    `mimetype` overrides the type guessed from the file extension.
+
+    """
+    opened = open_media(root_dir, filename)
+    if opened is None:
+        return Response('File not found', status=404)
+    fileobj, stat = opened
+    try:
+        environ = request.environ
+        status, headers, parts, trailer = plan_media(environ, stat, mimetype or guess_type(filename))
+        if len(parts) == 1 and not trailer:
+            _, start, stop = parts[0]
+            if 'wsgi.file_wrapper' in environ or (start == 0 and stop == stat.st_size):
+                # Zero-copy where the server supports it.
+                fileobj.seek(start)
+                body = wrap_file(environ, fileobj, CHUNK_SIZE)
+            else:
+                body = RangeBody(fileobj, parts)
+        elif parts:
+            body = RangeBody(fileobj, parts, trailer)
+        else:
+            fileobj.close()
+            body = [trailer]
+    except BaseException:
+        fileobj.close()
+        raise
+    return Response(body, status=status, headers=headers, direct_passthrough=True)
@@ -0,0 +1,177 @@
+"""
+Process-wide counters and timings, exposed in the Prometheus text format.
+
+The library code reports what it does (directories scanned, files
+parsed, templates rendered, bytes sent) with `inc`, `observe` and
+`timer`. Besides the process totals, every value is also added to the
+stats of the request being handled in the current context, if any, so
+that `finish_request` can log one structured line per request saying
+where its time went.
+
+Each process keeps its own metrics, e.g. every gunicorn worker.
+
+"""
+import collections
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import time
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+#: Metric name -> (type, help, key in the per-request log line)
+METRICS = collections.OrderedDict([
+    ('podcats_scan_seconds', (
+        'summary', 'Time spent listing directories and creating episodes.', 'scan_seconds')),
+    ('podcats_files_parsed_total', (
+        'counter', 'Audio files parsed for tags and duration.', 'files_parsed')),
+    ('podcats_metadata_cache_hits_total', (
+        'counter', 'Episodes whose metadata came from the metadata cache.', 'cache_hits')),
+    ('podcats_episodes_created_total', (
+        'counter', 'Episode objects created.', 'episodes')),
+    ('podcats_render_seconds', (
+        'summary', 'Time spent rendering feeds and pages.', 'render_seconds')),
+    ('podcats_static_bytes_total', (
+        'counter', 'Bytes of episode and cover files served.', 'bytes')),
+    ('podcats_request_seconds', (
+        'summary', 'Time spent handling HTTP requests.', None)),
+    ('podcats_responses_total', (
+        'counter', 'HTTP responses sent, by status code.', None)),
+    ('podcats_library_episodes', (
+        'gauge', 'Episodes found by the last scan of the whole library.', None)),
+])
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# (name, sorted label items) -> value; summaries store [sum, count]
+_values = {}
+_current_request = contextvars.ContextVar('podcats_metrics_request', default=None)
+
+
+def _key(name, labels):
+    if name not in METRICS:
+        raise KeyError('Unknown metric {name!r}'.format(name=name))
+    return name, tuple(sorted(labels.items()))
+
+
+def _add_to_request(name, amount):
+    stats = _current_request.get()
+    if stats is not None:
+        log_key = METRICS[name][2]
+        if log_key:
+            stats[log_key] += amount
+
+
+def inc(name, amount=1, **labels):
+    """Add `amount` to counter `name`"""
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = _values.get(key, 0) + amount
+    _add_to_request(name, amount)
+
+
+def set_gauge(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _values[key] = value
+
+
+def observe(name, seconds, **labels):
+    """Record a duration of `seconds` in summary `name`"""
+    key = _key(name, labels)
+    with _lock:
+        total = _values.setdefault(key, [0.0, 0])
+        total[0] += seconds
+        total[1] += 1
+    _add_to_request(name, seconds)
+
+
+@contextlib.contextmanager
+def timer(name, **labels):
+    """Observe the time spent in the ``with`` block in summary `name`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+def start_request():
+    """Start collecting the stats of a request handled in this context"""
+    _current_request.set(collections.Counter())
+    return time.perf_counter()
+
+
+def finish_request(start, method, path, status, endpoint=None):
+    """Record a request started at `start` and log a line with its stats"""
+    seconds = time.perf_counter() - start
+    stats = _current_request.get() or {}
+    _current_request.set(None)
+    observe('podcats_request_seconds', seconds, endpoint=endpoint or 'other')
+    inc('podcats_responses_total', status=str(status))
+    if logger.isEnabledFor(logging.INFO):
+        fields = [('method', method), ('path', path), ('status', status), ('seconds', seconds)]
+        fields.extend(sorted(stats.items()))
+        logger.info('request ' + ' '.join(
+            '{key}={value}'.format(key=key, value=_log_value(value)) for key, value in fields))
+    return seconds
+
+
+def _log_value(value):
+    if isinstance(value, float):
+        return '{:.6f}'.format(value)
+    value = str(value)
+    if not value or ' ' in value or '"' in value:
+        return json.dumps(value)
+    return value
+
+
+def enable_timing_log(stream=None):
+    """Log a line with the stats of every request to `stream` (stderr)"""
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def reset():
+    """Forget all values"""
+    with _lock:
+        _values.clear()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{name}="{value}"'.format(
+            name=name, value=str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    ) + '}'
+
+
+def render():
+    """Return all metrics in the Prometheus text exposition format"""
+    with _lock:
+        values = sorted(_values.items(), key=lambda item: item[0])
+        values = [(key, list(value) if isinstance(value, list) else value) for key, value in values]
+    lines = []
+    for name, (kind, help_text, _) in METRICS.items():
+        lines.append('# HELP {name} {help}'.format(name=name, help=help_text))
+        lines.append('# TYPE {name} {kind}'.format(name=name, kind=kind))
+        for (metric, labels), value in values:
+            if metric != name:
+                continue
+            if kind == 'summary':
+                lines.append('{name}_sum{labels} {value!r}'.format(
+                    name=name, labels=_format_labels(labels), value=value[0]))
+                lines.append('{name}_count{labels} {value}'.format(
+                    name=name, labels=_format_labels(labels), value=value[1]))
+            else:
+                lines.append('{name}{labels} {value}'.format(name=name, labels=_format_labels(labels), value=value))
+    return '\n'.join(lines) + '\n'
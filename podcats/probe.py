@@ -0,0 +1,359 @@
+"""
+Header-only duration probing.
+
+Finding the duration of an audio file rarely requires more than a few
+headers: the Xing/Info (with LAME) or VBRI header in the first MPEG
+frame, the ``mvhd``/``mdhd`` box of an MP4, FLAC's STREAMINFO block, or
+the granule position of the last Ogg page. `probe` reads just those,
+with a bounded number of bytes per file, and gives up (returning no
+duration) whenever it is not sure, so the caller can fall back to a
+full mutagen parse.
+
+Durations are computed the way mutagen computes them, so either way a
+file gets the same duration.
+
+"""
+import collections
+import os
+import struct
+
+
+#: The result of `probe`: `format` is 'mp3', 'mp4', 'flac', 'ogg' or None,
+#: `duration` in seconds or None, `bytes_read` what probing cost.
+ProbeResult = collections.namedtuple('ProbeResult', 'format duration bytes_read')
+
+# The first MPEG frames are searched for in at most this many bytes after
+# the ID3v2 tags; mutagen goes on for up to 1 MiB.
+MAX_MPEG_SCAN = 256 * 1024
+MPEG_SCAN_CHUNK = 16 * 1024
+# An Ogg page is at most 65307 bytes long.
+OGG_TAIL_SIZE = 65536 + 1024
+# Give up on MP4 files with more boxes than this to look through.
+MAX_MP4_BOXES = 256
+
+MPEG_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MPEG_BITRATES[(2, 3)] = MPEG_BITRATES[(2, 2)]
+for _layer in (1, 2, 3):
+    MPEG_BITRATES[(2.5, _layer)] = MPEG_BITRATES[(2, _layer)]
+MPEG_SAMPLE_RATES = {1: [44100, 48000, 32000], 2: [22050, 24000, 16000], 2.5: [11025, 12000, 8000]}
+# Consecutive frames needed to trust a sync without a VBR header, as in mutagen.
+MPEG_FRAMES_NEEDED = 4
+
+
+class _Reader(object):
+    """Positional reads from a file object, counting the bytes read"""
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.bytes_read = 0
+        self.size = os.fstat(fileobj.fileno()).st_size
+
+    def read(self, offset, size):
+        if offset < 0 or offset >= self.size or size <= 0:
+            return b''
+        self.fileobj.seek(offset)
+        data = self.fileobj.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def probe(fileobj):
+    """Return a `ProbeResult` for the open binary file `fileobj`"""
+    reader = _Reader(fileobj)
+    try:
+        audio_format, duration = _probe(reader)
+    except (struct.error, ValueError, ZeroDivisionError):
+        audio_format, duration = None, None
+    return ProbeResult(audio_format, duration, reader.bytes_read)
+
+
+def _probe(reader):
+    head = reader.read(0, 12)
+    if head[4:8] == b'ftyp':
+        return 'mp4', _mp4_duration(reader)
+    if head[:4] == b'OggS':
+        return 'ogg', _ogg_duration(reader)
+
+    offset = _skip_id3(reader, head)
+    if not offset:
+        if head[:4] == b'fLaC':
+            return 'flac', _flac_duration(reader, 0)
+        if _mpeg_frame(head, 0) is None:
+            # Without ID3 tags, only a file starting with a frame is taken for MPEG audio.
+            return None, None
+    elif reader.read(offset, 4) == b'fLaC':
+        return 'flac', _flac_duration(reader, offset)
+    return 'mp3', _mpeg_duration(reader, offset)
+
+
+def _skip_id3(reader, head):
+    """Return the offset after any ID3v2 tags at the start of the file"""
+    offset = 0
+    while head[:3] == b'ID3' and len(head) >= 10:
+        a, b, c, d = head[6:10]
+        size = (a & 0x7f) << 21 | (b & 0x7f) << 14 | (c & 0x7f) << 7 | (d & 0x7f)
+        if not size:
+            break
+        offset += 10 + size
+        head = reader.read(offset, 10)
+    return offset
+
+
+def _mpeg_frame(data, pos):
+    """Parse the MPEG audio frame header at `pos`, return None if invalid"""
+    if pos + 4 > len(data) or data[pos] != 0xff or data[pos + 1] & 0xe0 != 0xe0:
+        return None
+    header = struct.unpack_from('>I', data, pos)[0]
+    version_bits = (header >> 19) & 0x3
+    layer_bits = (header >> 17) & 0x3
+    bitrate_index = (header >> 12) & 0xf
+    rate_index = (header >> 10) & 0x3
+    if version_bits == 1 or layer_bits == 0 or rate_index == 3 or bitrate_index in (0, 0xf):
+        return None
+    version = [2.5, None, 2, 1][version_bits]
+    layer = 4 - layer_bits
+    padding = (header >> 9) & 0x1
+    mode = (header >> 6) & 0x3
+    bitrate = MPEG_BITRATES[(version, layer)][bitrate_index] * 1000
+    sample_rate = MPEG_SAMPLE_RATES[version][rate_index]
+    if layer == 1:
+        samples, slot = 384, 4
+    elif version >= 2 and layer == 3:
+        samples, slot = 576, 1
+    else:
+        samples, slot = 1152, 1
+    # Same arithmetic as mutagen, which decides how frames chain together.
+    length = ((samples // 8 * bitrate) // sample_rate + padding) * slot
+    return version, layer, mode, bitrate, sample_rate, samples, length
+
+
+def _vbr_duration(data, pos, frame):
+    """Return the duration from a Xing/Info or VBRI header in `frame` at `pos`, if any"""
+    version, layer, mode, _, sample_rate, samples, length = frame
+    if layer != 3:
+        return None
+    if version == 1:
+        xing = pos + (21 if mode == 3 else 36)
+    else:
+        xing = pos + (13 if mode == 3 else 21)
+    if data[xing:xing + 4] in (b'Xing', b'Info') and len(data) >= xing + 8:
+        flags = struct.unpack_from('>I', data, xing + 4)[0]
+        cursor = xing + 8
+        frames = None
+        if flags & 0x1:
+            frames = struct.unpack_from('>I', data, cursor)[0]
+            cursor += 4
+        cursor += (4 if flags & 0x2 else 0) + (100 if flags & 0x4 else 0) + (4 if flags & 0x8 else 0)
+        if frames is None:
+            # A Xing header without a frame count: mutagen estimates from the size.
+            return -1
+        total = samples * frames
+        delay, padding = _lame_delay_padding(data[cursor:cursor + 36])
+        return max(0, total - delay - padding) / float(sample_rate)
+    vbri = pos + 36
+    if data[vbri:vbri + 4] == b'VBRI' and len(data) >= vbri + 18:
+        if struct.unpack_from('>H', data, vbri + 4)[0] != 1:
+            return None
+        frames = struct.unpack_from('>I', data, vbri + 14)[0]
+        return samples * frames / float(sample_rate)
+    return None
+
+
+def _lame_delay_padding(tag):
+    """Return the encoder delay and padding from a LAME tag, or zeros"""
+    if len(tag) < 36 or not tag.startswith((b'LAME', b'L3.99')):
+        return 0, 0
+    version = tag[:9].lstrip(b'EMAL')
+    digits = version[1:].lstrip(b'.')
+    minor = digits[:len(digits) - len(digits.lstrip(b'0123456789'))]
+    try:
+        major, minor = int(version[:1]), int(minor)
+    except ValueError:
+        return 0, 0
+    if (major, minor) < (3, 90) or (major, minor) == (3, 90) and tag[9:10] == b'(':
+        # No extended tag before LAME 3.90
+        return 0, 0
+    if tag[9] >> 4 != 0:
+        # Unsupported LAME tag revision
+        return 0, 0
+    delay = tag[21] << 4 | tag[22] >> 4
+    padding = (tag[22] & 0xf) << 8 | tag[23]
+    return delay, padding
+
+
+def _mpeg_duration(reader, offset):
+    """Find the first MPEG frames after `offset` like mutagen does and return the duration"""
+    data = b''
+    pos = 0
+    while True:
+        # Read 16 KiB first and then twice as much as read so far.
+        size = min(max(MPEG_SCAN_CHUNK, len(data)), MAX_MPEG_SCAN - len(data))
+        chunk = reader.read(offset + len(data), size)
+        complete = len(chunk) < size or len(data) + len(chunk) >= MAX_MPEG_SCAN
+        data += chunk
+        while True:
+            pos = data.find(b'\xff', pos)
+            if pos == -1:
+                pos = len(data)
+                break
+            result = _mpeg_frames_at(data, pos, complete)
+            if result is _NEED_MORE:
+                break
+            if result is not None:
+                first, frame, duration = result
+                if duration is None or duration == -1:
+                    # No usable VBR header: estimate from the size, assuming CBR.
+                    duration = 8 * (reader.size - offset - first) / float(frame[3])
+                return duration
+            pos += 1
+        if complete:
+            return None
+
+
+_NEED_MORE = object()
+
+
+def _mpeg_frames_at(data, pos, complete):
+    """
+    Check for a run of frames starting at `pos`.
+
+    Return ``(offset, frame, vbr_duration)`` for the frame to use,
+    None if there is none here, or `_NEED_MORE` if `data` ends too soon
+    to tell.
+
+    """
+    cursor = pos
+    first = None
+    for _ in range(MPEG_FRAMES_NEEDED):
+        if cursor + 4 > len(data):
+            return None if complete else _NEED_MORE
+        frame = _mpeg_frame(data, cursor)
+        if frame is None:
+            return None
+        if first is None:
+            first = (cursor, frame)
+        if frame[1] == 3 and cursor + 200 > len(data) and not complete:
+            return _NEED_MORE
+        duration = _vbr_duration(data, cursor, frame)
+        if duration is not None:
+            return cursor, frame, duration
+        cursor += frame[6]
+    return first[0], first[1], None
+
+
+def _flac_duration(reader, offset):
+    block = reader.read(offset + 4, 4 + 34)
+    if len(block) < 38 or block[0] & 0x7f != 0:
+        return None
+    info = block[4:]
+    sample_rate = info[10] << 12 | info[11] << 4 | info[12] >> 4
+    total_samples = (info[13] & 0xf) << 32 | struct.unpack_from('>I', info, 14)[0]
+    if not sample_rate or not total_samples:
+        return None
+    return total_samples / float(sample_rate)
+
+
+def _ogg_duration(reader):
+    head = reader.read(0, 27 + 255 + 64)
+    if len(head) < 28:
+        return None
+    serial = struct.unpack_from('<I', head, 14)[0]
+    packet = head[27 + head[26]:]
+    if packet.startswith(b'\x01vorbis') and len(packet) >= 16:
+        sample_rate = struct.unpack_from('<I', packet, 12)[0]
+        pre_skip = 0
+    elif packet.startswith(b'OpusHead') and len(packet) >= 12:
+        sample_rate = 48000
+        pre_skip = struct.unpack_from('<H', packet, 10)[0]
+    else:
+        return None
+
+    start = max(0, reader.size - OGG_TAIL_SIZE)
+    tail = reader.read(start, reader.size - start)
+    pos = len(tail)
+    while True:
+        pos = tail.rfind(b'OggS', 0, pos)
+        if pos == -1 or pos + 27 > len(tail):
+            return None
+        granule, page_serial = struct.unpack_from('<qI', tail, pos + 6)
+        if page_serial == serial and granule >= 0:
+            return max(0, granule - pre_skip) / float(sample_rate)
+
+
+def _mp4_boxes(reader, start, end):
+    """Yield ``(type, payload offset, end offset)`` for the boxes between `start` and `end`"""
+    offset = start
+    count = 0
+    while offset + 8 <= end and count < MAX_MP4_BOXES:
+        header = reader.read(offset, 16)
+        if len(header) < 8:
+            return
+        size, kind = struct.unpack_from('>I4s', header)
+        payload = offset + 8
+        if size == 1:
+            if len(header) < 16:
+                return
+            size = struct.unpack_from('>Q', header, 8)[0]
+            payload = offset + 16
+        elif size == 0:
+            size = end - offset
+        if size < payload - offset:
+            return
+        yield kind, payload, offset + size
+        offset += size
+        count += 1
+
+
+def _mp4_time(reader, offset):
+    """Return ``(timescale, duration)`` of the mvhd or mdhd box at `offset`"""
+    data = reader.read(offset, 32)
+    if data[0] == 1:
+        timescale, duration = struct.unpack_from('>IQ', data, 20)
+        unknown = 0xffffffffffffffff
+    else:
+        timescale, duration = struct.unpack_from('>II', data, 12)
+        unknown = 0xffffffff
+    if not timescale or duration == unknown:
+        return None
+    return timescale, duration
+
+
+def _mp4_duration(reader):
+    """
+    Return the duration of the first sound track (its mdhd box), as
+    mutagen does, or of the whole movie (mvhd) if there is no track.
+
+    """
+    for kind, start, end in _mp4_boxes(reader, 0, reader.size):
+        if kind != b'moov':
+            continue
+        movie = None
+        for child, child_start, child_end in _mp4_boxes(reader, start, end):
+            if child == b'mvhd':
+                movie = _mp4_time(reader, child_start)
+            elif child == b'trak':
+                track = _mp4_sound_track(reader, child_start, child_end)
+                if track is not None:
+                    return track[1] / float(track[0])
+        return movie[1] / float(movie[0]) if movie else None
+    return None
+
+
+def _mp4_sound_track(reader, start, end):
+    for kind, mdia_start, mdia_end in _mp4_boxes(reader, start, end):
+        if kind != b'mdia':
+            continue
+        media_time = is_sound = None
+        for child, child_start, _ in _mp4_boxes(reader, mdia_start, mdia_end):
+            if child == b'mdhd':
+                media_time = _mp4_time(reader, child_start)
+            elif child == b'hdlr':
+                is_sound = reader.read(child_start + 8, 4) == b'soun'
+        return media_time if is_sound else None
+    return None
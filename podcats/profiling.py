@@ -0,0 +1,172 @@
+"""
+cProfile sessions for slow feeds and requests (``--profile``).
+
+Every profiled request or command is written to its own ``.prof`` file,
+which can be inspected with ``python -m pstats`` or turned into a flame
+graph with tools such as snakeviz, flameprof or gprof2dot.
+
+cProfile can only follow one thread at a time, so a request waits up to
+`START_TIMEOUT` seconds for the one being profiled to finish, and is
+served without profiling if it does not.
+
+"""
+import contextlib
+import cProfile
+import itertools
+import os
+import re
+import threading
+import time
+
+
+# Long enough for a request to outlast the previous one's response being
+# sent and its profile saved, short enough not to stall concurrent ones.
+START_TIMEOUT = 0.25
+
+
+class Profiler(object):
+    """
+    Profile blocks of code and save the profiles in `directory`.
+
+    Only sessions that took at least `threshold` seconds are saved.
+
+    """
+
+    def __init__(self, directory, threshold=0):
+        self.directory = directory
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._counter = itertools.count(1)
+        os.makedirs(directory, exist_ok=True)
+
+    @contextlib.contextmanager
+    def profile(self, name):
+        """Profile the ``with`` block and save it under `name` if it was slow enough"""
+        session = self._start(name)
+        if session is None:
+            yield
+            return
+        try:
+            with session.running():
+                yield
+        finally:
+            session.finish()
+
+    def wrap(self, app, exclude=()):
+        """
+        Return WSGI `app` with every request profiled.
+
+        Requests whose path starts with one of the `exclude` prefixes are
+        passed through untouched. The profile of a request covers the call
+        to `app` and the iteration of its response body, and is saved once
+        the body is exhausted or closed.
+
+        """
+        def profiled_app(environ, start_response):
+            path = environ.get('PATH_INFO', '')
+            if path.startswith(tuple(exclude)):
+                return app(environ, start_response)
+            session = self._start('{method} {path}'.format(method=environ['REQUEST_METHOD'], path=path))
+            if session is None:
+                return app(environ, start_response)
+            try:
+                with session.running():
+                    body = app(environ, start_response)
+            except BaseException:
+                session.finish()
+                raise
+            return _ProfiledBody(session, body)
+
+        return profiled_app
+
+    def _start(self, name):
+        """Return a new `_Session`, or None if another session is still running"""
+        if not self._lock.acquire(timeout=START_TIMEOUT):
+            return None
+        return _Session(self, name)
+
+    def _filename(self, name, elapsed):
+        name = re.sub(r'[^\w.-]+', '_', name).strip('_')[:80]
+        return os.path.join(self.directory, '{time}-{pid}-{n:04d}-{name}-{ms:.0f}ms.prof'.format(
+            time=time.strftime('%Y%m%d-%H%M%S'), pid=os.getpid(), n=next(self._counter), name=name,
+            ms=elapsed * 1000))
+
+
+class _Session(object):
+    """A profile that is only enabled while `running`, saved by `finish`"""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.elapsed = 0
+        self.finished = False
+        self._profile = cProfile.Profile()
+
+    @contextlib.contextmanager
+    def running(self):
+        start = time.perf_counter()
+        self._profile.enable()
+        try:
+            yield
+        finally:
+            self._profile.disable()
+            self.elapsed += time.perf_counter() - start
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        try:
+            if self.elapsed >= self.profiler.threshold:
+                self._profile.dump_stats(self.profiler._filename(self.name, self.elapsed))
+        finally:
+            self.profiler._lock.release()
+
+
+class _ProfiledBody(object):
+    """
+    Iterate over a WSGI response `body`, profiling only while chunks are
+    pulled from it, and finish the `session` when it runs out, fails or is
+    closed, whichever comes first.
+
+    """
+
+    def __init__(self, session, body):
+        self._session = session
+        self._body = body
+        self._chunks = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._session.finished:
+            return next(self._chunks)
+        try:
+            with self._session.running():
+                if self._chunks is None:
+                    self._chunks = iter(self._body)
+                return next(self._chunks)
+        except BaseException:
+            # Servers may take a while to call close(), or never do.
+            self._session.finish()
+            raise
+
+    def close(self):
+        if self._session.finished:
+            if hasattr(self._body, 'close'):
+                self._body.close()
+            return
+        try:
+            if hasattr(self._body, 'close'):
+                with self._session.running():
+                    self._body.close()
+        finally:
+            self._session.finish()
+
+
+def profile(profiler, name):
+    """Return `profiler.profile(name)`, or a no-op context manager if `profiler` is None"""
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.profile(name)
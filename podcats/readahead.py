@@ -0,0 +1,105 @@
+"""
+Read-ahead for tag parsing on slow or remote storage.
+
+mutagen reads a file in many small pieces: a 10-byte ID3 header, a few
+bytes per MP4 box header, the last 131 bytes for an ID3v1 tag and so
+on. On NFS every one of those can be a round trip. `RegionFile` wraps an
+open file and turns those reads into a few large ones: the first
+`BLOCK_SIZE` bytes of the file, the last `BLOCK_SIZE` bytes (ID3v1 and
+APE tags, a trailing moov box), and a block starting at any other place
+asked for, such as a moov box after the media data. Later small reads are
+then served from memory.
+
+Plain reads are used rather than an ``mmap`` view, which would fault
+pages in one by one and so bring back the small reads.
+
+"""
+import errno
+import io
+import os
+
+
+# Read at least this much whenever the data asked for has not been read yet.
+BLOCK_SIZE = 64 * 1024
+
+
+class RegionFile(object):
+    """
+    A read-only file object serving reads from large blocks of `fileobj`.
+
+    `reads` and `bytes_read` count the reads actually made on `fileobj`.
+
+    """
+
+    def __init__(self, fileobj, block_size=BLOCK_SIZE):
+        self.fileobj = fileobj
+        self.name = getattr(fileobj, 'name', '')
+        self.block_size = block_size
+        self.size = os.fstat(fileobj.fileno()).st_size
+        self.reads = 0
+        self.bytes_read = 0
+        self._position = 0
+        # (start offset, data) of the blocks read so far
+        self._blocks = []
+
+    def fileno(self):
+        return self.fileobj.fileno()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError('Invalid whence {whence!r}'.format(whence=whence))
+        if position < 0:
+            # Like a real file, which mutagen relies on for files smaller than an ID3v1 tag.
+            raise OSError(errno.EINVAL, os.strerror(errno.EINVAL))
+        self._position = position
+        return position
+
+    def read(self, size=-1):
+        start = self._position
+        if size is None or size < 0:
+            size = self.size - start
+        end = min(start + size, self.size)
+        if end <= start:
+            return b''
+        data = self._cached(start, end)
+        if data is None:
+            data = self._read_block(start, end)
+        self._position = start + len(data)
+        return data
+
+    def _cached(self, start, end):
+        for offset, block in self._blocks:
+            if offset <= start and end <= offset + len(block):
+                return block[start - offset:end - offset]
+        return None
+
+    def _read_block(self, start, end):
+        """Read at least a block around ``[start, end)``, keep it and return ``[start, end)``"""
+        if end - start < self.block_size:
+            block_end = min(start + self.block_size, self.size)
+        else:
+            # A large read, such as a whole ID3 tag, is followed by the start of the audio.
+            block_end = min(end + self.block_size, self.size)
+        # Near the end of the file, read the whole last block instead of just its tail.
+        block_start = max(0, min(start, block_end - self.block_size))
+        self.fileobj.seek(block_start)
+        block = self.fileobj.read(block_end - block_start)
+        self.reads += 1
+        self.bytes_read += len(block)
+        self._blocks.append((block_start, block))
+        return block[start - block_start:end - block_start]
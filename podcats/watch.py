@@ -0,0 +1,177 @@
+"""
+Filesystem watchers that keep the in-memory library index up to date.
+
+`InotifyWatcher` uses Linux inotify through ctypes and reports exactly
+which directories changed. Everywhere else (or when inotify runs out of
+watches) `PollingWatcher` periodically asks the index to compare
+directory mtimes.
+
+Both call ``callback(directories)`` from a background thread, where
+`directories` is a set of changed directory paths, or None when every
+known directory should be checked.
+
+"""
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+class PollingWatcher(object):
+    """Ask for a full mtime check every `interval` seconds"""
+
+    def __init__(self, callback, interval=5.0):
+        self.callback = callback
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, directory):
+        pass
+
+    def remove(self, directory):
+        pass
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='podcats-poll', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.callback(None)
+            except Exception:
+                logger.exception('Library refresh failed')
+
+
+class InotifyWatcher(object):
+    """Report changed directories as inotify events arrive"""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ONLYDIR = 0x01000000
+
+    MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+            | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+    _EVENT = struct.Struct('iIII')
+
+    # Events arriving within this many seconds are reported together.
+    DEBOUNCE = 0.25
+
+    def __init__(self, callback):
+        self.callback = callback
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError(errno.ENOSYS, 'libc not found')
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self._wds = {}
+        self._dirs = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, directory):
+        """Start watching `directory` (not recursive)"""
+        with self._lock:
+            if directory in self._dirs:
+                return
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.MASK)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), 'inotify_add_watch failed', directory)
+            self._wds[wd] = directory
+            self._dirs[directory] = wd
+
+    def remove(self, directory):
+        """Stop watching `directory`"""
+        with self._lock:
+            wd = self._dirs.pop(directory, None)
+            if wd is not None:
+                self._wds.pop(wd, None)
+                self._libc.inotify_rm_watch(self._fd, wd)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='podcats-inotify', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is None:
+            os.close(self._fd)
+        elif self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _read_events(self):
+        """Return the set of directories touched by pending events, or None on overflow"""
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, name_len = self._EVENT.unpack_from(data, offset)
+                offset += self._EVENT.size + name_len
+                if mask & self.IN_Q_OVERFLOW:
+                    return None
+                with self._lock:
+                    directory = self._wds.get(wd)
+                if directory is None:
+                    continue
+                if mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                    # Let the parent directory notice the removal.
+                    directory = os.path.dirname(directory)
+                changed.add(directory)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                ready, _, _ = select.select([self._fd], [], [], 1.0)
+                if not ready:
+                    continue
+                changed = self._read_events()
+                # Coalesce bursts, e.g. a whole book being copied in.
+                while changed is not None and select.select([self._fd], [], [], self.DEBOUNCE)[0]:
+                    more = self._read_events()
+                    changed = None if more is None else changed | more
+                try:
+                    self.callback(changed)
+                except Exception:
+                    logger.exception('Library refresh failed')
+        finally:
+            os.close(self._fd)
+
+
+def create_watcher(callback, poll_interval=5.0):
+    """Return an inotify watcher if possible, a polling one otherwise"""
+    try:
+        return InotifyWatcher(callback)
+    except (OSError, AttributeError) as err:
+        logger.info('inotify unavailable ({err!r}), polling for changes'.format(err=err))
+        return PollingWatcher(callback, interval=poll_interval)
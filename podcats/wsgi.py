@@ -0,0 +1,56 @@
+"""
+Running the feed apps under a production WSGI server.
+
+The Werkzeug development server started by ``app.run()`` handles every
+request in a new thread of a single process. With ``--server gunicorn``
+the app is built once in the gunicorn master (preloaded), so the library
+is scanned only once, and then forked into ``--workers`` processes that
+each serve requests from their own threads. Every worker shares the
+on-disk metadata cache with the others.
+
+gunicorn is an optional dependency (``pip install podcats[server]``).
+``--server asyncio`` runs the same app in `podcats.aserver` instead.
+
+"""
+SERVERS = ('werkzeug', 'gunicorn', 'asyncio')
+# Threads per gunicorn worker: long audio downloads must not block feeds.
+THREADS_PER_WORKER = 8
+
+
+def gunicorn_available():
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def run_gunicorn(app, host, port, workers=1, before_fork=None, after_fork=None):
+    """
+    Serve the WSGI `app` with gunicorn's pre-fork worker model.
+
+    `before_fork` is called in the master process before each worker is
+    forked, `after_fork` in each new worker; use them to release and
+    reopen resources that must not be shared across processes, such as
+    database connections and background threads.
+
+    """
+    from gunicorn.app.base import BaseApplication
+
+    class Application(BaseApplication):
+
+        def load_config(self):
+            self.cfg.set('bind', '{host}:{port}'.format(host=host, port=port))
+            self.cfg.set('workers', workers)
+            self.cfg.set('worker_class', 'gthread')
+            self.cfg.set('threads', THREADS_PER_WORKER)
+            self.cfg.set('preload_app', True)
+            if before_fork is not None:
+                self.cfg.set('pre_fork', lambda server, worker: before_fork())
+            if after_fork is not None:
+                self.cfg.set('post_fork', lambda server, worker: after_fork())
+
+        def load(self):
+            return app
+
+    Application().run()
@@ -35,6 +35,11 @@ setup(
         'humanize>=0.5.1',
         'pytest>=7.4.4',
     ],
+    extras_require={
+        'server': ['gunicorn>=20.1'],
+        'brotli': ['brotli>=1.0'],
+        'thumbnails': ['Pillow>=9.1'],
+    },
     classifiers=[
         'Development Status :: 5 - Production/Stable',
         'Programming Language :: Python',
@@ -1,11 +1,47 @@
 import os
+import shutil
+
 import pytest
-from podcats import Channel
+from podcats import Channel, FolderChannel
 
 # The root directory for our test audio files
 TEST_AUDIO_ROOT = os.path.join(os.path.dirname(__file__), "sample_audio")
 
 
+def make_channel(root_dir=TEST_AUDIO_ROOT, **kwargs):
+    """Return a Channel for `root_dir` served from localhost; `kwargs` are passed on."""
+    kwargs.setdefault("title", "Test")
+    kwargs.setdefault("link", None)
+    return Channel(root_dir=root_dir, root_url="http://localhost:5000", host="localhost", port=5000, **kwargs)
+
+
+def make_folder_channel(root_dir=TEST_AUDIO_ROOT, **kwargs):
+    """Return a FolderChannel for `root_dir` served from localhost; `kwargs` are passed on."""
+    kwargs.setdefault("title", None)
+    kwargs.setdefault("link", None)
+    return FolderChannel(root_dir=root_dir, root_url="http://localhost:5000", host="localhost", port=5000, **kwargs)
+
+
+@pytest.fixture
+def library(request, tmp_path):
+    """
+    Fixture that provides a writable copy of the sample library.
+
+    Parametrized indirectly with a number N, it provides a flat folder of
+    N tiny episodes named "Track 1.mp3" to "Track N.mp3" instead.
+
+    """
+    root = tmp_path / "library"
+    tracks = getattr(request, "param", None)
+    if tracks is None:
+        shutil.copytree(TEST_AUDIO_ROOT, str(root))
+    else:
+        root.mkdir()
+        for number in range(1, tracks + 1):
+            (root / "Track {}.mp3".format(number)).write_bytes(b'\xff\xfb\x90\x00' * 100)
+    return str(root)
+
+
 @pytest.fixture
 def test_channel():
     """Fixture that provides a Channel instance for testing."""
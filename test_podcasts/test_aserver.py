@@ -0,0 +1,151 @@
+"""Tests for the asyncio server."""
+import asyncio
+import http.client
+import os
+import threading
+
+import pytest
+
+from podcats import STATIC_PATH, create_folder_app, guess_mimetype, metrics
+from podcats.aserver import AsyncServer
+from conftest import TEST_AUDIO_ROOT, make_folder_channel
+
+
+EPISODE = "Solaris/01 - Chapter 1.mp3"
+EPISODE_URL = "/static/Solaris/01%20-%20Chapter%201.mp3"
+
+
+def start_server(app):
+    """Run an AsyncServer for `app` on a free port in a background thread."""
+    server = AsyncServer(app, TEST_AUDIO_ROOT, static_path=STATIC_PATH, mimetype=guess_mimetype)
+    loop = asyncio.new_event_loop()
+    listening = loop.run_until_complete(server.start("127.0.0.1", 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+
+    def stop():
+        async def shutdown():
+            listening.close()
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        server.close()
+
+    return listening.sockets[0].getsockname()[1], stop
+
+
+def make_app(stream=False):
+    folder_channel = make_folder_channel(title="Test")
+    return create_folder_app(folder_channel, stream=stream)
+
+
+@pytest.fixture
+def connection():
+    port, stop = start_server(make_app())
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    yield conn
+    conn.close()
+    stop()
+
+
+@pytest.fixture
+def episode_bytes():
+    with open(os.path.join(TEST_AUDIO_ROOT, EPISODE), "rb") as f:
+        return f.read()
+
+
+def get(conn, url, headers=None, method="GET"):
+    conn.request(method, url, headers=headers or {})
+    response = conn.getresponse()
+    return response, response.read()
+
+
+class TestAsyncServer:
+    """Tests for the routes served by AsyncServer."""
+
+    def test_app_routes(self, connection):
+        response, body = get(connection, "/web")
+        assert response.status == 200
+        assert b"Solaris" in body
+
+        response, body = get(connection, "/feed/Solaris")
+        assert response.status == 200
+        assert body.startswith(b"<?xml")
+
+        response, body = get(connection, "/web/Solaris")
+        assert response.status == 200
+
+        response, _ = get(connection, "/feed/Missing")
+        assert response.status == 404
+
+    def test_media_full_and_range(self, connection, episode_bytes):
+        response, body = get(connection, EPISODE_URL)
+        assert response.status == 200
+        assert body == episode_bytes
+        assert response.getheader("Content-Type") == "audio/mpeg"
+
+        response, body = get(connection, EPISODE_URL, {"Range": "bytes=10-19"})
+        assert response.status == 206
+        assert body == episode_bytes[10:20]
+
+        response, body = get(connection, EPISODE_URL, {"Range": "bytes=0-1,-2"})
+        assert response.status == 206
+        assert response.getheader("Content-Type").startswith("multipart/byteranges")
+        assert len(body) == int(response.getheader("Content-Length"))
+
+    def test_media_conditional_and_head(self, connection, episode_bytes):
+        response, _ = get(connection, EPISODE_URL, method="HEAD")
+        assert response.status == 200
+        assert response.getheader("Content-Length") == str(len(episode_bytes))
+
+        response, body = get(connection, EPISODE_URL, {"If-None-Match": response.getheader("ETag")})
+        assert response.status == 304
+        assert body == b""
+
+    def test_media_not_found(self, connection):
+        response, _ = get(connection, "/static/Solaris/missing.mp3")
+        assert response.status == 404
+        response, _ = get(connection, "/static/../test_aserver.py")
+        assert response.status == 404
+
+    def test_keep_alive(self, connection):
+        """Test that many requests are served over one connection."""
+        for _ in range(3):
+            response, _ = get(connection, EPISODE_URL, {"Range": "bytes=0-0"})
+            assert response.status == 206
+            response, _ = get(connection, "/web")
+            assert response.status == 200
+        assert not response.will_close
+
+    def test_streamed_feed_is_chunked(self):
+        port, stop = start_server(make_app(stream=True))
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            response, body = get(conn, "/feed/Solaris")
+            assert response.status == 200
+            assert response.getheader("Transfer-Encoding") == "chunked"
+            assert body.rstrip().endswith(b"</rss>")
+            conn.close()
+        finally:
+            stop()
+
+    def test_bad_request(self, connection):
+        connection.putrequest("GET", "/web")
+        connection.putheader("Content-Length", "nope")
+        connection.endheaders()
+        assert connection.getresponse().status == 400
+
+    def test_media_metrics(self, connection, episode_bytes):
+        metrics.reset()
+        get(connection, EPISODE_URL)
+        get(connection, EPISODE_URL, {"Range": "bytes=0-9"})
+
+        text = metrics.render()
+        assert "podcats_static_bytes_total {}".format(len(episode_bytes) + 10) in text
+        assert 'podcats_request_seconds_count{endpoint="media"} 2' in text
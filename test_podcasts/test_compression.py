@@ -0,0 +1,120 @@
+"""Tests for compressed feed and page responses."""
+import gzip
+import zlib
+
+import pytest
+
+import podcats
+from podcats import LibraryIndex, compression, create_app
+from conftest import TEST_AUDIO_ROOT, make_channel
+
+
+GZIP = {"Accept-Encoding": "gzip, deflate"}
+
+
+@pytest.fixture
+def client():
+    """Fixture that provides a test client for an indexed channel."""
+    index = LibraryIndex(root_dir=TEST_AUDIO_ROOT, root_url="http://localhost:5000")
+    index.build()
+    channel = make_channel(library_index=index)
+    return create_app(channel).test_client()
+
+
+@pytest.fixture
+def compress_calls(monkeypatch):
+    """Fixture that counts how often a cached body is compressed."""
+    calls = []
+    original = podcats.cache.compress
+
+    def counting_compress(body, encoding):
+        calls.append(encoding)
+        return original(body, encoding)
+
+    monkeypatch.setattr(podcats.cache, "compress", counting_compress)
+    return calls
+
+
+class TestCompressedResponses:
+    """Tests for Accept-Encoding negotiation on cached responses."""
+
+    @pytest.mark.parametrize("url", ["/", "/web"])
+    def test_gzip(self, client, url):
+        plain = client.get(url)
+        compressed = client.get(url, headers=GZIP)
+
+        assert plain.headers.get("Content-Encoding") is None
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert "Accept-Encoding" in compressed.headers["Vary"]
+        assert gzip.decompress(compressed.data) == plain.data
+        assert len(compressed.data) < len(plain.data)
+        assert compressed.headers["ETag"] != plain.headers["ETag"]
+
+    def test_compressed_once_per_rendering(self, client, compress_calls):
+        for _ in range(3):
+            assert client.get("/", headers=GZIP).headers["Content-Encoding"] == "gzip"
+        assert compress_calls == ["gzip"]
+
+    def test_conditional_request(self, client):
+        etag = client.get("/", headers=GZIP).headers["ETag"]
+
+        response = client.get("/", headers=dict(GZIP, **{"If-None-Match": etag}))
+        assert response.status_code == 304
+
+        # The compressed copy's ETag doesn't match the uncompressed body.
+        assert client.get("/", headers={"If-None-Match": etag}).status_code == 200
+
+    def test_refused_encoding(self, client):
+        response = client.get("/", headers={"Accept-Encoding": "gzip;q=0, identity"})
+        assert response.headers.get("Content-Encoding") is None
+
+    def test_small_body_is_not_compressed(self, client, monkeypatch):
+        monkeypatch.setattr(compression, "MIN_SIZE", 10 ** 9)
+        response = client.get("/", headers=GZIP)
+        assert response.headers.get("Content-Encoding") is None
+        assert "Accept-Encoding" in response.headers["Vary"]
+
+    @pytest.mark.skipif(compression.brotli is None, reason="brotli is not installed")
+    def test_brotli_preferred(self, client):
+        response = client.get("/", headers={"Accept-Encoding": "gzip, br"})
+        assert response.headers["Content-Encoding"] == "br"
+        assert compression.brotli.decompress(response.data) == client.get("/").data
+
+
+class TestCompressedStream:
+    """Tests for compression of streamed feeds."""
+
+    def test_gzip_stream(self):
+        channel = make_channel()
+        client = create_app(channel, stream=True).test_client()
+
+        plain = client.get("/").data
+        response = client.get("/", headers=GZIP)
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.headers.get("Content-Length") is None
+        assert gzip.decompress(response.data) == plain
+
+    def test_compress_stream_round_trip(self):
+        chunks = [b"<item>%d</item>" % i for i in range(1000)]
+        data = b"".join(compression.compress_stream(iter(chunks), "gzip"))
+        assert gzip.decompress(data) == b"".join(chunks)
+
+    @pytest.mark.parametrize("encoding", compression.available_encodings())
+    def test_first_chunk_is_flushed(self, encoding):
+        """Test that the channel header is sent before the rest of the feed is rendered."""
+        header = b"<rss><channel><title>Test</title>"
+        output = compression.compress_stream(iter([header, b"<item/>"]), encoding)
+
+        if encoding == "gzip":
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            assert decompressor.decompress(next(output)) == header
+        else:
+            assert compression.brotli.Decompressor().process(next(output)) == header
+
+    def test_gzip_output_is_stable(self):
+        """Test that compressing the same body twice gives the same bytes (and ETag)."""
+        body = b"<rss>" + b"<item/>" * 1000 + b"</rss>"
+        data = compression.compress(body, "gzip")
+        assert data == compression.compress(body, "gzip")
+        assert data[4:8] == b"\0\0\0\0"  # header mtime
+        assert gzip.decompress(data) == body
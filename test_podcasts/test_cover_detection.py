@@ -1,5 +1,9 @@
 import os
-from podcats import Episode
+import shutil
+import time
+
+import podcats
+from podcats import CoverCache, Episode, find_cover
 
 
 def test_cover_detection_in_same_directory(solaris_episode):
@@ -65,3 +69,61 @@ def test_no_cover_image_for_book_without_cover():
     assert (
         episode.image is None
     ), "No cover image should be detected for a book without a cover file"
+
+
+def test_cover_preferred_over_folder_and_other_images(tmp_path):
+    """Test that cover.* wins over folder.* which wins over any other image."""
+    for name in ("back.jpg", "Folder.png", "art.gif"):
+        (tmp_path / name).touch()
+    assert find_cover(str(tmp_path)) == "Folder.png"
+
+    (tmp_path / "cover.png").touch()
+    (tmp_path / "cover.jpg").touch()
+    assert find_cover(str(tmp_path)) == "cover.jpg"
+
+
+def test_first_image_is_chosen_deterministically(tmp_path):
+    """Test that without cover/folder images the naturally first image is used."""
+    for name in ("page 10.jpg", "page 2.jpg", "notes.txt"):
+        (tmp_path / name).touch()
+
+    assert find_cover(str(tmp_path)) == "page 2.jpg"
+
+
+def test_cover_resolved_once_per_directory(monkeypatch):
+    """Test that all episodes in a folder share a single directory listing."""
+    listed = []
+    original = os.listdir
+
+    def counting_listdir(path):
+        listed.append(path)
+        return original(path)
+
+    monkeypatch.setattr(podcats, "cover_cache", CoverCache())
+    monkeypatch.setattr(os, "listdir", counting_listdir)
+    solaris = os.path.join(os.path.dirname(__file__), "sample_audio", "Solaris")
+    episodes = [
+        Episode(os.path.join(solaris, fn), "/Solaris", "http://localhost:5000")
+        for fn in ("01 - Chapter 1.mp3", "02 - Chapter 2.mp3", "03 - Chapter 3.mp3")
+    ]
+
+    for _ in range(3):
+        for episode in episodes:
+            assert episode.image.endswith("/Solaris/cover.jpg")
+
+    assert listed == [solaris]
+
+
+def test_cover_cache_invalidated_by_directory_change(tmp_path):
+    """Test that adding a cover is noticed once the directory mtime changes."""
+    shutil.copy(
+        os.path.join(os.path.dirname(__file__), "sample_audio", "Solaris", "01 - Chapter 1.mp3"),
+        str(tmp_path / "01.mp3"),
+    )
+    cache = CoverCache()
+    assert cache.find(str(tmp_path)) is None
+
+    (tmp_path / "cover.jpg").touch()
+    os.utime(str(tmp_path), ns=(0, time.time_ns() + 10 ** 9))
+
+    assert cache.find(str(tmp_path)) == "cover.jpg"
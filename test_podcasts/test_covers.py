@@ -0,0 +1,205 @@
+"""Tests for embedded cover extraction and cover thumbnails."""
+import io
+import os
+import shutil
+
+import pytest
+from mutagen.id3 import APIC, ID3
+from mutagen.mp4 import MP4Cover, MP4Tags
+
+import podcats
+from podcats import Episode, LibraryIndex, MetadataCache, covers, create_app, create_folder_app, read_metadata
+from conftest import TEST_AUDIO_ROOT, make_channel, make_folder_channel
+
+
+# The smallest data recognized as a JPEG
+TINY_JPEG = b"\xff\xd8\xff\xe0" + b"\x00" * 100
+
+requires_pillow = pytest.mark.skipif(not covers.thumbnails_available(), reason="Pillow is not installed")
+
+
+def jpeg(width, height):
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 30)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def embed(filename, data, picture_type=3):
+    tags = ID3(filename)
+    tags.add(APIC(encoding=3, mime="image/jpeg", type=picture_type, desc=str(picture_type), data=data))
+    tags.save(filename)
+
+
+@pytest.fixture
+def cover_store(tmp_path, monkeypatch):
+    """Fixture that configures a cover store for the duration of a test."""
+    store = covers.CoverStore(str(tmp_path / "covers"))
+    monkeypatch.setattr(podcats, "cover_store", store)
+    return store
+
+
+@pytest.fixture
+def library(library):
+    """Fixture for a library whose "Mask" book has only embedded covers."""
+    book = os.path.join(library, "Confessions of a Mask")
+    for filename in os.listdir(book):
+        embed(os.path.join(book, filename), TINY_JPEG)
+    return library
+
+
+def mask_episode(library):
+    return Episode(
+        os.path.join(library, "Confessions of a Mask", "01 - Chapter 1.mp3"),
+        "/Confessions of a Mask", "http://localhost:5000",
+    )
+
+
+class TestEmbeddedCover:
+    """Tests for finding embedded covers in tags."""
+
+    def test_front_cover_preferred(self, tmp_path):
+        filename = str(tmp_path / "a.mp3")
+        shutil.copy(os.path.join(TEST_AUDIO_ROOT, "Solaris", "01 - Chapter 1.mp3"), filename)
+        front = TINY_JPEG + b"front"
+        embed(filename, TINY_JPEG + b"back", picture_type=4)
+        embed(filename, front, picture_type=3)
+
+        assert covers.embedded_cover(ID3(filename)) == front
+
+    def test_mp4_cover(self):
+        tags = MP4Tags()
+        tags["covr"] = [MP4Cover(TINY_JPEG, imageformat=MP4Cover.FORMAT_JPEG)]
+
+        assert covers.embedded_cover(tags) == TINY_JPEG
+
+    def test_no_cover(self):
+        assert covers.embedded_cover(ID3(os.path.join(TEST_AUDIO_ROOT, "Solaris", "01 - Chapter 1.mp3"))) is None
+
+
+class TestExtraction:
+    """Tests for extracting covers while scanning."""
+
+    def test_not_extracted_without_store(self, library):
+        assert read_metadata(os.path.join(library, "Confessions of a Mask", "01 - Chapter 1.mp3")).cover is None
+        assert mask_episode(library).image is None
+
+    def test_stored_once_by_content(self, library, cover_store):
+        """Test that a cover embedded in every chapter is stored once."""
+        episodes = [e for e in make_channel(library) if "Mask" in e.filename]
+
+        assert len(episodes) == 3
+        assert len({e.cover for e in episodes}) == 1
+        name = episodes[0].cover
+        with open(cover_store.path(name), "rb") as f:
+            assert f.read() == TINY_JPEG
+        assert [fn for fn in os.listdir(cover_store.directory) if fn.endswith(".jpg")] == [name]
+
+    def test_no_embedded_cover(self, library, cover_store):
+        metadata = read_metadata(os.path.join(library, "Solaris", "01 - Chapter 1.mp3"))
+
+        assert metadata.cover == ""
+
+    def test_episode_image(self, library, cover_store, monkeypatch):
+        """Test that a cover file next to the episode wins over the embedded one."""
+        monkeypatch.setattr(covers, "Image", None)
+        episode = mask_episode(library)
+        assert episode.image == "http://localhost:5000/covers/" + episode.cover
+
+        shutil.copy(os.path.join(library, "Solaris", "cover.jpg"), os.path.join(library, "Confessions of a Mask"))
+        assert episode.image.endswith("/static/Confessions%20of%20a%20Mask/cover.jpg")
+
+    def test_cached_metadata_without_covers_is_reparsed(self, library, tmp_path, monkeypatch):
+        """Test that files cached before covers were extracted are parsed again."""
+        filename = os.path.join(library, "Confessions of a Mask", "01 - Chapter 1.mp3")
+        metadata_cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+        try:
+            Episode(filename, "/Confessions of a Mask", "http://localhost:5000", metadata_cache=metadata_cache)
+            monkeypatch.setattr(podcats, "cover_store", covers.CoverStore(str(tmp_path / "covers")))
+            episode = Episode(
+                filename, "/Confessions of a Mask", "http://localhost:5000", metadata_cache=metadata_cache)
+            assert episode.cover is not None
+
+            before = podcats.scan_stats["files_opened"]
+            Episode(filename, "/Confessions of a Mask", "http://localhost:5000", metadata_cache=metadata_cache)
+            assert podcats.scan_stats["files_opened"] == before
+        finally:
+            metadata_cache.close()
+
+    def test_cached_covers_ignored_without_store(self, library, tmp_path, monkeypatch):
+        """Test that cover names cached by the server are not used by generate or export."""
+        filename = os.path.join(library, "Confessions of a Mask", "01 - Chapter 1.mp3")
+        metadata_cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+        try:
+            with monkeypatch.context() as m:
+                m.setattr(podcats, "cover_store", covers.CoverStore(str(tmp_path / "covers")))
+                Episode(filename, "/Confessions of a Mask", "http://localhost:5000", metadata_cache=metadata_cache)
+
+            episode = Episode(
+                filename, "/Confessions of a Mask", "http://localhost:5000", metadata_cache=metadata_cache)
+            assert episode.cover is None
+            assert episode.image is None
+        finally:
+            metadata_cache.close()
+
+
+class TestCoverRoutes:
+    """Tests for serving extracted covers and thumbnails."""
+
+    def test_embedded_cover(self, library, cover_store):
+        client = create_app(make_channel(library)).test_client()
+        name = mask_episode(library).cover
+
+        response = client.get("/covers/" + name)
+        assert response.status_code == 200
+        assert response.data == TINY_JPEG
+        assert response.headers["Cache-Control"] == covers.IMMUTABLE_CACHE_CONTROL
+        assert client.get("/covers/../metadata.sqlite3").status_code == 404
+        assert client.get("/covers/" + "0" * 40 + ".jpg").status_code == 404
+
+    @requires_pillow
+    def test_embedded_cover_thumbnail(self, library, cover_store):
+        from PIL import Image
+
+        embed(os.path.join(library, "Confessions of a Mask", "01 - Chapter 1.mp3"), jpeg(2000, 1000))
+        episode = mask_episode(library)
+        client = create_app(make_channel(library)).test_client()
+
+        url = episode.cover_url(covers.WEB_SIZE)
+        assert url == "http://localhost:5000/covers/600/" + episode.cover
+        response = client.get(url[len("http://localhost:5000"):])
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == covers.IMMUTABLE_CACHE_CONTROL
+        assert Image.open(io.BytesIO(response.data)).size == (600, 300)
+        assert client.get("/covers/123/" + episode.cover).status_code == 404
+
+    @requires_pillow
+    def test_cover_file_thumbnail(self, library, cover_store):
+        from PIL import Image
+
+        index = LibraryIndex(root_dir=library, root_url="http://localhost:5000")
+        index.build()
+        folder_channel = make_folder_channel(library, library_index=index)
+        client = create_folder_app(folder_channel).test_client()
+
+        page = client.get("/web").get_data(as_text=True)
+        assert "/thumbnails/600/Solaris/cover.jpg?v=" in page
+        assert "/covers/600/" in page  # the embedded cover of "Confessions of a Mask"
+        url = [u for u in page.split('"') if "/thumbnails/600/Solaris/" in u][0][len("http://localhost:5000"):]
+
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"] == covers.IMMUTABLE_CACHE_CONTROL
+        assert max(Image.open(io.BytesIO(response.data)).size) <= 600
+
+        stale = client.get(url.split("?")[0] + "?v=0-0")
+        assert "immutable" not in stale.headers.get("Cache-Control", "")
+        assert client.get("/thumbnails/600/Solaris/01%20-%20Chapter%201.mp3").status_code == 404
+        assert client.get("/thumbnails/600/../outside.jpg").status_code == 404
+
+    def test_routes_without_store(self, library):
+        client = create_app(make_channel(library)).test_client()
+
+        assert client.get("/covers/" + "0" * 40 + ".jpg").status_code == 404
+        assert client.get("/thumbnails/600/Solaris/cover.jpg").status_code == 404
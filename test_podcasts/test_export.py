@@ -0,0 +1,112 @@
+"""Tests for the static export command."""
+import os
+import shutil
+import time
+import xml.etree.ElementTree as ET
+
+import pytest
+
+from podcats import export, export_folder_feeds
+from conftest import make_channel, make_folder_channel
+
+
+@pytest.fixture
+def outdir(tmp_path):
+    return str(tmp_path / "out")
+
+
+class TestExport:
+    """Tests for exporting a single feed."""
+
+    def test_writes_feed_and_web_page(self, library, outdir):
+        """Test that the feed and web page are written."""
+        channel = make_channel(library)
+        exporter = export(channel, outdir)
+
+        assert sorted(exporter.written) == ["feed.xml", os.path.join("web", "index.html")]
+        with open(os.path.join(outdir, "feed.xml"), "rb") as f:
+            assert len(ET.fromstring(f.read()).findall(".//item")) == 9
+
+    def test_paged_feed_has_no_page_links(self, library, outdir):
+        """Test that only the first page is exported, without links to pages that are not."""
+        channel = make_channel(library, page_size=4)
+        export(channel, outdir)
+
+        with open(os.path.join(outdir, "feed.xml"), "rb") as f:
+            feed = f.read()
+        assert len(ET.fromstring(feed).findall(".//item")) == 4
+        assert b"atom:link" not in feed
+        assert b'rel="next"' in channel.as_xml().encode("utf-8")
+
+
+class TestExportFolderFeeds:
+    """Tests for exporting one feed per folder."""
+
+    def test_writes_all_files(self, library, outdir):
+        """Test that every folder gets a feed and a web page, plus the index."""
+        exporter = export_folder_feeds(make_folder_channel(library), outdir)
+
+        assert len(exporter.written) == 7
+        for folder in ("Solaris", "Roadside Picnic", "Confessions of a Mask"):
+            assert os.path.exists(os.path.join(outdir, "feed", folder + ".xml"))
+            assert os.path.exists(os.path.join(outdir, "web", folder + ".html"))
+        assert os.path.exists(os.path.join(outdir, "web", "index.html"))
+
+    def test_second_export_rewrites_nothing(self, library, outdir):
+        """Test that unchanged inputs are neither rendered nor rewritten."""
+        export_folder_feeds(make_folder_channel(library), outdir)
+        exporter = export_folder_feeds(make_folder_channel(library), outdir)
+
+        assert exporter.written == []
+        assert len(exporter.unchanged) == 7
+
+    def test_only_changed_folder_is_rewritten(self, library, outdir):
+        """Test that adding a chapter rewrites that folder's files and the index only."""
+        export_folder_feeds(make_folder_channel(library), outdir)
+        solaris = os.path.join(library, "Solaris")
+        shutil.copy(os.path.join(solaris, "01 - Chapter 1.mp3"), os.path.join(solaris, "04 - Chapter 4.mp3"))
+
+        exporter = export_folder_feeds(make_folder_channel(library), outdir)
+
+        assert sorted(exporter.written) == sorted([
+            os.path.join("feed", "Solaris.xml"),
+            os.path.join("web", "Solaris.html"),
+            os.path.join("web", "index.html"),
+        ])
+
+    def test_modified_file_is_noticed(self, library, outdir):
+        """Test that touching an episode file triggers a rewrite."""
+        export_folder_feeds(make_folder_channel(library), outdir)
+        chapter = os.path.join(library, "Solaris", "02 - Chapter 2.mp3")
+        os.utime(chapter, ns=(0, time.time_ns() + 10 ** 9))
+
+        exporter = export_folder_feeds(make_folder_channel(library), outdir)
+
+        assert os.path.join("feed", "Solaris.xml") in exporter.written
+
+    def test_removed_folder_files_are_deleted(self, library, outdir):
+        """Test that files of a removed folder are deleted from the export."""
+        export_folder_feeds(make_folder_channel(library), outdir)
+        shutil.rmtree(os.path.join(library, "Solaris"))
+
+        exporter = export_folder_feeds(make_folder_channel(library), outdir)
+
+        assert os.path.join("feed", "Solaris.xml") in exporter.removed
+        assert not os.path.exists(os.path.join(outdir, "feed", "Solaris.xml"))
+
+    def test_missing_output_file_is_restored(self, library, outdir):
+        """Test that a deleted output file is written again."""
+        export_folder_feeds(make_folder_channel(library), outdir)
+        os.remove(os.path.join(outdir, "feed", "Solaris.xml"))
+
+        exporter = export_folder_feeds(make_folder_channel(library), outdir)
+
+        assert exporter.written == [os.path.join("feed", "Solaris.xml")]
+
+    def test_folder_named_index_is_refused(self, library, outdir):
+        """Test that a folder whose web page would overwrite the index page fails the export."""
+        shutil.copytree(os.path.join(library, "Solaris"), os.path.join(library, "index"))
+
+        with pytest.raises(ValueError, match="index"):
+            export_folder_feeds(make_folder_channel(library), outdir)
+        assert not os.path.exists(outdir)
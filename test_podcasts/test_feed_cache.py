@@ -0,0 +1,150 @@
+"""Tests for the rendered feed cache and conditional GET support."""
+import os
+import shutil
+import time
+
+import pytest
+
+from podcats import Channel, LibraryIndex, create_app, create_folder_app
+from conftest import make_channel, make_folder_channel
+
+
+@pytest.fixture
+def library_index(library):
+    index = LibraryIndex(root_dir=library, root_url="http://localhost:5000")
+    index.build()
+    return index
+
+
+@pytest.fixture
+def channel(library, library_index):
+    return make_channel(library, library_index=library_index)
+
+
+@pytest.fixture
+def folder_channel(library, library_index):
+    return make_folder_channel(library, library_index=library_index)
+
+
+@pytest.fixture
+def render_calls(monkeypatch):
+    """Fixture that counts Channel.as_xml() calls."""
+    calls = []
+    original = Channel.as_xml
+
+    def counting_as_xml(self, page=None):
+        calls.append(self.folder_path)
+        return original(self, page)
+
+    monkeypatch.setattr(Channel, "as_xml", counting_as_xml)
+    return calls
+
+
+def add_chapter(library, folder):
+    directory = os.path.join(library, folder)
+    shutil.copy(os.path.join(directory, "01 - Chapter 1.mp3"), os.path.join(directory, "04 - Chapter 4.mp3"))
+    os.utime(directory, ns=(0, time.time_ns() + 10 ** 9))
+
+
+class TestConditionalFeed:
+    """Tests for ETag / Last-Modified handling of the root feed."""
+
+    def test_response_has_validators(self, channel):
+        """Test that feed responses carry an ETag and Last-Modified."""
+        response = create_app(channel).test_client().get("/")
+
+        assert response.status_code == 200
+        assert response.headers["ETag"]
+        assert response.headers["Last-Modified"]
+        assert response.content_type == "application/xml; charset=utf-8"
+
+    def test_if_none_match_returns_304(self, channel, render_calls):
+        """Test that a matching ETag gets a 304 without re-rendering."""
+        client = create_app(channel).test_client()
+        etag = client.get("/").headers["ETag"]
+
+        response = client.get("/", headers={"If-None-Match": etag})
+
+        assert response.status_code == 304
+        assert response.data == b""
+        assert render_calls == [None]
+
+    def test_if_modified_since_returns_304(self, channel):
+        """Test that a current If-Modified-Since gets a 304."""
+        client = create_app(channel).test_client()
+        last_modified = client.get("/").headers["Last-Modified"]
+
+        response = client.get("/", headers={"If-Modified-Since": last_modified})
+
+        assert response.status_code == 304
+
+    def test_unchanged_library_is_rendered_once(self, channel, render_calls):
+        """Test that repeated polls are served from the cache."""
+        client = create_app(channel).test_client()
+        bodies = {client.get("/").data for _ in range(3)}
+
+        assert len(bodies) == 1
+        assert render_calls == [None]
+
+    def test_change_invalidates_cache(self, library, library_index, channel, render_calls):
+        """Test that a library change produces a new body and ETag."""
+        client = create_app(channel).test_client()
+        first = client.get("/")
+
+        add_chapter(library, "Solaris")
+        library_index.refresh()
+        second = client.get("/", headers={"If-None-Match": first.headers["ETag"]})
+
+        assert second.status_code == 200
+        assert second.headers["ETag"] != first.headers["ETag"]
+        assert second.data.count(b"<item>") == 10
+        assert len(render_calls) == 2
+
+    def test_web_page_is_conditional(self, channel):
+        """Test that the web interface also supports conditional requests."""
+        client = create_app(channel).test_client()
+        etag = client.get("/web").headers["ETag"]
+
+        assert client.get("/web", headers={"If-None-Match": etag}).status_code == 304
+
+
+class TestConditionalFolderFeeds:
+    """Tests for per-folder cache invalidation."""
+
+    def test_other_folders_stay_cached(self, library, library_index, folder_channel, render_calls):
+        """Test that changing one folder only invalidates that folder's feed."""
+        client = create_folder_app(folder_channel).test_client()
+        solaris = client.get("/feed/Solaris").headers["ETag"]
+        picnic = client.get("/feed/Roadside%20Picnic").headers["ETag"]
+
+        add_chapter(library, "Solaris")
+        library_index.refresh()
+
+        assert client.get("/feed/Roadside%20Picnic", headers={"If-None-Match": picnic}).status_code == 304
+        assert client.get("/feed/Solaris", headers={"If-None-Match": solaris}).status_code == 200
+        assert render_calls == ["Solaris", "Roadside Picnic", "Solaris"]
+
+    def test_index_page_is_conditional(self, folder_channel):
+        """Test that the folder index supports conditional requests."""
+        client = create_folder_app(folder_channel).test_client()
+        etag = client.get("/web").headers["ETag"]
+
+        assert client.get("/web", headers={"If-None-Match": etag}).status_code == 304
+
+    def test_unknown_folder_is_404(self, folder_channel):
+        """Test that unknown folders are still reported as missing."""
+        client = create_folder_app(folder_channel).test_client()
+
+        assert client.get("/feed/Nope").status_code == 404
+
+
+class TestWithoutIndex:
+    """Tests for serving a channel that is not backed by a LibraryIndex."""
+
+    def test_conditional_without_index(self):
+        """Test that ETags still work when nothing can be cached."""
+        channel = make_channel()
+        client = create_app(channel).test_client()
+        etag = client.get("/").headers["ETag"]
+
+        assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
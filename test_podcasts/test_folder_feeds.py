@@ -1,8 +1,11 @@
 """Tests for the folder-feeds feature (FolderChannel class)."""
 import os
+import shutil
 import xml.etree.ElementTree as ET
 import pytest
-from podcats import FolderChannel, is_audio_file
+import podcats
+from podcats import FolderChannel, LibraryIndex, is_audio_file
+from conftest import make_folder_channel
 
 
 # The root directory for our test audio files
@@ -144,6 +147,28 @@ class TestFolderChannelHtmlIndex:
         # Check for web URL patterns
         assert "/web/Solaris" in html_string or "/web/Solaris" in html_string.replace("%20", " ")
 
+    def test_html_index_parses_no_episodes(self, folder_channel, monkeypatch):
+        """Test that the index is built from directory listings, not episode metadata."""
+        def fail(filename):
+            raise AssertionError("parsed " + filename)
+
+        monkeypatch.setattr(podcats, "read_metadata", fail)
+        html_string = folder_channel.as_html_index().decode("utf-8")
+
+        assert html_string.count("3 episodes") == 3
+        assert "http://localhost:5000/static/Solaris/cover.jpg" in html_string
+        assert "/static/Confessions%20of%20a%20Mask/" not in html_string
+
+    def test_html_index_counts_from_library_index(self):
+        """Test that episode counts come from the library index when there is one."""
+        index = LibraryIndex(root_dir=TEST_AUDIO_ROOT, root_url="http://localhost:5000")
+        index.build()
+        folder_channel = make_folder_channel(library_index=index)
+
+        assert index.count("Solaris") == 3
+        assert index.count("Missing") == 0
+        assert folder_channel.as_html_index().decode("utf-8").count("3 episodes") == 3
+
 
 class TestFolderChannelWithEmptyDirectory:
     """Tests for edge cases with empty or invalid directories."""
@@ -180,3 +205,68 @@ class TestFolderChannelWithEmptyDirectory:
 
         folders = folder_channel.get_folders()
         assert folders == []
+
+
+class TestFolderRegistry:
+    """Tests for keeping the folder list up to date while serving."""
+
+    def add_book(self, library, name):
+        os.makedirs(os.path.join(library, name), exist_ok=True)
+        shutil.copy(os.path.join(library, "Solaris", "01 - Chapter 1.mp3"), os.path.join(library, name))
+
+    def test_new_folder_appears(self, library):
+        folder_channel = make_folder_channel(library)
+        assert folder_channel.get_channel("New Book") is None
+
+        self.add_book(library, "New Book")
+
+        assert "New Book" in folder_channel.get_folders()
+        assert folder_channel.get_channel("New Book") is not None
+
+    def test_audio_added_to_existing_folder(self, library):
+        """Test that a folder gaining its first audio file appears without a root change."""
+        os.mkdir(os.path.join(library, "Later"))
+        folder_channel = make_folder_channel(library)
+        assert "Later" not in folder_channel.get_folders()
+
+        root_mtime = os.stat(library).st_mtime_ns
+        self.add_book(library, "Later")
+        assert os.stat(library).st_mtime_ns == root_mtime
+
+        assert "Later" in folder_channel.get_folders()
+
+    def test_removed_folder_disappears(self, library):
+        folder_channel = make_folder_channel(library)
+        assert folder_channel.get_channel("Solaris") is not None
+
+        shutil.rmtree(os.path.join(library, "Solaris"))
+
+        assert "Solaris" not in folder_channel.get_folders()
+        assert folder_channel.get_channel("Solaris") is None
+
+    def test_unchanged_folders_are_not_listed_again(self, library, monkeypatch):
+        folder_channel = make_folder_channel(library)
+        folder_channel.get_folders()
+
+        calls = []
+        original = podcats.has_audio_files
+        monkeypatch.setattr(podcats, "has_audio_files", lambda d: calls.append(d) or original(d))
+        folder_channel.get_folders()
+        assert calls == []
+
+        self.add_book(library, "New Book")
+        folder_channel.get_folders()
+        assert calls == [os.path.join(library, "New Book")]
+
+    def test_folders_follow_library_index(self, library):
+        index = LibraryIndex(root_dir=library, root_url="http://localhost:5000")
+        index.build()
+        folder_channel = make_folder_channel(library, library_index=index)
+        assert folder_channel.get_folders() == ["Confessions of a Mask", "Roadside Picnic", "Solaris"]
+
+        self.add_book(library, "New Book")
+        assert "New Book" not in folder_channel.get_folders()
+
+        index.refresh()
+        assert "New Book" in folder_channel.get_folders()
+        assert folder_channel.get_channel("New Book") is not None
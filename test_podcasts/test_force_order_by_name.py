@@ -208,3 +208,37 @@ class TestFilesWithoutNumbers:
         assert ep1.date > 0
         assert ep2.date > 0
         assert ep_bonus.date > 0
+
+
+class TestPrecomputedSortKey:
+    """Tests for the sort key computed once per episode."""
+
+    def test_sort_key_is_natural_key_in_force_order_mode(self):
+        """Test that force-order episodes carry their natural filename key."""
+        ep = Episode(os.path.join(SOLARIS_DIR, "02 - Chapter 2.mp3"), "/Solaris", "http://localhost:5000",
+                     force_order_by_name=True)
+
+        assert ep.sort_key == tuple(natural_sort_key("02 - Chapter 2.mp3"))
+
+    def test_sort_key_is_date_by_default(self):
+        """Test that default episodes are keyed by their date."""
+        ep = Episode(os.path.join(SOLARIS_DIR, "02 - Chapter 2.mp3"), "/Solaris", "http://localhost:5000")
+
+        assert ep.sort_key == (ep.date,)
+
+    def test_date_is_not_recomputed(self, monkeypatch):
+        """Test that sorting does not re-parse dates."""
+        episodes = list(Channel(
+            root_dir=SOLARIS_DIR,
+            root_url="http://localhost:5000",
+            host="localhost",
+            port=5000,
+            title="Test",
+            link=None,
+        ))
+
+        def fail(*args):
+            raise AssertionError("date parsed during sort")
+
+        monkeypatch.setattr(Episode, "_compute_date", fail)
+        assert len(sorted(episodes)) == 3
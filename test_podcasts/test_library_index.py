@@ -0,0 +1,288 @@
+"""Tests for the in-memory LibraryIndex used by the serve command."""
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+import podcats
+from podcats import LibraryIndex, MetadataCache, scan_stats
+from podcats import watch
+from conftest import TEST_AUDIO_ROOT, make_channel, make_folder_channel
+
+
+@pytest.fixture
+def library_index(library):
+    """Fixture that provides a built LibraryIndex for the sample library."""
+    index = LibraryIndex(root_dir=library, root_url="http://localhost:5000")
+    index.build()
+    yield index
+    index.stop_watching()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class TestLibraryIndex:
+    """Tests for building and refreshing the index."""
+
+    def test_index_matches_walk(self, library, library_index):
+        """Test that the index holds the same episodes a full walk finds."""
+        walked = sorted(e.filename for e in make_channel(library))
+        indexed = sorted(e.filename for e in make_channel(library, library_index=library_index))
+
+        assert indexed == walked
+        assert len(library_index) == 9
+
+    def test_folder_path_restricts_episodes(self, library, library_index):
+        """Test that a folder channel only sees its own folder's episodes."""
+        episodes = list(make_channel(library, library_index=library_index, folder_path="Solaris"))
+
+        assert len(episodes) == 3
+        assert all(os.path.basename(os.path.dirname(e.filename)) == "Solaris" for e in episodes)
+
+    def test_relative_dir_matches_walk(self, library, library_index):
+        """Test that episode URLs are the same as for a walked channel."""
+        walked = sorted(e.url for e in make_channel(library))
+        indexed = sorted(e.url for e in make_channel(library, library_index=library_index))
+
+        assert indexed == walked
+
+    def test_feed_requests_do_not_touch_files(self, library, library_index):
+        """Test that rendering from the index does not parse any file."""
+        before = scan_stats["files_opened"]
+        make_channel(library, library_index=library_index).as_xml()
+
+        assert scan_stats["files_opened"] == before
+
+    def test_refresh_picks_up_added_and_removed_files(self, library, library_index):
+        """Test that refresh() notices new and deleted files via directory mtimes."""
+        solaris = os.path.join(library, "Solaris")
+        shutil.copy(os.path.join(solaris, "01 - Chapter 1.mp3"), os.path.join(solaris, "04 - Chapter 4.mp3"))
+        os.remove(os.path.join(solaris, "02 - Chapter 2.mp3"))
+        os.utime(solaris, ns=(0, time.time_ns() + 10 ** 9))
+
+        library_index.refresh()
+
+        names = sorted(os.path.basename(e.filename) for e in library_index.episodes("Solaris"))
+        assert names == ["01 - Chapter 1.mp3", "03 - Chapter 3.mp3", "04 - Chapter 4.mp3"]
+
+    def test_refresh_picks_up_new_folders(self, library, library_index):
+        """Test that a new book folder is indexed after a refresh."""
+        shutil.copytree(os.path.join(library, "Solaris"), os.path.join(library, "Eden"))
+        os.utime(library, ns=(0, time.time_ns() + 10 ** 9))
+
+        library_index.refresh()
+
+        assert len(library_index.episodes("Eden")) == 3
+        assert len(library_index) == 12
+
+    def test_refresh_drops_removed_folders(self, library, library_index):
+        """Test that a deleted folder disappears from the index."""
+        shutil.rmtree(os.path.join(library, "Solaris"))
+        library_index.refresh([library])
+
+        assert library_index.episodes("Solaris") == []
+        assert len(library_index) == 6
+
+    def test_parsing_does_not_block_readers(self, library, library_index, monkeypatch):
+        """Test that feeds are served from the index while new files are parsed."""
+        parsing, release = threading.Event(), threading.Event()
+        read_metadata = podcats.read_metadata
+
+        def slow_read_metadata(filename):
+            parsing.set()
+            release.wait(5)
+            return read_metadata(filename)
+
+        monkeypatch.setattr(podcats, "read_metadata", slow_read_metadata)
+        solaris = os.path.join(library, "Solaris")
+        shutil.copy(os.path.join(solaris, "01 - Chapter 1.mp3"), os.path.join(solaris, "04 - Chapter 4.mp3"))
+        refresher = threading.Thread(target=library_index.refresh, args=([solaris],))
+        refresher.start()
+        try:
+            assert parsing.wait(5)
+            read = []
+            reader = threading.Thread(target=lambda: read.append(
+                (library_index.state("Solaris"), len(library_index.episodes("Solaris")))))
+            reader.start()
+            reader.join(2)
+            assert read and read[0][1] == 3
+        finally:
+            release.set()
+            refresher.join()
+
+        assert len(library_index.episodes("Solaris")) == 4
+        assert library_index.state("Solaris")[0] > read[0][0][0]
+
+    def test_listing_does_not_block_readers(self, library, library_index, monkeypatch):
+        """Test that feeds are served from the index while directories are listed."""
+        listing, release = threading.Event(), threading.Event()
+        scandir = os.scandir
+
+        def slow_scandir(path):
+            listing.set()
+            release.wait(5)
+            return scandir(path)
+
+        monkeypatch.setattr(os, "scandir", slow_scandir)
+        refresher = threading.Thread(target=library_index.refresh, args=([library],))
+        refresher.start()
+        try:
+            assert listing.wait(5)
+            read = []
+            reader = threading.Thread(target=lambda: read.append(len(library_index.episodes())))
+            reader.start()
+            reader.join(2)
+            assert read == [9]
+        finally:
+            release.set()
+            refresher.join()
+
+    def test_unchanged_files_are_not_reparsed(self, library, library_index):
+        """Test that refreshing a directory reuses episodes of unchanged files."""
+        before = scan_stats["files_opened"]
+        library_index.refresh([os.path.join(library, "Solaris")])
+
+        assert scan_stats["files_opened"] == before
+
+    def test_build_reports_every_file_as_added(self, library):
+        changes = LibraryIndex(root_dir=library, root_url="http://localhost:5000").build()
+
+        assert len(changes.added) == 9
+        assert changes.removed == changes.modified == []
+
+    def test_refresh_reports_changes(self, library, library_index):
+        """Test that refresh() returns the added, removed and modified files."""
+        solaris = os.path.join(library, "Solaris")
+        added = os.path.join(solaris, "04 - Chapter 4.mp3")
+        removed = os.path.join(solaris, "02 - Chapter 2.mp3")
+        modified = os.path.join(solaris, "03 - Chapter 3.mp3")
+        shutil.copy(os.path.join(solaris, "01 - Chapter 1.mp3"), added)
+        os.remove(removed)
+        with open(modified, "ab") as f:
+            f.write(b"\0")
+        os.utime(solaris, ns=(0, time.time_ns() + 10 ** 9))
+
+        changes = library_index.refresh()
+
+        assert changes == (
+            [os.path.normpath(added)], [os.path.normpath(removed)], [os.path.normpath(modified)]
+        )
+
+    def test_unchanged_refresh_reports_nothing(self, library, library_index):
+        changes = library_index.refresh([library])
+
+        assert not changes
+        assert changes.added == changes.removed == changes.modified == []
+
+    def test_removed_folder_reports_its_files(self, library, library_index):
+        shutil.rmtree(os.path.join(library, "Solaris"))
+        changes = library_index.refresh([library])
+
+        assert len(changes.removed) == 3
+        assert all("Solaris" in filename for filename in changes.removed)
+
+    def test_subscribers_get_changes(self, library, library_index):
+        """Test that subscribers are only called for refreshes that changed something."""
+        received = []
+        library_index.subscribe(received.append)
+        library_index.refresh([library])
+        shutil.rmtree(os.path.join(library, "Solaris"))
+        library_index.refresh([library])
+
+        assert len(received) == 1
+        assert len(received[0].removed) == 3
+
+    def test_removed_files_leave_the_metadata_cache(self, library, tmp_path):
+        cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+        try:
+            index = LibraryIndex(root_dir=library, root_url="http://localhost:5000", metadata_cache=cache)
+            index.build()
+            filename = os.path.join(library, "Solaris", "02 - Chapter 2.mp3")
+            stat = os.stat(filename)
+            assert cache.get(filename, stat) is not None
+
+            os.remove(filename)
+            index.refresh([os.path.join(library, "Solaris")])
+
+            assert cache.get(filename, stat) is None
+        finally:
+            cache.close()
+
+    def test_symlinked_folders(self, library, tmp_path):
+        """Test that symlinked book folders get folder feeds, as without the index."""
+        shutil.copytree(os.path.join(TEST_AUDIO_ROOT, "Solaris"), str(tmp_path / "real" / "Eden"))
+        os.symlink(str(tmp_path / "real" / "Eden"), os.path.join(library, "Eden"))
+        os.symlink(library, os.path.join(library, "Loop"))
+        index = LibraryIndex(root_dir=library, root_url="http://localhost:5000")
+        index.build()
+
+        assert sorted(index.folders()) == ["Confessions of a Mask", "Eden", "Roadside Picnic", "Solaris"]
+        assert len(index.episodes("Eden")) == 3
+        assert index.episodes("Loop") == []
+        walked = sorted(e.filename for e in make_channel(library))
+        assert sorted(e.filename for e in make_channel(library, library_index=index)) == walked
+
+    def test_folder_channel_uses_index(self, library, library_index):
+        """Test that FolderChannel passes the index on to its channels."""
+        folder_channel = make_folder_channel(library, library_index=library_index)
+
+        assert folder_channel.get_channel("Solaris").library_index is library_index
+
+
+class TestWatching:
+    """Tests for keeping the index up to date in the background."""
+
+    def test_polling_watcher(self, library, library_index, monkeypatch):
+        """Test that the polling fallback notices a new file."""
+        monkeypatch.setattr(watch, "create_watcher", lambda callback, poll_interval: watch.PollingWatcher(
+            callback, interval=poll_interval))
+        library_index.start_watching(poll_interval=0.05)
+
+        solaris = os.path.join(library, "Solaris")
+        shutil.copy(os.path.join(solaris, "01 - Chapter 1.mp3"), os.path.join(solaris, "04 - Chapter 4.mp3"))
+        os.utime(solaris, ns=(0, time.time_ns() + 10 ** 9))
+
+        assert wait_for(lambda: len(library_index.episodes("Solaris")) == 4)
+
+    def test_inotify_watcher(self, library, library_index):
+        """Test that inotify events update the index."""
+        try:
+            watch.InotifyWatcher(lambda changed: None).stop()
+        except OSError:
+            pytest.skip("inotify is not available")
+        library_index.start_watching()
+
+        os.makedirs(os.path.join(library, "Eden"))
+        shutil.copy(
+            os.path.join(library, "Solaris", "01 - Chapter 1.mp3"),
+            os.path.join(library, "Eden", "01 - Chapter 1.mp3"),
+        )
+
+        assert wait_for(lambda: len(library_index.episodes("Eden")) == 1)
+
+    def test_failed_watch_releases_inotify(self, library, library_index, monkeypatch):
+        """Test that falling back to polling closes the inotify watcher."""
+        stopped = []
+
+        class FailingWatcher(watch.PollingWatcher):
+            def add(self, directory):
+                raise OSError(28, "No space left on device")
+
+            def stop(self):
+                stopped.append(self)
+                super().stop()
+
+        monkeypatch.setattr(watch, "create_watcher", lambda callback, poll_interval: FailingWatcher(callback))
+        library_index.start_watching(poll_interval=0.05)
+
+        assert len(stopped) == 1
+        assert type(library_index._watcher) is watch.PollingWatcher
@@ -0,0 +1,129 @@
+"""Tests for audio file delivery with Range and conditional requests."""
+import os
+
+import pytest
+
+from podcats import create_app, create_folder_app
+from podcats.media import parse_ranges
+from conftest import TEST_AUDIO_ROOT, make_channel, make_folder_channel
+
+
+EPISODE = "Solaris/01 - Chapter 1.mp3"
+EPISODE_URL = "/static/Solaris/01%20-%20Chapter%201.mp3"
+
+
+@pytest.fixture
+def episode_bytes():
+    with open(os.path.join(TEST_AUDIO_ROOT, EPISODE), "rb") as f:
+        return f.read()
+
+
+@pytest.fixture
+def client():
+    channel = make_channel()
+    return create_app(channel).test_client()
+
+
+class TestParseRanges:
+    """Tests for resolving Range headers against a file size."""
+
+    def test_absent_or_invalid_headers_mean_whole_file(self):
+        for header in (None, "", "items=0-1", "bytes=", "bytes=a-b", "bytes=5-3", "bytes=5"):
+            assert parse_ranges(header, 100) is None
+
+    def test_single_ranges(self):
+        assert parse_ranges("bytes=0-9", 100) == [(0, 10)]
+        assert parse_ranges("bytes=90-", 100) == [(90, 100)]
+        assert parse_ranges("bytes=-10", 100) == [(90, 100)]
+        assert parse_ranges("bytes=95-200", 100) == [(95, 100)]
+        assert parse_ranges("bytes=-200", 100) == [(0, 100)]
+
+    def test_unsatisfiable_ranges(self):
+        assert parse_ranges("bytes=100-", 100) == []
+        assert parse_ranges("bytes=-0", 100) == []
+
+    def test_multiple_ranges_are_sorted_and_merged(self):
+        assert parse_ranges("bytes=50-59, 0-9", 100) == [(0, 10), (50, 60)]
+        assert parse_ranges("bytes=0-9,5-19,20-29,-5", 100) == [(0, 30), (95, 100)]
+
+
+class TestMediaRoute:
+    """Tests for the /static route of the feed apps."""
+
+    def test_full_download(self, client, episode_bytes):
+        response = client.get(EPISODE_URL)
+        assert response.status_code == 200
+        assert response.data == episode_bytes
+        assert response.headers["Content-Type"] == "audio/mpeg"
+        assert response.headers["Content-Length"] == str(len(episode_bytes))
+        assert response.headers["Accept-Ranges"] == "bytes"
+        assert response.headers["ETag"]
+        assert response.headers["Last-Modified"]
+
+    def test_head_request(self, client, episode_bytes):
+        response = client.head(EPISODE_URL)
+        assert response.status_code == 200
+        assert response.data == b""
+        assert response.headers["Content-Length"] == str(len(episode_bytes))
+
+    def test_single_range(self, client, episode_bytes):
+        response = client.get(EPISODE_URL, headers={"Range": "bytes=100-199"})
+        assert response.status_code == 206
+        assert response.data == episode_bytes[100:200]
+        assert response.headers["Content-Range"] == "bytes 100-199/{}".format(len(episode_bytes))
+        assert response.headers["Content-Length"] == "100"
+
+    def test_suffix_range(self, client, episode_bytes):
+        response = client.get(EPISODE_URL, headers={"Range": "bytes=-50"})
+        assert response.status_code == 206
+        assert response.data == episode_bytes[-50:]
+
+    def test_multiple_ranges(self, client, episode_bytes):
+        response = client.get(EPISODE_URL, headers={"Range": "bytes=0-9,-10"})
+        assert response.status_code == 206
+        content_type = response.headers["Content-Type"]
+        assert content_type.startswith("multipart/byteranges; boundary=")
+        boundary = content_type.split("boundary=")[1].encode()
+        assert response.headers["Content-Length"] == str(len(response.data))
+
+        parts = response.data.split(b"--" + boundary)
+        assert parts[0] == b""
+        assert parts[-1] == b"--\r\n"
+        bodies = [part.split(b"\r\n\r\n", 1) for part in parts[1:-1]]
+        assert b"Content-Range: bytes 0-9/" in bodies[0][0]
+        assert bodies[0][1] == episode_bytes[:10] + b"\r\n"
+        assert bodies[1][1] == episode_bytes[-10:] + b"\r\n"
+
+    def test_unsatisfiable_range(self, client, episode_bytes):
+        response = client.get(EPISODE_URL, headers={"Range": "bytes={}-".format(len(episode_bytes))})
+        assert response.status_code == 416
+        assert response.headers["Content-Range"] == "bytes */{}".format(len(episode_bytes))
+
+    def test_conditional_requests(self, client):
+        first = client.get(EPISODE_URL)
+        etag = first.headers["ETag"]
+        assert client.get(EPISODE_URL, headers={"If-None-Match": etag}).status_code == 304
+        response = client.get(EPISODE_URL, headers={"If-Modified-Since": first.headers["Last-Modified"]})
+        assert response.status_code == 304
+
+    def test_if_range(self, client, episode_bytes):
+        etag = client.get(EPISODE_URL).headers["ETag"]
+        matching = client.get(EPISODE_URL, headers={"Range": "bytes=0-9", "If-Range": etag})
+        assert matching.status_code == 206
+        stale = client.get(EPISODE_URL, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+        assert stale.status_code == 200
+        assert stale.data == episode_bytes
+
+    def test_missing_files_and_traversal(self, client):
+        assert client.get("/static/Solaris/missing.mp3").status_code == 404
+        assert client.get("/static/Solaris").status_code == 404
+        assert client.get("/static/../test_media.py").status_code == 404
+        assert client.get("/static/%2e%2e/test_media.py").status_code == 404
+
+    def test_folder_app_serves_media(self, episode_bytes):
+        folder_channel = make_folder_channel(title="Test")
+        client = create_folder_app(folder_channel).test_client()
+        response = client.get(EPISODE_URL, headers={"Range": "bytes=0-3"})
+        assert response.status_code == 206
+        assert response.data == episode_bytes[:4]
+        assert client.get("/static/Solaris/cover.jpg").headers["Content-Type"] == "image/jpeg"
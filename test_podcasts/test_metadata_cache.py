@@ -0,0 +1,144 @@
+"""Tests for the persistent episode metadata cache."""
+import os
+import shutil
+
+import pytest
+
+import podcats
+from podcats import Episode, MetadataCache
+from conftest import TEST_AUDIO_ROOT, make_channel
+
+
+SOLARIS_CHAPTER_1 = os.path.join(TEST_AUDIO_ROOT, "Solaris", "01 - Chapter 1.mp3")
+
+
+@pytest.fixture
+def metadata_cache(tmp_path):
+    """Fixture that provides an empty MetadataCache in a temporary directory."""
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def parse_counter(monkeypatch):
+    """Fixture that counts calls to podcats.read_metadata."""
+    calls = []
+    original = podcats.read_metadata
+
+    def counting_read_metadata(filename):
+        calls.append(filename)
+        return original(filename)
+
+    monkeypatch.setattr(podcats, "read_metadata", counting_read_metadata)
+    return calls
+
+
+class TestMetadataCache:
+    """Tests for the MetadataCache storage."""
+
+    def test_round_trip(self, metadata_cache):
+        """Test that stored metadata is returned for an unchanged file."""
+        stat = os.stat(SOLARIS_CHAPTER_1)
+        metadata = podcats.read_metadata(SOLARIS_CHAPTER_1).as_dict()
+        metadata_cache.put(SOLARIS_CHAPTER_1, stat, metadata)
+
+        assert metadata_cache.get(SOLARIS_CHAPTER_1, stat) == metadata
+
+    def test_missing_entry(self, metadata_cache):
+        """Test that unknown files are cache misses."""
+        assert metadata_cache.get(SOLARIS_CHAPTER_1, os.stat(SOLARIS_CHAPTER_1)) is None
+
+    def test_stale_entry_after_modification(self, metadata_cache, tmp_path):
+        """Test that changing a file's size or mtime invalidates its entry."""
+        filename = str(tmp_path / "episode.mp3")
+        shutil.copy(SOLARIS_CHAPTER_1, filename)
+        metadata_cache.put(filename, os.stat(filename), podcats.read_metadata(filename).as_dict())
+
+        with open(filename, "ab") as f:
+            f.write(b"\0" * 10)
+        os.utime(filename, (1, 1))
+
+        assert metadata_cache.get(filename, os.stat(filename)) is None
+
+    def test_persists_across_instances(self, tmp_path):
+        """Test that entries survive closing and reopening the database."""
+        path = str(tmp_path / "metadata.sqlite3")
+        stat = os.stat(SOLARIS_CHAPTER_1)
+        cache = MetadataCache(path)
+        cache.put(SOLARIS_CHAPTER_1, stat, podcats.read_metadata(SOLARIS_CHAPTER_1).as_dict())
+        cache.close()
+
+        cache = MetadataCache(path)
+        try:
+            assert cache.get(SOLARIS_CHAPTER_1, stat) is not None
+        finally:
+            cache.close()
+
+    def test_reopens_after_close(self, metadata_cache):
+        """Test that a closed cache reconnects when it is used again."""
+        stat = os.stat(SOLARIS_CHAPTER_1)
+        metadata = podcats.read_metadata(SOLARIS_CHAPTER_1).as_dict()
+        metadata_cache.put(SOLARIS_CHAPTER_1, stat, metadata)
+        metadata_cache.close()
+
+        assert metadata_cache.get(SOLARIS_CHAPTER_1, stat) == metadata
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork()")
+    def test_forked_process_uses_own_connection(self, metadata_cache):
+        """Test that a forked server worker can write through the inherited cache."""
+        stat = os.stat(SOLARIS_CHAPTER_1)
+        metadata = podcats.read_metadata(SOLARIS_CHAPTER_1).as_dict()
+        metadata_cache.get(SOLARIS_CHAPTER_1, stat)
+
+        pid = os.fork()
+        if pid == 0:
+            try:
+                metadata_cache.put(SOLARIS_CHAPTER_1, stat, metadata)
+                metadata_cache.flush()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+
+        assert metadata_cache.get(SOLARIS_CHAPTER_1, stat) == metadata
+
+
+class TestChannelWithMetadataCache:
+    """Tests for Channel scanning through the metadata cache."""
+
+    def test_second_scan_parses_nothing(self, metadata_cache, parse_counter):
+        """Test that unchanged files are not parsed again on a second scan."""
+        channel = make_channel(metadata_cache=metadata_cache)
+
+        assert len(list(channel)) == 9
+        assert len(parse_counter) == 9
+
+        assert len(list(channel)) == 9
+        assert len(parse_counter) == 9
+
+    def test_only_changed_files_are_parsed(self, metadata_cache, parse_counter, tmp_path):
+        """Test that only modified files are parsed again."""
+        library = tmp_path / "library"
+        shutil.copytree(os.path.join(TEST_AUDIO_ROOT, "Solaris"), str(library))
+        channel = make_channel(str(library), metadata_cache=metadata_cache)
+        list(channel)
+        del parse_counter[:]
+
+        changed = str(library / "02 - Chapter 2.mp3")
+        os.utime(changed, (1, 1))
+        list(channel)
+
+        assert parse_counter == [changed]
+
+    def test_cached_episode_matches_parsed_episode(self, metadata_cache):
+        """Test that an episode built from the cache has the same metadata."""
+        parsed = Episode(SOLARIS_CHAPTER_1, "/Solaris", "http://localhost:5000")
+        Episode(SOLARIS_CHAPTER_1, "/Solaris", "http://localhost:5000", metadata_cache=metadata_cache)
+        cached = Episode(SOLARIS_CHAPTER_1, "/Solaris", "http://localhost:5000", metadata_cache=metadata_cache)
+
+        assert cached.title == parsed.title
+        assert cached.duration == parsed.duration
+        assert cached.date == parsed.date
+        assert cached.length == parsed.length
+        assert (cached.id3_title, cached.id3_comment) == (parsed.id3_title, parsed.id3_comment)
+        assert cached.mimetype == parsed.mimetype
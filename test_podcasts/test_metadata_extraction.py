@@ -0,0 +1,114 @@
+"""Tests for single-pass episode metadata extraction."""
+import os
+
+import mutagen
+import pytest
+
+from podcats import Episode, EpisodeMetadata, read_metadata, scan_stats
+from conftest import TEST_AUDIO_ROOT, make_channel
+
+
+SOLARIS_CHAPTER_1 = os.path.join(TEST_AUDIO_ROOT, "Solaris", "01 - Chapter 1.mp3")
+
+
+def files_opened():
+    return scan_stats["files_opened"]
+
+
+class TestReadMetadata:
+    """Tests for read_metadata()."""
+
+    def test_returns_compact_record(self):
+        """Test that metadata is stored on a __slots__ record."""
+        metadata = read_metadata(SOLARIS_CHAPTER_1)
+
+        assert isinstance(metadata, EpisodeMetadata)
+        assert not hasattr(metadata, "__dict__")
+
+    def test_easy_tags_match_mutagen_easy_mode(self):
+        """Test that derived easy tags match mutagen's own easy interface."""
+        expected = {
+            key: [str(v) for v in value]
+            for key, value in mutagen.File(SOLARIS_CHAPTER_1, easy=True).items()
+        }
+
+        assert read_metadata(SOLARIS_CHAPTER_1).tags == expected
+
+    def test_extracts_id3_frames_and_duration(self):
+        """Test that ID3 frames and duration come from the same parse."""
+        metadata = read_metadata(SOLARIS_CHAPTER_1)
+
+        assert metadata.id3_title == "Chapter 1"
+        assert metadata.id3_comment is None
+        assert metadata.duration == 1
+        assert metadata.mimetype == "audio/mpeg"
+
+    def test_opens_file_once(self):
+        """Test that a single file is opened exactly once."""
+        before = files_opened()
+        read_metadata(SOLARIS_CHAPTER_1)
+
+        assert files_opened() - before == 1
+
+    def test_unparseable_file(self, tmp_path):
+        """Test that garbage audio yields empty metadata rather than an error."""
+        filename = str(tmp_path / "broken.mp3")
+        with open(filename, "wb") as f:
+            f.write(b"not really an mp3")
+
+        metadata = read_metadata(filename)
+
+        assert metadata.tags == {}
+        assert metadata.id3_title is None
+        assert metadata.duration is None
+
+    def test_round_trips_through_dict(self):
+        """Test that records survive conversion to and from plain dicts."""
+        metadata = read_metadata(SOLARIS_CHAPTER_1)
+
+        assert EpisodeMetadata.from_dict(metadata.as_dict()).as_dict() == metadata.as_dict()
+
+
+class TestCompactEpisode:
+    """Tests for the memory footprint of Episode."""
+
+    def test_only_rendered_fields_are_kept(self):
+        """Test that episodes use __slots__ and do not keep the parsed tags."""
+        episode = Episode(SOLARIS_CHAPTER_1, "/Solaris", "http://localhost:5000")
+
+        assert not hasattr(episode, "__dict__")
+        assert not hasattr(episode, "tags")
+        assert episode.id3_title == "Chapter 1"
+        assert episode.duration == 1
+        assert episode.mimetype == "audio/mpeg"
+        assert episode.mtime == pytest.approx(os.stat(SOLARIS_CHAPTER_1).st_mtime)
+
+    def test_relative_dirs_are_shared(self):
+        """Test that episodes in the same directory share one relative_dir string."""
+        first = Episode(SOLARIS_CHAPTER_1, "".join(["/Sol", "aris"]), "http://localhost:5000")
+        second = Episode(SOLARIS_CHAPTER_1, "".join(["/Sola", "ris"]), "http://localhost:5000")
+
+        assert first.relative_dir is second.relative_dir
+
+
+class TestScanOpenCount:
+    """Tests for the number of file opens per channel scan."""
+
+    @pytest.fixture
+    def channel(self):
+        return make_channel()
+
+    def test_one_open_per_file_per_scan(self, channel):
+        """Test that scanning opens each audio file exactly once."""
+        before = files_opened()
+        episodes = list(channel)
+
+        assert files_opened() - before == len(episodes) == 9
+
+    def test_rendering_does_not_reopen_files(self, channel):
+        """Test that durations are not re-read when rendering."""
+        before = files_opened()
+        channel.as_xml()
+        channel.as_html()
+
+        assert files_opened() - before == 2 * 9
@@ -0,0 +1,117 @@
+"""Tests for the metrics endpoint and per-request timing logs."""
+import logging
+import os
+import re
+
+import pytest
+
+from podcats import LibraryIndex, MetadataCache, create_app, create_folder_app, metrics
+from conftest import TEST_AUDIO_ROOT, make_channel, make_folder_channel
+
+
+EPISODE_URL = "/static/Solaris/01%20-%20Chapter%201.mp3"
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    """Fixture that starts every test with no recorded metrics."""
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def sample(text, name, labels=""):
+    """Return the value of sample `name` with `labels` in exposition `text`."""
+    match = re.search(r"^{}{} (\S+)$".format(re.escape(name), re.escape(labels)), text, re.M)
+    return float(match.group(1)) if match else None
+
+
+class TestMetricsEndpoint:
+    """Tests for the /metrics endpoint."""
+
+    def test_scan_and_render_metrics(self):
+        client = create_app(make_channel()).test_client()
+        assert client.get("/").status_code == 200
+
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.content_type.startswith("text/plain; version=0.0.4")
+        text = response.get_data(as_text=True)
+
+        assert "# TYPE podcats_scan_seconds summary" in text
+        assert sample(text, "podcats_scan_seconds_count", '{source="walk"}') == 1
+        assert sample(text, "podcats_files_parsed_total") == 9
+        assert sample(text, "podcats_episodes_created_total") == 9
+        assert sample(text, "podcats_library_episodes") == 9
+        assert sample(text, "podcats_render_seconds_count", '{template="feed.xml"}') == 1
+        assert sample(text, "podcats_request_seconds_count", '{endpoint="feed"}') == 1
+        assert sample(text, "podcats_responses_total", '{status="200"}') == 1
+
+    def test_library_index_metrics(self):
+        index = LibraryIndex(root_dir=TEST_AUDIO_ROOT, root_url="http://localhost:5000")
+        index.build()
+        folder_channel = make_folder_channel(title="Test", library_index=index)
+        client = create_folder_app(folder_channel).test_client()
+        client.get("/web")
+        client.get("/feed/Solaris")
+
+        text = client.get("/metrics").get_data(as_text=True)
+        assert sample(text, "podcats_scan_seconds_count", '{source="index"}') == 1
+        assert sample(text, "podcats_library_episodes") == 9
+        assert sample(text, "podcats_render_seconds_count", '{template="folder_index.html"}') == 1
+        assert sample(text, "podcats_render_seconds_count", '{template="feed.xml"}') == 1
+
+    def test_static_bytes(self):
+        client = create_app(make_channel()).test_client()
+        size = os.path.getsize(os.path.join(TEST_AUDIO_ROOT, "Solaris", "01 - Chapter 1.mp3"))
+
+        client.get(EPISODE_URL).close()
+        client.get(EPISODE_URL, headers={"Range": "bytes=0-9"}).close()
+        client.head(EPISODE_URL).close()
+
+        text = client.get("/metrics").get_data(as_text=True)
+        assert sample(text, "podcats_static_bytes_total") == size + 10
+        assert sample(text, "podcats_request_seconds_count", '{endpoint="media"}') == 3
+
+    def test_metadata_cache_hits(self, tmp_path):
+        cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+        try:
+            list(make_channel(metadata_cache=cache))
+            list(make_channel(metadata_cache=cache))
+        finally:
+            cache.close()
+        text = metrics.render()
+        assert sample(text, "podcats_files_parsed_total") == 9
+        assert sample(text, "podcats_metadata_cache_hits_total") == 9
+
+
+class TestTimingLog:
+    """Tests for the structured per-request log line."""
+
+    def test_request_line(self, caplog):
+        client = create_app(make_channel()).test_client()
+        with caplog.at_level(logging.INFO, logger="podcats.metrics"):
+            client.get("/")
+
+        line, = [record.getMessage() for record in caplog.records if record.name == "podcats.metrics"]
+        fields = dict(field.split("=", 1) for field in line.split()[1:])
+        assert fields["method"] == "GET"
+        assert fields["path"] == "/"
+        assert fields["status"] == "200"
+        assert fields["files_parsed"] == "9"
+        assert fields["episodes"] == "9"
+        assert float(fields["scan_seconds"]) > 0
+        assert float(fields["render_seconds"]) > 0
+        assert float(fields["seconds"]) >= float(fields["render_seconds"])
+
+    def test_cached_feed_does_no_work(self, caplog):
+        index = LibraryIndex(root_dir=TEST_AUDIO_ROOT, root_url="http://localhost:5000")
+        index.build()
+        client = create_app(make_channel(library_index=index)).test_client()
+        client.get("/")
+        with caplog.at_level(logging.INFO, logger="podcats.metrics"):
+            client.get("/")
+
+        line, = [record.getMessage() for record in caplog.records if record.name == "podcats.metrics"]
+        assert "render_seconds" not in line
+        assert "files_parsed" not in line
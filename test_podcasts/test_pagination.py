@@ -0,0 +1,118 @@
+"""Tests for --max-items and RFC 5005 paged feeds."""
+import sys
+import xml.etree.ElementTree as ET
+
+import pytest
+
+import podcats
+from podcats import LibraryIndex, create_app
+from conftest import make_channel
+
+
+ATOM_LINK = "{http://www.w3.org/2005/Atom}link"
+# Ten tiny episodes, "Track 1.mp3" to "Track 10.mp3"
+pytestmark = pytest.mark.parametrize("library", [10], indirect=True)
+
+
+def make_indexed_channel(library, **kwargs):
+    index = LibraryIndex(root_dir=library, root_url="http://localhost:5000", force_order_by_name=True)
+    index.build()
+    return make_channel(library, force_order_by_name=True, library_index=index, **kwargs)
+
+
+def titles(xml):
+    return [item.find("title").text for item in ET.fromstring(xml).iter("item")]
+
+
+def links(xml):
+    return {link.get("rel"): link.get("href") for link in ET.fromstring(xml).iter(ATOM_LINK)}
+
+
+class TestMaxItems:
+    """Tests for the newest-N limit."""
+
+    def test_only_newest_items_are_listed(self, library):
+        """Test that only the newest N episodes are included, oldest first."""
+        xml = make_indexed_channel(library, max_items=3).as_xml()
+
+        assert titles(xml) == ["Track 8", "Track 9", "Track 10"]
+        assert links(xml) == {}
+
+    def test_limit_larger_than_feed(self, library):
+        """Test that a generous limit lists everything."""
+        assert len(titles(make_indexed_channel(library, max_items=100).as_xml())) == 10
+
+    def test_unlimited_feed_is_unchanged(self, library):
+        """Test that without a limit all episodes are listed in order."""
+        assert titles(make_indexed_channel(library).as_xml()) == ["Track {}".format(n) for n in range(1, 11)]
+
+
+class TestPagedFeeds:
+    """Tests for ?page=N feeds."""
+
+    def test_first_page_has_newest_items_and_next_link(self, library):
+        """Test that the first page lists the newest episodes and links to the next."""
+        xml = make_indexed_channel(library, page_size=4).as_xml()
+
+        assert titles(xml) == ["Track 7", "Track 8", "Track 9", "Track 10"]
+        assert links(xml) == {
+            "self": "http://localhost:5000/?page=1",
+            "first": "http://localhost:5000/",
+            "next": "http://localhost:5000/?page=2",
+        }
+
+    def test_middle_and_last_pages(self, library):
+        """Test that later pages have previous links and the last has no next link."""
+        channel = make_indexed_channel(library, page_size=4)
+
+        assert titles(channel.as_xml(2)) == ["Track 3", "Track 4", "Track 5", "Track 6"]
+        assert "next" in links(channel.as_xml(2))
+        assert titles(channel.as_xml(3)) == ["Track 1", "Track 2"]
+        assert "next" not in links(channel.as_xml(3))
+        assert links(channel.as_xml(3))["previous"] == "http://localhost:5000/?page=2"
+
+    def test_pages_respect_max_items(self, library):
+        """Test that paging stops at the newest-N limit."""
+        channel = make_indexed_channel(library, page_size=4, max_items=6)
+
+        assert titles(channel.as_xml(2)) == ["Track 5", "Track 6"]
+        assert "next" not in links(channel.as_xml(2))
+        assert not channel.has_page(3)
+
+    def test_routes(self, library):
+        """Test that ?page=N is served and out-of-range pages are 404."""
+        client = create_app(make_indexed_channel(library, page_size=4)).test_client()
+
+        assert titles(client.get("/?page=3").data) == ["Track 1", "Track 2"]
+        assert client.get("/?page=4").status_code == 404
+        assert client.get("/?page=0").status_code == 404
+
+    def test_web_page_is_not_paged(self, library):
+        """Test that /web lists every episode, only the feed is paged."""
+        client = create_app(make_indexed_channel(library, page_size=4)).test_client()
+        html = client.get("/web").get_data(as_text=True)
+
+        assert all("Track {}.mp3".format(n) in html for n in range(1, 11))
+
+    def test_web_page_respects_max_items(self, library):
+        html = make_indexed_channel(library, max_items=3, page_size=2).as_html().decode("utf-8")
+
+        assert "Track 7.mp3" not in html
+        assert all("Track {}.mp3".format(n) in html for n in range(8, 11))
+
+    def test_page_parameter_ignored_without_paging(self, library):
+        """Test that unpaged feeds ignore ?page=N."""
+        client = create_app(make_indexed_channel(library)).test_client()
+
+        assert len(titles(client.get("/?page=5").data)) == 10
+
+
+class TestOptions:
+    """Tests for validating --max-items and --page-size."""
+
+    @pytest.mark.parametrize("option", ["--max-items", "--page-size"])
+    @pytest.mark.parametrize("value", ["0", "-1"])
+    def test_must_be_positive(self, library, monkeypatch, option, value):
+        monkeypatch.setattr(sys, "argv", ["podcats", "generate", option, value, library])
+        with pytest.raises(SystemExit):
+            podcats.main()
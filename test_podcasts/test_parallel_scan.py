@@ -0,0 +1,78 @@
+"""Tests for parallel metadata scanning."""
+import os
+import sys
+
+import pytest
+
+import podcats
+from podcats import LibraryIndex, MetadataCache, MetadataScanner, make_episodes
+from conftest import TEST_AUDIO_ROOT, make_channel
+
+
+def summary(episodes):
+    return [(e.filename, e.title, e.duration, e.length) for e in episodes]
+
+
+@pytest.fixture(params=["threads", "processes"])
+def scanner(request):
+    """Fixture that provides a multi-worker scanner of each kind."""
+    scanner = MetadataScanner(workers=4, processes=request.param == "processes")
+    yield scanner
+    scanner.shutdown()
+
+
+class TestParallelScan:
+    """Tests that parallel scans match sequential ones."""
+
+    def test_same_episodes_in_same_order(self, scanner):
+        """Test that output order is deterministic and matches a sequential scan."""
+        assert summary(make_channel(scanner=scanner)) == summary(make_channel())
+
+    def test_same_feed(self, scanner):
+        """Test that the rendered feed is identical."""
+        assert make_channel(scanner=scanner).as_xml() == make_channel().as_xml()
+
+    def test_fills_metadata_cache(self, scanner, tmp_path):
+        """Test that parsed metadata is written to the cache."""
+        cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+        try:
+            list(make_channel(scanner=scanner, metadata_cache=cache))
+            for episode in make_channel():
+                assert cache.get(episode.filename, os.stat(episode.filename)) is not None
+        finally:
+            cache.close()
+
+    def test_library_index_build(self, scanner):
+        """Test that a LibraryIndex built in parallel has every episode."""
+        index = LibraryIndex(root_dir=TEST_AUDIO_ROOT, root_url="http://localhost:5000", scanner=scanner)
+        index.build()
+
+        assert sorted(summary(index.episodes())) == sorted(summary(make_channel()))
+
+
+class TestMakeEpisodes:
+    """Tests for make_episodes() edge cases."""
+
+    def test_vanished_file_yields_none(self, tmp_path):
+        """Test that files deleted before parsing are reported as None."""
+        missing = str(tmp_path / "gone.mp3")
+        present = os.path.join(TEST_AUDIO_ROOT, "Solaris", "01 - Chapter 1.mp3")
+        scanner = MetadataScanner(workers=2)
+        try:
+            episodes = list(make_episodes(
+                [(missing, "/"), (present, "/Solaris")], "http://localhost:5000", scanner=scanner))
+        finally:
+            scanner.shutdown()
+
+        assert episodes[0] is None
+        assert episodes[1].filename == present
+
+
+class TestScanWorkersOption:
+    """Tests for validating --scan-workers."""
+
+    @pytest.mark.parametrize("value", ["0", "-2"])
+    def test_must_be_positive(self, monkeypatch, value):
+        monkeypatch.setattr(sys, "argv", ["podcats", "generate", "--scan-workers", value, TEST_AUDIO_ROOT])
+        with pytest.raises(SystemExit):
+            podcats.main()
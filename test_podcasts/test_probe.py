@@ -0,0 +1,201 @@
+"""Tests for header-only duration probing."""
+import glob
+import os
+import struct
+
+import mutagen
+import pytest
+from mutagen.id3 import ID3, TIT2
+from mutagen.mp4 import MP4
+
+from podcats import probe, read_metadata, scan_stats
+
+
+# The root directory for our test audio files
+TEST_AUDIO_ROOT = os.path.join(os.path.dirname(__file__), "sample_audio")
+SAMPLE_MP3S = sorted(glob.glob(os.path.join(TEST_AUDIO_ROOT, "*", "*.mp3")))
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, stereo: 417 bytes per frame
+MP3_FRAME = b"\xff\xfb\x90\x04" + b"\x00" * 413
+
+
+def probe_file(filename):
+    with open(filename, "rb") as f:
+        return probe.probe(f)
+
+
+def mutagen_length(filename):
+    return mutagen.File(filename).info.length
+
+
+def add_title(filename):
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text="Title"))
+    tags.save(filename)
+
+
+def xing_frame(frames, delay=0, padding=0):
+    """Return a first frame carrying a Xing header and a LAME tag."""
+    frame = bytearray(MP3_FRAME)
+    xing = 36
+    frame[xing:xing + 8] = b"Xing" + struct.pack(">I", 0x1)
+    frame[xing + 8:xing + 12] = struct.pack(">I", frames)
+    lame = xing + 12
+    frame[lame:lame + 9] = b"LAME3.99r"
+    frame[lame + 21:lame + 24] = bytes([delay >> 4, (delay & 0xf) << 4 | padding >> 8, padding & 0xff])
+    return bytes(frame)
+
+
+def vbri_frame(frames):
+    """Return a first frame carrying a VBRI header."""
+    frame = bytearray(MP3_FRAME)
+    vbri = 36
+    frame[vbri:vbri + 6] = b"VBRI" + struct.pack(">H", 1)
+    frame[vbri + 14:vbri + 26] = struct.pack(">IHHHH", frames, 0, 1, 2, 1)
+    return bytes(frame)
+
+
+def box(kind, *children):
+    payload = b"".join(children)
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def write_m4b(filename, seconds, mdat_first=False):
+    timescale = 44100
+    duration = int(seconds * timescale)
+    mvhd = box(b"mvhd", struct.pack(">B3xIIII", 0, 0, 0, 1000, int(seconds * 1000)) + b"\x00" * 80)
+    mdhd = box(b"mdhd", struct.pack(">B3xIIIIHH", 0, 0, 0, timescale, duration, 0, 0))
+    hdlr = box(b"hdlr", struct.pack(">B3xI4s", 0, 0, b"soun") + b"\x00" * 13)
+    moov = box(b"moov", mvhd, box(b"trak", box(b"mdia", mdhd, hdlr)))
+    mdat = box(b"mdat", b"\x00" * 5000)
+    ftyp = box(b"ftyp", b"M4B \x00\x00\x00\x00M4B mp42isom")
+    with open(filename, "wb") as f:
+        f.write(ftyp + (mdat + moov if mdat_first else moov + mdat))
+    tags = MP4(filename)
+    tags["\xa9nam"] = ["Title"]
+    tags.save()
+
+
+def write_flac(filename, sample_rate, total_samples):
+    info = bytearray(34)
+    info[10:13] = bytes([sample_rate >> 12 & 0xff, sample_rate >> 4 & 0xff, (sample_rate & 0xf) << 4 | 1 << 1])
+    info[13] = 15 << 4 | total_samples >> 32
+    info[14:18] = struct.pack(">I", total_samples & 0xffffffff)
+    with open(filename, "wb") as f:
+        f.write(b"fLaC" + bytes([0x80, 0, 0, 34]) + bytes(info))
+
+
+class TestProbe:
+    """Tests for probe.probe()."""
+
+    @pytest.mark.parametrize("filename", SAMPLE_MP3S, ids=os.path.basename)
+    def test_sample_mp3s_match_mutagen(self, filename):
+        result = probe_file(filename)
+
+        assert result.format == "mp3"
+        assert result.duration == pytest.approx(mutagen_length(filename))
+
+    def test_cbr_mp3_matches_mutagen(self, tmp_path):
+        filename = str(tmp_path / "cbr.mp3")
+        with open(filename, "wb") as f:
+            f.write(MP3_FRAME * 3000)
+        add_title(filename)
+
+        assert probe_file(filename).duration == pytest.approx(mutagen_length(filename))
+
+    def test_xing_lame_header(self, tmp_path):
+        """Test that the frame count and encoder delay/padding are used."""
+        filename = str(tmp_path / "vbr.mp3")
+        with open(filename, "wb") as f:
+            f.write(xing_frame(5000, delay=576, padding=1234) + MP3_FRAME * 10)
+        add_title(filename)
+
+        result = probe_file(filename)
+        assert result.duration == pytest.approx((5000 * 1152 - 576 - 1234) / 44100.0)
+        assert result.duration == pytest.approx(mutagen_length(filename))
+
+    def test_vbri_header(self, tmp_path):
+        filename = str(tmp_path / "vbri.mp3")
+        with open(filename, "wb") as f:
+            f.write(vbri_frame(777) + MP3_FRAME * 10)
+
+        assert probe_file(filename).duration == pytest.approx(mutagen_length(filename))
+
+    def test_junk_before_frames(self, tmp_path):
+        filename = str(tmp_path / "junk.mp3")
+        with open(filename, "wb") as f:
+            f.write(b"\x00" * 3000 + b"\xff\xfb\x00" + MP3_FRAME * 60)
+        add_title(filename)
+
+        assert probe_file(filename).duration == pytest.approx(mutagen_length(filename))
+
+    @pytest.mark.parametrize("mdat_first", [False, True])
+    def test_m4b(self, tmp_path, mdat_first):
+        filename = str(tmp_path / "book.m4b")
+        write_m4b(filename, 3725.5, mdat_first=mdat_first)
+
+        result = probe_file(filename)
+        assert result.format == "mp4"
+        assert result.duration == pytest.approx(3725.5)
+        assert result.duration == pytest.approx(mutagen_length(filename))
+
+    def test_flac(self, tmp_path):
+        filename = str(tmp_path / "a.flac")
+        write_flac(filename, 44100, 44100 * 123 + 7)
+
+        result = probe_file(filename)
+        assert result.format == "flac"
+        assert result.duration == pytest.approx(mutagen_length(filename))
+
+    @pytest.mark.parametrize("content", [b"not really an mp3", b"RIFF" + b"\x00" * 5000])
+    def test_unknown_formats(self, tmp_path, content):
+        filename = str(tmp_path / "unknown.mp3")
+        with open(filename, "wb") as f:
+            f.write(content)
+
+        assert probe_file(filename).duration is None
+
+    def test_reads_are_bounded(self, tmp_path):
+        """Test that a large file is probed from a few KiB of headers."""
+        filename = str(tmp_path / "large.mp3")
+        with open(filename, "wb") as f:
+            f.write(xing_frame(200000) + MP3_FRAME * 20000)
+        add_title(filename)
+
+        result = probe_file(filename)
+        assert result.duration == pytest.approx(mutagen_length(filename))
+        assert result.bytes_read <= probe.MPEG_SCAN_CHUNK + 64
+        assert os.path.getsize(filename) > 100 * result.bytes_read
+
+
+class TestReadMetadataProbing:
+    """Tests for the use of probing in read_metadata()."""
+
+    def test_counts_bytes_read(self):
+        before = scan_stats["probe_bytes_read"]
+        metadata = read_metadata(SAMPLE_MP3S[0])
+
+        assert metadata.duration == 1
+        assert metadata.id3_title
+        assert 0 < scan_stats["probe_bytes_read"] - before <= probe.MPEG_SCAN_CHUNK + 64
+
+    def test_mp3_tags_without_mutagen_parse(self, tmp_path, monkeypatch):
+        """Test that an MP3 with a probed duration only has its ID3 tags parsed."""
+        filename = str(tmp_path / "vbr.mp3")
+        with open(filename, "wb") as f:
+            f.write(xing_frame(3000) + MP3_FRAME * 10)
+        add_title(filename)
+        monkeypatch.setattr(mutagen, "File", None)
+
+        metadata = read_metadata(filename)
+        assert metadata.duration == 78
+        assert metadata.id3_title == "Title"
+        assert metadata.tags == {"title": ["Title"]}
+
+    def test_m4b_tags(self, tmp_path):
+        filename = str(tmp_path / "book.m4b")
+        write_m4b(filename, 90.5)
+
+        metadata = read_metadata(filename)
+        assert metadata.duration == 90
+        assert metadata.tags["title"] == ["Title"]
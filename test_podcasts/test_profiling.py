@@ -0,0 +1,129 @@
+"""Tests for the --profile mode."""
+import http.client
+import os
+import pstats
+import sys
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+import podcats
+from podcats import create_app
+from podcats.profiling import Profiler
+from conftest import TEST_AUDIO_ROOT, make_channel
+
+
+def profiled_functions(filename):
+    return {function for _, _, function in pstats.Stats(filename).stats}
+
+
+class TestProfiler:
+    """Tests for profiling requests."""
+
+    def test_request_is_profiled(self, tmp_path):
+        client = create_app(make_channel(), profiler=Profiler(str(tmp_path))).test_client()
+
+        response = client.get("/")
+        assert response.status_code == 200
+        assert response.data.startswith(b"<?xml")
+        response.close()
+
+        filename, = os.listdir(str(tmp_path))
+        assert filename.endswith("ms.prof")
+        assert "GET" in filename
+        assert "as_xml" in profiled_functions(str(tmp_path / filename))
+
+    def test_threshold(self, tmp_path):
+        client = create_app(make_channel(), profiler=Profiler(str(tmp_path), threshold=60)).test_client()
+        response = client.get("/")
+        assert response.status_code == 200
+        response.close()
+        assert os.listdir(str(tmp_path)) == []
+
+    def test_media_is_not_profiled(self, tmp_path):
+        client = create_app(make_channel(), profiler=Profiler(str(tmp_path))).test_client()
+
+        response = client.get("/static/Solaris/01%20-%20Chapter%201.mp3", headers={"Range": "bytes=0-9"})
+        assert response.status_code == 206
+        assert len(response.data) == 10
+        assert os.listdir(str(tmp_path)) == []
+
+    def test_streamed_body_is_profiled_lazily(self, tmp_path):
+        profiler = Profiler(str(tmp_path))
+        chunks = []
+
+        def app(environ, start_response):
+            start_response("200 OK", [])
+            for n in range(3):
+                chunks.append(n)
+                yield b"chunk"
+
+        body = profiler.wrap(app)({"REQUEST_METHOD": "GET", "PATH_INFO": "/"}, lambda status, headers: None)
+        assert chunks == []
+        assert next(body) == b"chunk"
+        assert os.listdir(str(tmp_path)) == []
+
+        # Saved once the body runs out, even if the server never closes it.
+        assert list(body) == [b"chunk"] * 2
+        filename, = os.listdir(str(tmp_path))
+        assert "app" in profiled_functions(str(tmp_path / filename))
+        body.close()
+        assert len(os.listdir(str(tmp_path))) == 1
+
+    def test_sequential_requests_are_all_profiled(self, tmp_path):
+        """Test that a request sent as soon as the previous response arrived is profiled."""
+        server = make_server("127.0.0.1", 0, create_app(make_channel(), profiler=Profiler(str(tmp_path))),
+                             threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", server.server_port, timeout=10)
+            for _ in range(4):
+                connection.request("GET", "/")
+                response = connection.getresponse()
+                assert response.status == 200
+                response.read()
+            connection.close()
+        finally:
+            server.shutdown()
+            thread.join()
+
+        assert len(os.listdir(str(tmp_path))) == 4
+
+    def test_overlapping_sessions_are_not_profiled(self, tmp_path):
+        profiler = Profiler(str(tmp_path))
+
+        def inner():
+            with profiler.profile("inner"):
+                sum(range(10))
+
+        with profiler.profile("outer"):
+            thread = threading.Thread(target=inner)
+            thread.start()
+            thread.join()
+
+        filename, = os.listdir(str(tmp_path))
+        assert "outer" in filename
+
+
+class TestProfileOption:
+    """Tests for --profile on the command line."""
+
+    def test_generate(self, tmp_path, monkeypatch, capsys):
+        profile_dir = tmp_path / "profiles"
+        monkeypatch.setattr(sys, "argv", [
+            "podcats", "generate", "--cache-dir", str(tmp_path / "cache"), "--profile", str(profile_dir),
+            TEST_AUDIO_ROOT])
+        podcats.main()
+
+        assert "<rss" in capsys.readouterr().out
+        filename, = os.listdir(str(profile_dir))
+        assert "generate" in filename
+        assert "as_xml" in profiled_functions(str(profile_dir / filename))
+
+    def test_negative_threshold(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(sys, "argv", [
+            "podcats", "generate", "--profile", str(tmp_path), "--profile-threshold", "-1", TEST_AUDIO_ROOT])
+        with pytest.raises(SystemExit):
+            podcats.main()
@@ -0,0 +1,115 @@
+"""Tests for block-wise reads of audio files."""
+import io
+import os
+import random
+
+import mutagen
+import pytest
+from mutagen.id3 import APIC, ID3, TIT2
+
+from podcats import read_metadata, readahead, scan_stats
+
+
+# The root directory for our test audio files
+TEST_AUDIO_ROOT = os.path.join(os.path.dirname(__file__), "sample_audio")
+SOLARIS_CHAPTER_1 = os.path.join(TEST_AUDIO_ROOT, "Solaris", "01 - Chapter 1.mp3")
+
+# MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, stereo: 417 bytes per frame
+MP3_FRAME = b"\xff\xfb\x90\x04" + b"\x00" * 413
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    """Fixture for a file of 300 KB of random bytes."""
+    filename = str(tmp_path / "data")
+    with open(filename, "wb") as f:
+        f.write(os.urandom(300 * 1024))
+    return filename
+
+
+@pytest.fixture
+def large_mp3(tmp_path):
+    """Fixture for a 2 MB MP3 with a large cover in its ID3 tags."""
+    filename = str(tmp_path / "large.mp3")
+    with open(filename, "wb") as f:
+        f.write(MP3_FRAME * 5000)
+    tags = ID3()
+    tags.add(TIT2(encoding=3, text="Large"))
+    tags.add(APIC(encoding=3, mime="image/jpeg", type=3, desc="", data=os.urandom(200 * 1024)))
+    tags.save(filename)
+    return filename
+
+
+class TestRegionFile:
+    """Tests for RegionFile."""
+
+    def test_reads_match_file(self, data_file):
+        """Test that random seeks and reads return the same bytes as the file itself."""
+        rng = random.Random(0)
+        with open(data_file, "rb") as raw, open(data_file, "rb") as f:
+            regions = readahead.RegionFile(raw)
+            for _ in range(200):
+                offset, whence = rng.choice([
+                    (rng.randrange(300 * 1024), io.SEEK_SET),
+                    (-rng.randrange(1, 1000), io.SEEK_END),
+                    (rng.randrange(100), io.SEEK_CUR),
+                ])
+                size = rng.choice([0, 4, 10, 128, 5000, 100 * 1024, -1])
+                assert regions.seek(offset, whence) == f.seek(offset, whence)
+                assert regions.read(size) == f.read(size)
+                assert regions.tell() == f.tell()
+
+    def test_small_reads_share_a_block(self, data_file):
+        with open(data_file, "rb") as raw:
+            regions = readahead.RegionFile(raw)
+            for offset in range(0, 60000, 1000):
+                regions.seek(offset)
+                regions.read(10)
+
+            assert regions.reads == 1
+            assert regions.bytes_read == readahead.BLOCK_SIZE
+
+    def test_reads_near_the_end_read_the_last_block(self, data_file):
+        with open(data_file, "rb") as raw:
+            regions = readahead.RegionFile(raw)
+            regions.seek(-131, io.SEEK_END)
+            regions.read(131)
+            regions.seek(-readahead.BLOCK_SIZE, io.SEEK_END)
+            regions.read(10)
+
+            assert regions.reads == 1
+
+    def test_seek_before_start(self, data_file):
+        """Test that seeking before the start fails like it does on a real file."""
+        with open(data_file, "rb") as raw:
+            regions = readahead.RegionFile(raw)
+            with pytest.raises(OSError):
+                regions.seek(-1)
+
+    def test_mutagen_parse(self, large_mp3):
+        """Test that mutagen parses the same tags with far fewer reads."""
+        with open(large_mp3, "rb") as raw:
+            regions = readahead.RegionFile(raw)
+            audio = mutagen.File(regions)
+
+            assert audio.tags["TIT2"].text == ["Large"]
+            assert audio.info.length == pytest.approx(mutagen.File(large_mp3).info.length)
+            assert regions.reads <= 3
+
+
+class TestReadMetadataReads:
+    """Tests for the number of reads made by read_metadata()."""
+
+    def test_small_file_is_read_once(self):
+        before = scan_stats["reads"]
+        read_metadata(SOLARIS_CHAPTER_1)
+
+        assert scan_stats["reads"] - before == 1
+
+    def test_large_file(self, large_mp3):
+        before = scan_stats["reads"], scan_stats["bytes_read"]
+        metadata = read_metadata(large_mp3)
+
+        assert metadata.id3_title == "Large"
+        assert scan_stats["reads"] - before[0] <= 4
+        assert scan_stats["bytes_read"] - before[1] < os.path.getsize(large_mp3) / 2
@@ -0,0 +1,109 @@
+"""Tests for template and episode fragment caching."""
+import os
+import shutil
+
+import pytest
+from jinja2.utils import LRUCache
+
+import podcats
+from podcats import Episode, FragmentCache, configure_template_cache, jinja2_env
+
+
+# The root directory for our test audio files
+TEST_AUDIO_ROOT = os.path.join(os.path.dirname(__file__), "sample_audio")
+
+
+@pytest.fixture
+def render_counter(monkeypatch):
+    """Fixture that counts renders of the episode templates."""
+    calls = []
+    original = podcats.get_template
+
+    class CountingTemplate(object):
+        def __init__(self, template):
+            self.template = template
+
+        def render(self, **kwargs):
+            calls.append(self.template.name)
+            return self.template.render(**kwargs)
+
+    monkeypatch.setattr(podcats, "get_template", lambda name: CountingTemplate(original(name)))
+    return calls
+
+
+@pytest.fixture
+def episode_dir(tmp_path):
+    """Fixture that provides a folder with one episode and no cover."""
+    directory = tmp_path / "Book"
+    directory.mkdir()
+    shutil.copy(os.path.join(TEST_AUDIO_ROOT, "Solaris", "01 - Chapter 1.mp3"), str(directory))
+    return str(directory)
+
+
+def make_episode(directory):
+    return Episode(os.path.join(directory, "01 - Chapter 1.mp3"), "/Book", "http://localhost:5000")
+
+
+class TestEpisodeFragments:
+    """Tests for memoized per-episode XML and HTML."""
+
+    def test_fragments_are_rendered_once(self, episode_dir, render_counter):
+        episode = make_episode(episode_dir)
+
+        assert episode.as_xml() == episode.as_xml()
+        assert episode.as_html() == episode.as_html()
+        assert render_counter == ["episode.xml", "episode.html"]
+
+    def test_new_cover_invalidates_fragments(self, episode_dir, render_counter):
+        episode = make_episode(episode_dir)
+        assert "itunes:image" not in episode.as_xml()
+
+        shutil.copy(os.path.join(TEST_AUDIO_ROOT, "Solaris", "cover.jpg"), episode_dir)
+        # Make sure the directory mtime changes even on coarse timestamps.
+        os.utime(episode_dir, ns=(0, os.stat(episode_dir).st_mtime_ns + 10 ** 9))
+
+        assert "/static/Book/cover.jpg" in episode.as_xml()
+        assert "/static/Book/cover.jpg" in episode.as_html()
+        assert render_counter == ["episode.xml", "episode.xml", "episode.html"]
+
+    def test_changed_file_gets_fresh_fragments(self, episode_dir):
+        episode = make_episode(episode_dir)
+        episode.as_xml()
+
+        with open(episode.filename, "ab") as f:
+            f.write(b"\0" * 100)
+
+        assert 'length="{}"'.format(os.path.getsize(episode.filename)) in make_episode(episode_dir).as_xml()
+
+    def test_cache_is_bounded(self, episode_dir, render_counter, monkeypatch):
+        """Test that only the most recently used fragments are kept."""
+        monkeypatch.setattr(podcats, "fragment_cache", FragmentCache(1))
+        episode = make_episode(episode_dir)
+        episode.as_xml()
+        episode.as_html()
+        episode.as_xml()
+
+        assert render_counter == ["episode.xml", "episode.html", "episode.xml"]
+        assert len(podcats.fragment_cache) == 1
+
+    def test_cache_can_be_disabled(self, episode_dir, render_counter, monkeypatch):
+        monkeypatch.setattr(podcats, "fragment_cache", FragmentCache(0))
+        episode = make_episode(episode_dir)
+
+        assert episode.as_xml() == episode.as_xml()
+        assert render_counter == ["episode.xml", "episode.xml"]
+        assert len(podcats.fragment_cache) == 0
+
+
+class TestTemplateCache:
+    """Tests for the on-disk template bytecode cache."""
+
+    def test_bytecode_is_written(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(podcats, "_templates", {})
+        monkeypatch.setattr(jinja2_env, "cache", LRUCache(400))
+        monkeypatch.setattr(jinja2_env, "bytecode_cache", None)
+
+        configure_template_cache(str(tmp_path))
+        podcats.get_template("feed.xml")
+
+        assert os.listdir(str(tmp_path / "templates"))
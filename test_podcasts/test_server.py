@@ -0,0 +1,61 @@
+"""Tests for running the apps under a production server."""
+import os
+import shutil
+import sys
+
+import pytest
+
+import podcats
+from podcats import LibraryIndex, MetadataCache, run_server
+from conftest import make_channel
+
+
+@pytest.fixture
+def gunicorn_calls(monkeypatch):
+    """Fixture that records calls to run_gunicorn instead of starting a server."""
+    calls = []
+    monkeypatch.setattr(podcats.wsgi, "run_gunicorn", lambda app, host, port, **kwargs: calls.append(kwargs))
+    return calls
+
+
+class TestRunServer:
+    """Tests for the fork hooks passed to gunicorn."""
+
+    def test_fork_hooks(self, library, tmp_path, gunicorn_calls):
+        metadata_cache = MetadataCache(str(tmp_path / "metadata.sqlite3"))
+        index = LibraryIndex(root_dir=library, root_url="http://localhost:5000", metadata_cache=metadata_cache)
+        index.build()
+        index.start_watching(poll_interval=0.1)
+        channel = make_channel(library, metadata_cache=metadata_cache, library_index=index)
+        try:
+            run_server(podcats.create_app(channel), channel, server="gunicorn", workers=3)
+            kwargs, = gunicorn_calls
+            assert kwargs["workers"] == 3
+
+            kwargs["before_fork"]()
+            assert index._watcher is None
+            assert metadata_cache._conn is None
+
+            new_dir = os.path.join(library, "New Book")
+            os.mkdir(new_dir)
+            shutil.copy(os.path.join(library, "Solaris", "01 - Chapter 1.mp3"), new_dir)
+            kwargs["after_fork"]()
+            assert index._watcher is not None
+            assert len(index.episodes("New Book")) == 1
+        finally:
+            index.stop_watching()
+            metadata_cache.close()
+
+
+class TestServerOptions:
+    """Tests for --server and --workers validation."""
+
+    def test_workers_require_gunicorn(self, monkeypatch, library):
+        monkeypatch.setattr(sys, "argv", ["podcats", "serve", "--workers", "4", library])
+        with pytest.raises(SystemExit):
+            podcats.main()
+
+    def test_workers_must_be_positive(self, monkeypatch, library):
+        monkeypatch.setattr(sys, "argv", ["podcats", "serve", "--server", "gunicorn", "--workers", "0", library])
+        with pytest.raises(SystemExit):
+            podcats.main()
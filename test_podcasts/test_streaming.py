@@ -0,0 +1,88 @@
+"""Tests for streamed feed responses."""
+import types
+
+import pytest
+
+import podcats
+from podcats import LibraryIndex, create_app, create_folder_app
+from conftest import TEST_AUDIO_ROOT, make_channel, make_folder_channel
+
+
+@pytest.fixture
+def library_index():
+    index = LibraryIndex(root_dir=TEST_AUDIO_ROOT, root_url="http://localhost:5000")
+    index.build()
+    return index
+
+
+@pytest.fixture
+def channel(library_index):
+    return make_channel(title="Test Audiobook Feed", library_index=library_index)
+
+
+class TestIterXml:
+    """Tests for Channel.iter_xml()."""
+
+    def test_is_a_generator(self, channel):
+        """Test that the feed is produced lazily."""
+        assert isinstance(channel.iter_xml(), types.GeneratorType)
+
+    def test_header_comes_before_items(self, channel):
+        """Test that the channel header is emitted before any item is rendered."""
+        first = next(channel.iter_xml())
+
+        assert first.startswith('<?xml version="1.0" encoding="UTF-8"?>')
+        assert "<item>" not in first
+
+    def test_matches_as_xml(self, channel):
+        """Test that the streamed document equals the rendered one."""
+        assert "".join(channel.iter_xml()).strip() == channel.as_xml()
+
+
+class TestStreamedResponses:
+    """Tests for the streaming mode of the web apps."""
+
+    def test_root_feed_is_streamed(self, channel):
+        """Test that the root feed is sent as a streamed response."""
+        response = create_app(channel, stream=True).test_client().get("/")
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        # The body must not have been rendered up front to measure it.
+        assert "Content-Length" not in response.headers
+        assert response.get_data(as_text=True).strip() == channel.as_xml()
+
+    def test_streamed_feed_supports_conditional_get(self, channel):
+        """Test that streamed feeds still answer matching polls with 304."""
+        client = create_app(channel, stream=True).test_client()
+        etag = client.get("/").headers["ETag"]
+
+        assert etag.startswith('W/"')
+        assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+
+    def test_etags_do_not_survive_a_restart(self, channel, monkeypatch):
+        """Test that a new process does not answer an old ETag with 304."""
+        client = create_app(channel, stream=True).test_client()
+        etag = client.get("/").headers["ETag"]
+        monkeypatch.setattr(podcats, "_process_token", (None, None))
+
+        assert client.get("/", headers={"If-None-Match": etag}).status_code == 200
+
+    def test_not_modified_does_not_select_episodes(self, channel, monkeypatch):
+        """Test that a 304 answer does not look at the episodes at all."""
+        client = create_app(channel, stream=True).test_client()
+        etag = client.get("/").headers["ETag"]
+        calls = []
+        select_episodes = channel.select_episodes
+        monkeypatch.setattr(channel, "select_episodes", lambda page=None: calls.append(page) or select_episodes(page))
+
+        assert client.get("/", headers={"If-None-Match": etag}).status_code == 304
+        assert calls == []
+
+    def test_folder_feed_is_streamed(self, library_index):
+        """Test that per-folder feeds are streamed too."""
+        folder_channel = make_folder_channel(library_index=library_index)
+        response = create_folder_app(folder_channel, stream=True).test_client().get("/feed/Solaris")
+
+        assert response.is_streamed
+        assert response.get_data().count(b"<item>") == 3